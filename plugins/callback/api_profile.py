@@ -0,0 +1,151 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: api_profile
+    type: aggregate
+    short_description: Profile the API calls of the collection modules across a playbook
+    description:
+      - Aggregates the C(api_stats) returned by the modules of the collection run with C(collect_stats=true).
+      - Displays the slowest endpoints, the number of calls per module and a latency histogram at the end of the playbook.
+      - Optionally writes the whole profile as json, to compare runs.
+    requirements:
+      - enable in configuration
+    options:
+      output_path:
+        description: Path of the json profile written at the end of the playbook, none by default.
+        type: path
+        env:
+          - name: API_PROFILE_OUTPUT_PATH
+        ini:
+          - section: callback_api_profile
+            key: output_path
+      top:
+        description: Number of slowest endpoints displayed.
+        type: int
+        default: 10
+        env:
+          - name: API_PROFILE_TOP
+        ini:
+          - section: callback_api_profile
+            key: top
+'''
+
+import json
+from collections import Counter
+
+from ansible.plugins.callback import CallbackBase
+
+from ..module_utils.stats import LATENCY_BUCKETS_MS
+
+HISTOGRAM_WIDTH = 40
+
+
+class ApiProfile:
+    """ Stats of the API calls of every task, merged by module and by endpoint """
+    def __init__(self):
+        self.tasks          = Counter()
+        self.requests       = Counter()
+        self.endpoints      = Counter()
+        self.endpoints_time = Counter()
+        self.histogram      = Counter()
+        self.bytes_received = 0
+        self.retries        = 0
+        self.pages          = 0
+
+    def add(self, module: str, api_stats: dict):
+        self.tasks[module]    += 1
+        self.requests[module] += api_stats.get("requests", 0)
+        self.endpoints.update(api_stats.get("endpoints", {}))
+        self.endpoints_time.update(api_stats.get("endpoints_ms", {}))
+        self.histogram.update(api_stats.get("histogram_ms", {}))
+        self.bytes_received += api_stats.get("bytes_received", 0)
+        self.retries        += api_stats.get("retries", 0)
+        self.pages          += api_stats.get("pages", 0)
+
+    def slowest_endpoints(self, top: int) -> list:
+        """ Return the endpoints with the highest mean latency first """
+        endpoints = [{
+            "endpoint": k,
+            "calls":    self.endpoints[k],
+            "mean_ms":  round(self.endpoints_time[k] / self.endpoints[k], 1),
+            "total_ms": round(self.endpoints_time[k], 1),
+        } for k in self.endpoints if self.endpoints[k]]
+        return sorted(endpoints, key=lambda e: e["mean_ms"], reverse=True)[:top]
+
+    def histogram_buckets(self) -> list:
+        """ Return the (bucket, count) couples of the histogram, in latency order """
+        buckets = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return [(b, self.histogram[b]) for b in buckets]
+
+    def to_dict(self, top: int) -> dict:
+        return {
+            "modules":           {m: {"tasks": self.tasks[m], "requests": self.requests[m]} for m in self.tasks},
+            "requests":          sum(self.requests.values()),
+            "bytes_received":    self.bytes_received,
+            "retries":           self.retries,
+            "pages":             self.pages,
+            "slowest_endpoints": self.slowest_endpoints(top),
+            "endpoints":         {k: {"calls": v, "total_ms": round(self.endpoints_time[k], 1)} for k, v in self.endpoints.items()},
+            "histogram_ms":      dict(self.histogram_buckets()),
+        }
+
+    def render(self, top: int) -> list:
+        """ Return the lines of the human readable report """
+        lines = ["Slowest endpoints:"]
+        for e in self.slowest_endpoints(top):
+            lines.append(f"  {e['endpoint']:<60} {e['calls']:>6} calls {e['mean_ms']:>10.1f} ms mean {e['total_ms']:>12.1f} ms total")
+
+        lines.append("Requests per module:")
+        for module, requests in self.requests.most_common():
+            lines.append(f"  {module:<60} {requests:>6} calls in {self.tasks[module]} tasks")
+
+        lines.append("Latency histogram (ms):")
+        buckets = self.histogram_buckets()
+        highest = max([count for _, count in buckets] + [1])
+        for bucket, count in buckets:
+            lines.append(f"  {bucket:>6} {'#' * round(count * HISTOGRAM_WIDTH / highest):<{HISTOGRAM_WIDTH}} {count}")
+
+        lines.append(f"Total: {sum(self.requests.values())} calls, {self.retries} retries, {self.pages} pages, {self.bytes_received} bytes received")
+        return lines
+
+
+class CallbackModule(CallbackBase):
+    """ Aggregate the api_stats of the collection modules and report them at the end of the playbook """
+    CALLBACK_VERSION       = 2.0
+    CALLBACK_TYPE          = 'aggregate'
+    CALLBACK_NAME          = 'toucantoco.toucantoco.api_profile'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super().__init__(display=display)
+        self.profile = ApiProfile()
+
+    def collect(self, result):
+        """ Add the api_stats of a task result, or of each of its loop items """
+        module  = result._task.action
+        results = [result._result] + [r for r in result._result.get("results", []) if isinstance(r, dict)]
+        for r in results:
+            if isinstance(r.get("api_stats"), dict):
+                self.profile.add(module, r["api_stats"])
+
+    def v2_runner_on_ok(self, result):
+        self.collect(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.collect(result)
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.profile.tasks:
+            return
+
+        top = self.get_option("top")
+        self._display.banner("API PROFILE")
+        for line in self.profile.render(top):
+            self._display.display(line)
+
+        output_path = self.get_option("output_path")
+        if output_path:
+            with open(output_path, "w") as f:
+                json.dump(self.profile.to_dict(top), f, indent=2)
+            self._display.display(f"API profile written to {output_path}")
@@ -0,0 +1,123 @@
+import traceback
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    HAS_NUMPY          = False
+    NUMPY_IMPORT_ERROR = traceback.format_exc()
+else:
+    HAS_NUMPY          = True
+    NUMPY_IMPORT_ERROR = None
+
+from .pagination import betteruptime_items
+
+
+class IncidentHistory:
+    """ Start and end timestamps of the incidents of a monitor, the unresolved ones ending at +inf """
+    def __init__(self, ids=None, starts=None, ends=None, synced_at: float = None):
+        self.ids       = np.asarray(ids if ids is not None else [], dtype=np.int64)
+        self.starts    = np.asarray(starts if starts is not None else [], dtype=np.float64)
+        self.ends      = np.asarray(ends if ends is not None else [], dtype=np.float64)
+        self.synced_at = synced_at
+
+    @classmethod
+    def from_dict(cls, value: dict):
+        ends = [np.inf if e is None else e for e in value["ends"]]
+        return cls(value["ids"], value["starts"], ends, value["synced_at"])
+
+    def to_dict(self) -> dict:
+        """ Return the history as a json document, unresolved incidents ending at None """
+        ends = [None if np.isinf(e) else e for e in self.ends.tolist()]
+        return {"ids": self.ids.tolist(), "starts": self.starts.tolist(), "ends": ends, "synced_at": self.synced_at}
+
+    def sync_from(self):
+        """ Return the date from which the incidents must be listed again: the last sync, or the oldest unresolved incident """
+        if self.synced_at is None:
+            return None
+        since = min([self.synced_at, *self.starts[np.isinf(self.ends)].tolist()])
+        return datetime.fromtimestamp(since, timezone.utc).date()
+
+    def append(self, ids: list, starts: list, ends: list, synced_at: float):
+        """ Add the listed incidents, replacing the known ones that were listed again """
+        kept = ~np.isin(self.ids, ids)
+        self.ids       = np.concatenate([self.ids[kept], np.asarray(ids, dtype=np.int64)])
+        self.starts    = np.concatenate([self.starts[kept], np.asarray(starts, dtype=np.float64)])
+        self.ends      = np.concatenate([self.ends[kept], np.asarray(ends, dtype=np.float64)])
+        self.synced_at = synced_at
+
+    def downtime_intervals(self, now: float) -> tuple:
+        """ Return the sorted disjoint (starts, ends) of the downtime, overlapping incidents merged """
+        if not len(self.starts):
+            return np.empty(0), np.empty(0)
+        order  = np.argsort(self.starts, kind="stable")
+        starts = self.starts[order]
+        ends   = np.minimum(self.ends[order], now)
+
+        # An incident starts a new interval when it begins after every previous incident ended
+        reach     = np.maximum.accumulate(ends)
+        new       = np.empty(len(starts), dtype=bool)
+        new[0]    = True
+        new[1:]   = starts[1:] > reach[:-1]
+        firsts    = np.flatnonzero(new)
+        return starts[firsts], np.maximum.reduceat(ends, firsts)
+
+    def availability(self, window_starts, window_ends, now: float) -> dict:
+        """ Return the availability, total downtime and number of incidents of every [start, end) window """
+        window_starts = np.asarray(window_starts, dtype=np.float64)
+        window_ends   = np.minimum(np.asarray(window_ends, dtype=np.float64), now)
+
+        # Downtime elapsed before each window bound, from the cumulated length of the intervals before it
+        starts, ends = self.downtime_intervals(now)
+        cumulated    = np.concatenate([[0.0], np.cumsum(ends - starts)])
+
+        def elapsed(t):
+            if not len(starts):
+                return np.zeros_like(t)
+            i    = np.searchsorted(starts, t, side="right")
+            last = np.maximum(i - 1, 0)
+            return np.where(i > 0, cumulated[last] + np.minimum(t, ends[last]) - starts[last], 0.0)
+
+        duration  = np.maximum(window_ends - window_starts, 0)
+        downtime  = np.where(duration > 0, elapsed(window_ends) - elapsed(window_starts), 0)
+        sorted_s  = np.sort(self.starts)
+        sorted_e  = np.sort(np.minimum(self.ends, now))
+        incidents = np.searchsorted(sorted_s, window_ends, side="left") - np.searchsorted(sorted_e, window_starts, side="right")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            availability = np.where(duration > 0, 100 * (1 - downtime / duration), 100.0)
+        return {
+            "availability":        np.round(availability, 4).tolist(),
+            "total_downtime":      np.round(downtime).astype(np.int64).tolist(),
+            "number_of_incidents": np.maximum(incidents, 0).tolist(),
+        }
+
+
+def sync_incidents(client, api_url: str, monitor_id, history: IncidentHistory, now: float) -> IncidentHistory:
+    """ List the incidents of a monitor since the last sync of its history and append them """
+    since  = history.sync_from()
+    params = {"monitor_id": monitor_id, **({"from": since.isoformat()} if since is not None else {})}
+
+    ids, starts, ends = [], [], []
+    for item in betteruptime_items(client, api_url, params):
+        attributes = item["attributes"]
+        if not attributes or not attributes.get("started_at"):
+            continue
+        ids.append(int(item["id"]))
+        starts.append(incident_timestamp(attributes["started_at"]))
+        ends.append(incident_timestamp(attributes["resolved_at"]) if attributes.get("resolved_at") else np.inf)
+
+    history.append(ids, starts, ends, now)
+    return history
+
+
+def incident_timestamp(date_text: str) -> float:
+    """ Return the timestamp of a date of the API """
+    return datetime.fromisoformat(date_text.replace("Z", "+00:00")).timestamp()
+
+
+def window_bounds(windows: list) -> tuple:
+    """ Return the [start, end) timestamps of (first day, last day) windows """
+    def midnight(day):
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+    return [midnight(start) for start, _ in windows], [midnight(end + timedelta(days=1)) for _, end in windows]
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+
+DEFAULT_CACHE_TTLS = {
+    "default":  300,
+    "projects": 3600,
+    "policies": 3600,
+}
+
+
+def resource_name(url: str) -> str:
+    """ Return the resource listed by an url, i.e. its last path segment not being an id """
+    segments = [s for s in urllib.parse.urlsplit(url).path.split("/") if s and not s.isdigit()]
+    return segments[-1] if segments else ""
+
+
+def listed_path(url: str) -> str:
+    """ Return the path of an url without its query and trailing slash """
+    return urllib.parse.urlsplit(url).path.rstrip("/")
+
+
+def parent_paths(path: str) -> list:
+    """ Return a path and all its parents, down to the root """
+    segments = path.split("/")
+    return ["/".join(segments[:i]) for i in range(len(segments), 0, -1)]
+
+
+class ListingCache:
+    """ On disk cache of the API listings, shared by all the tasks and plays running on the host """
+    def __init__(self, directory: str, key: str, ttls: dict = None):
+        # Entries are only readable with the same API key, which is never written to the disk
+        self.directory = os.path.join(directory, hashlib.sha256(key.encode()).hexdigest()[:16])
+        self.ttls      = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def path_directory(self, path: str) -> str:
+        """ Return the directory of the listings of a path, so that a write only drops the directories of its own path """
+        return os.path.join(self.directory, "listings", hashlib.sha256(path.encode()).hexdigest()[:32])
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.path_directory(listed_path(url)), f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+    def record_path(self, key: str) -> str:
+        return os.path.join(self.directory, "records", f"{hashlib.sha256(key.encode()).hexdigest()}.json")
+
+    def ttl(self, url: str) -> int:
+        return int(self.ttls.get(resource_name(url), self.ttls["default"]))
+
+    def get(self, url: str):
+        """ Return the cached value of an url, None if missing or older than its resource TTL """
+        entry = read_entry(self.path(url))
+        if entry is None or time.time() - entry["stored_at"] > self.ttl(url):
+            return None
+        return entry["value"]
+
+    def set(self, url: str, value):
+        """ Store the value of an url, atomically for the other processes """
+        write_entry(self.path(url), {"url": url, "stored_at": time.time(), "value": value})
+
+    def get_record(self, key: str):
+        """ Return a value stored for good, None if missing """
+        entry = read_entry(self.record_path(key))
+        return entry["value"] if entry is not None else None
+
+    def set_record(self, key: str, value):
+        """ Store a value that never expires nor is invalidated by the writes, e.g. the SLA of a closed period """
+        write_entry(self.record_path(key), {"key": key, "stored_at": time.time(), "value": value})
+
+    def invalidate(self, url: str):
+        """ Drop the listings of the written path and of its parents, which the write may have changed """
+        for path in parent_paths(listed_path(url)):
+            directory = self.path_directory(path)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            # Entries being written by another process are left to it
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    continue
+
+
+def read_entry(path: str):
+    """ Return the entry stored in a file, None if missing or unreadable """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_entry(path: str, entry: dict):
+    """ Write an entry to a file through a temporary one, so that the other processes never read it half written """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
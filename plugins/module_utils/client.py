@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import ListingCache
+from .ratelimit import FileTokenBucket
+from .stats import ApiStats
+
+DEFAULT_TIMEOUT     = 30
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES     = 5
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX  = 30
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES     = {HTTPStatus.BAD_GATEWAY, HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.GATEWAY_TIMEOUT}
+
+API_CLIENT_FIELDS = {
+    "api_timeout":     {"required": False, "type": "int", "default": DEFAULT_TIMEOUT},
+    "api_concurrency": {"required": False, "type": "int", "default": DEFAULT_CONCURRENCY},
+    "api_retries":     {"required": False, "type": "int", "default": DEFAULT_RETRIES},
+    "api_rate_limit":  {"required": False, "type": "float"},
+    "api_cache_dir":   {"required": False, "type": "path"},
+    "api_cache_ttl":   {"required": False, "type": "dict"},
+    "collect_stats":   {"required": False, "type": "bool", "default": False},
+}
+
+
+class ApiError(Exception):
+    """ Raised when the API answers with an unexpected status code """
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} {response.url}: {response.text}")
+        self.response = response
+
+
+class AdaptiveLimiter:
+    """ AIMD limit of the calls in flight: halved when the API throttles, grown by one after a window of successes """
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit     = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def __exit__(self, *args):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_throttle(self):
+        """ Multiplicative decrease """
+        with self.condition:
+            self.limit     = max(self.limit // 2, 1)
+            self.successes = 0
+
+    def on_success(self):
+        """ Additive increase, once every call of the current window succeeded """
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit    += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+
+def retry_after(response) -> float:
+    """ Return the delay asked by the Retry-After header in seconds, None if missing """
+    value = response.headers.get("Retry-After")
+    if not isinstance(value, str):
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int) -> float:
+    """ Exponential backoff with full jitter """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class ApiClient:
+    """ HTTP client keeping one pool of keep-alive connections for all the calls of a module """
+    def __init__(self, headers: dict, timeout: int = DEFAULT_TIMEOUT, concurrency: int = DEFAULT_CONCURRENCY, retries: int = DEFAULT_RETRIES,
+                 rate_limit: float = None, cache_dir: str = None, cache_ttl: dict = None, collect_stats: bool = False):
+        self.timeout     = timeout
+        self.concurrency = max(concurrency, 1)
+        self.retries     = max(retries, 0)
+        self.limiter     = AdaptiveLimiter(self.concurrency)
+        self.bucket      = None
+        self.cache       = None
+        self.stats       = ApiStats() if collect_stats else None
+        self.session     = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip", **headers})
+
+        # One connection per concurrent call, so that no call waits for a free connection
+        adapter = HTTPAdapter(pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Shared by all the forks using the same API key
+        if rate_limit:
+            self.bucket = FileTokenBucket.for_key(str(headers.get("Authorization")), rate_limit)
+
+        if cache_dir:
+            self.cache = ListingCache(cache_dir, str(headers.get("Authorization")), cache_ttl)
+
+    @classmethod
+    def from_params(cls, params: dict, headers: dict):
+        """ Build a client from the module params, poping the client specific ones """
+        options = {k: params.pop(k) for k in API_CLIENT_FIELDS if k in params}
+        return cls(
+            headers,
+            timeout=options.get("api_timeout", DEFAULT_TIMEOUT),
+            concurrency=options.get("api_concurrency", DEFAULT_CONCURRENCY),
+            retries=options.get("api_retries", DEFAULT_RETRIES),
+            rate_limit=options.get("api_rate_limit"),
+            cache_dir=options.get("api_cache_dir"),
+            cache_ttl=options.get("api_cache_ttl"),
+            collect_stats=options.get("collect_stats", False),
+        )
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """ Send a request through the shared session, invalidating the cached listings it may change """
+        response = self.send(method, url, **kwargs)
+        if self.cache is not None and method not in ("GET", "HEAD", "OPTIONS") and response.ok:
+            self.cache.invalidate(url)
+        return response
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """ Send a request, retrying it when throttled or when it can safely be replayed """
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method in IDEMPOTENT_METHODS
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            if self.bucket is not None:
+                self.bucket.acquire()
+            with self.limiter:
+                try:
+                    start    = time.monotonic()
+                    response = self.session.request(method, url, **kwargs)
+                    if self.stats is not None:
+                        self.stats.record(method, url, response, time.monotonic() - start)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if not idempotent or last_attempt:
+                        raise
+                    delay = backoff(attempt)
+                else:
+                    # A throttled call was not processed, so it can be replayed whatever its method
+                    if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                        self.limiter.on_throttle()
+                    elif not (idempotent and response.status_code in RETRY_STATUSES):
+                        self.limiter.on_success()
+                        return response
+                    if last_attempt:
+                        return response
+                    delay = retry_after(response)
+                    if delay is None:
+                        delay = backoff(attempt)
+                    elif delay > BACKOFF_MAX:
+                        # Waiting that long would hold the task and the calls queued behind it, give up right away
+                        return response
+
+            # Wait outside of the limiter to let the other calls go on
+            if self.stats is not None:
+                self.stats.record_retry()
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url: str, params: dict = None, cached: bool = False):
+        """ Return the json document of an url, from the listing cache if enabled and asked for """
+        if not cached or self.cache is None:
+            response = self.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        key   = requests.Request("GET", url, params=params).prepare().url
+        value = self.cache.get(key)
+        if value is None:
+            response = self.get(url, params=params)
+            response.raise_for_status()
+            value = response.json()
+            self.cache.set(key, value)
+        return value
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
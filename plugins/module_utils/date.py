@@ -1,12 +1,8 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 
-def compare_date(a, b, attribute_list) -> bool:
-    """ Compare datetime object based on given attribute_list"""
-    """ Example of attribute_list: ["month", "day", "hour"] """
-    for att in attribute_list:
-        if getattr(a.astimezone(timezone.utc), att) != getattr(b.astimezone(timezone.utc), att):
-            return False
-    return True
+PAYLOAD_DATE_FORMAT = '%Y-%m-%dT%H:%M%z'
+API_DATE_FORMAT     = '%Y-%m-%dT%H:%M:%S.%fZ'
+GRANULARITIES       = ["day", "week", "month"]
 
 def validate_date(date_text, date_format) -> bool:
     """ Validate date str given a format """
@@ -15,3 +11,39 @@ def validate_date(date_text, date_format) -> bool:
         return True
     except ValueError:
         return False
+
+def minute_epoch(date_text) -> int:
+    """ Return the number of minutes between the epoch and a date formatted for the payload or by the API """
+    if date_text.endswith("Z"):
+        # Dates of the API are in UTC, their minute is parsed without the slower strptime
+        try:
+            return int(datetime.fromisoformat(date_text[:16]).replace(tzinfo=timezone.utc).timestamp()) // 60
+        except ValueError:
+            pass
+    for date_format in (API_DATE_FORMAT, PAYLOAD_DATE_FORMAT):
+        try:
+            dt = datetime.strptime(date_text, date_format)
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp()) // 60
+    raise ValueError(f"Unknown date format: {date_text}")
+
+def period_end(day: date, granularity: str) -> date:
+    """ Return the last day of the day, ISO week or month of a date """
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day + timedelta(days=6 - day.weekday())
+    next_month = day.replace(day=28) + timedelta(days=4)
+    return next_month - timedelta(days=next_month.day)
+
+def period_windows(start: date, end: date, granularity: str) -> list:
+    """ Return the (first day, last day) of every day, ISO week or month between two dates, clipped to them """
+    windows = []
+    while start <= end:
+        last = period_end(start, granularity)
+        windows.append((start, min(last, end)))
+        start = last + timedelta(days=1)
+    return windows
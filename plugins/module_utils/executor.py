@@ -0,0 +1,46 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .client import ApiError
+
+
+class ConcurrentExecutor:
+    """ Run independent API calls concurrently, reads or writes, collecting the failures instead of stopping at the first one """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.errors      = []
+
+    def run(self, calls) -> list:
+        """ Run a wave of independent calls, return their results in order (None for the failed ones) """
+        calls = list(calls)
+        if self.max_workers <= 1 or len(calls) <= 1:
+            return [self._call(call) for call in calls]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as pool:
+            return list(pool.map(self._call, calls))
+
+    def stream(self, calls):
+        """ Lazily run the calls of an iterable, yielding their results in order with at most twice max_workers of them pending """
+        if self.max_workers <= 1:
+            for call in calls:
+                yield self._call(call)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            for call in calls:
+                pending.append(pool.submit(self._call, call))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _call(self, call):
+        try:
+            return call()
+        except (ApiError, requests.exceptions.RequestException) as e:
+            # list.append is atomic, no lock needed
+            self.errors.append(str(e))
+            return None
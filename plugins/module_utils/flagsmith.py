@@ -1,23 +1,75 @@
+import weakref
+
 import requests
 
-def get_project_ids_from_names(base_url: str, headers: dict, projects_names: list) -> list:
-    """ Return the ids of the matching projects"""
-    response = requests.get(f"{base_url}/projects/", headers=headers)
-    if response.status_code != 200:
-        return []
-    json_object = response.json()
-    return [i['id'] for i in json_object if i['name'] in projects_names]
+from .pagination import flagsmith_items
+
+# Resolvers of each client, so that the indexes are built once per process whatever the number of lookups
+_RESOLVERS = weakref.WeakKeyDictionary()
+
+
+class FlagsmithLookupError(Exception):
+    """ Raised with every name that could not be resolved at once """
+    def __init__(self, kind: str, names: list):
+        super().__init__(f"{kind} not found: {', '.join(names)}")
+        self.names = names
 
-def get_tag_ids_from_labels(url: str, headers: dict, project_id: int, tags_labels: list) -> list:
-    """ Return the ids of the matching tags"""
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        return []
 
-    json_object = response.json()
-    ids = [i['id'] for i in json_object['results'] if i['label'] in tags_labels]
+class FlagsmithResolver:
+    """ Name to id indexes of the projects and of the tags of each project, built on first use """
+    def __init__(self, client, base_url: str):
+        self.client   = client
+        self.base_url = base_url
+        self.projects = None
+        self.tags     = {}
 
-    if len(ids) != len(tags_labels) and json_object['next'] is not None:
-        ids = ids + get_tag_ids_from_labels(json_object['next'], headers, project_id, tags_labels)
+    @classmethod
+    def for_client(cls, client, base_url: str):
+        """ Return the resolver shared by all the lookups made with a client """
+        resolvers = _RESOLVERS.setdefault(client, {})
+        if base_url not in resolvers:
+            resolvers[base_url] = cls(client, base_url)
+        return resolvers[base_url]
 
-    return ids
+    def project_index(self) -> dict:
+        """ Return the project name -> id index, raise requests.HTTPError if the listing fails """
+        if self.projects is None:
+            projects = {}
+            for project in self.client.get_json(f"{self.base_url}/projects/", cached=True):
+                projects.setdefault(project["name"], project["id"])
+            self.projects = projects
+        return self.projects
+
+    def tag_index(self, project_id: int, url: str = None) -> dict:
+        """ Return the tag label -> id index of a project, raise requests.HTTPError if the listing fails """
+        if project_id not in self.tags:
+            tags = {}
+            for tag in flagsmith_items(self.client, url or f"{self.base_url}/projects/{project_id}/tags/", cached=True):
+                tags.setdefault(tag["label"], tag["id"])
+            self.tags[project_id] = tags
+        return self.tags[project_id]
+
+    def project_id(self, name: str) -> int:
+        """ Return the id of a project, raise FlagsmithLookupError if it does not exist """
+        index = self.project_index()
+        if name not in index:
+            raise FlagsmithLookupError("Project", [name])
+        return index[name]
+
+    def tag_ids(self, project_id: int, labels: list, url: str = None) -> list:
+        """ Return the ids of the tags in their listing order, raise FlagsmithLookupError with all the missing ones """
+        index   = self.tag_index(project_id, url)
+        missing = [label for label in labels if label not in index]
+        if missing:
+            raise FlagsmithLookupError("Tags", missing)
+        wanted = set(labels)
+        return [i for label, i in index.items() if label in wanted]
+
+
+def get_project_ids_from_names(client, base_url: str, projects_names: list) -> list:
+    """ Return the ids of the matching projects"""
+    try:
+        index = FlagsmithResolver.for_client(client, base_url).project_index()
+    except requests.exceptions.HTTPError:
+        return []
+    return [i for name, i in index.items() if name in projects_names]
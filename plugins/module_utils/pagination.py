@@ -0,0 +1,33 @@
+BETTERUPTIME_PAGE_SIZE = 250
+FLAGSMITH_PAGE_SIZE    = 999
+
+
+def paginate(client, url: str, items_key: str, next_url, params: dict = None, cached: bool = False):
+    """ Lazily yield the items of a paginated listing, one page in memory at a time """
+    while url is not None:
+        json_object = client.get_json(url, params, cached)
+        if client.stats is not None:
+            client.stats.record_page()
+
+        yield from json_object[items_key]
+
+        # The next link already embeds the query parameters
+        url    = next_url(json_object)
+        params = None
+
+
+def betteruptime_items(client, url: str, params: dict = None, cached: bool = False):
+    """ Lazily yield the items of a BetterUptime listing """
+    params = {"per_page": BETTERUPTIME_PAGE_SIZE, **(params or {})}
+    return paginate(client, url, "data", lambda j: (j.get("pagination") or {}).get("next"), params, cached)
+
+
+def flagsmith_items(client, url: str, params: dict = None, cached: bool = False):
+    """ Lazily yield the items of a Flagsmith listing """
+    params = {"page_size": FLAGSMITH_PAGE_SIZE, **(params or {})}
+    return paginate(client, url, "results", lambda j: j.get("next"), params, cached)
+
+
+def find_first(items, predicate):
+    """ Return the first item matching the predicate, stopping the iteration there """
+    return next((i for i in items if predicate(i)), None)
@@ -1,9 +1,44 @@
+import hashlib
+import json
+
+UNSET = "<unset>"
 
 
 def sanitize_payload(payload: dict) -> dict:
     """ Return a dict without None fields """
     return {k:v for (k,v) in payload.items() if v is not None}
 
-def diff_attributes(payload: dict, compare: dict) -> dict:
+def canonical(value, unordered: bool = False):
+    """ Return a comparable form of a json value, with its lists sorted when their order does not matter """
+    if isinstance(value, dict):
+        return {k: canonical(v, unordered) for (k,v) in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [canonical(v, unordered) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True)) if unordered else items
+    return value
+
+def diff_payload(payload: dict, compare: dict, unordered=()) -> tuple:
+    """ Return the attributes of the payload that differ from the compared ones, and a readable line for each of them.
+    The lists of the unordered fields are compared as sets, at any depth """
+    patch   = {}
+    changes = []
+    for key, value in payload.items():
+        if key in compare and canonical(value, key in unordered) == canonical(compare[key], key in unordered):
+            continue
+        patch[key] = value
+        before     = json.dumps(compare[key], sort_keys=True) if key in compare else UNSET
+        changes.append(f"{key}: {before} -> {json.dumps(value, sort_keys=True)}")
+    return patch, changes
+
+def diff_attributes(payload: dict, compare: dict, unordered=()) -> dict:
     """ Return a dict with all the attributes that are only present in the payload"""
-    return {k:v for (k,v) in payload.items() if (k,v) not in compare.items()}
+    return diff_payload(payload, compare, unordered)[0]
+
+def diff_result(module, changes: list) -> dict:
+    """ Return the diff to add to the result of a module run with --diff """
+    return {"diff": {"prepared": "\n".join(changes)}} if module._diff and changes else {}
+
+def fingerprint(value) -> str:
+    """ Return a hash of a json value, independent of the order of its keys """
+    dumped = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(dumped.encode()).hexdigest()
@@ -0,0 +1,53 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class FileTokenBucket:
+    """ Token bucket shared by every process of the host through a lock protected file """
+    def __init__(self, path: str, rate: float, burst: float = None):
+        self.path  = path
+        self.rate  = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+
+    @classmethod
+    def for_key(cls, key: str, rate: float, directory: str = None):
+        """ Return the bucket of an API key, the key itself never being written to the disk """
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return cls(os.path.join(directory or tempfile.gettempdir(), f"toucantoco-ratelimit-{digest}.json"), rate)
+
+    def acquire(self):
+        """ Take a token, waiting until one is available """
+        wait = self.take()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.take()
+
+    def take(self) -> float:
+        """ Take a token if available, return the time to wait before the next one otherwise """
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                f.seek(0)
+                try:
+                    state = json.loads(f.read())
+                    tokens = min(self.burst, state["tokens"] + (now - state["updated_at"]) * self.rate)
+                except (ValueError, KeyError):
+                    tokens = self.burst
+
+                wait = 0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                json.dump({"tokens": tokens, "updated_at": now}, f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
@@ -0,0 +1,103 @@
+import functools
+import math
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def endpoint(method: str, url: str) -> str:
+    """ Return the method and the path of an url, its ids replaced by a placeholder """
+    return f"{method} {ID_SEGMENT.sub('/{id}', urlsplit(url).path)}"
+
+
+def latency_bucket(elapsed_ms: float) -> str:
+    """ Return the histogram bucket of a latency """
+    for bound in LATENCY_BUCKETS_MS:
+        if elapsed_ms <= bound:
+            return f"<={bound}"
+    return f">{LATENCY_BUCKETS_MS[-1]}"
+
+
+def percentile(values: list, p: float) -> float:
+    """ Nearest rank percentile of sorted values """
+    if not values:
+        return None
+    return values[max(math.ceil(p * len(values)) - 1, 0)]
+
+
+def response_size(response) -> int:
+    """ Return the size of a response body as received, compressed or not, from its Content-Length when sent """
+    length = response.headers.get("Content-Length")
+    if isinstance(length, str) and length.isdigit():
+        return int(length)
+    return len(response.content or b"")
+
+
+class ApiStats:
+    """ Counters of the API calls made by a client, fed by the client itself """
+    def __init__(self):
+        self.lock           = threading.Lock()
+        self.endpoints      = Counter()
+        self.endpoints_time = Counter()
+        self.histogram      = Counter()
+        self.latencies      = []
+        self.bytes_received = 0
+        self.retries        = 0
+        self.pages          = 0
+
+    def record(self, method: str, url: str, response, elapsed: float):
+        with self.lock:
+            key = endpoint(method, url)
+            self.endpoints[key]      += 1
+            self.endpoints_time[key] += elapsed * 1000
+            self.histogram[latency_bucket(elapsed * 1000)] += 1
+            self.latencies.append(elapsed)
+            self.bytes_received += response_size(response)
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_page(self):
+        with self.lock:
+            self.pages += 1
+
+    def summary(self) -> dict:
+        """ Return the stats as module results """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                "requests":       sum(self.endpoints.values()),
+                "endpoints":      dict(self.endpoints),
+                "endpoints_ms":   {k: round(v, 1) for k, v in self.endpoints_time.items()},
+                "bytes_received": self.bytes_received,
+                "latency_ms":     {k: None if v is None else round(v * 1000, 1) for k, v in (
+                    ("p50", percentile(latencies, 0.5)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("max", latencies[-1] if latencies else None),
+                )},
+                "histogram_ms":   dict(self.histogram),
+                "retries":        self.retries,
+                "pages":          self.pages,
+            }
+
+
+def report_stats(module, client):
+    """ Add the api_stats of the client to every result of the module, when they are collected """
+    if client.stats is None:
+        return
+
+    def with_stats(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            return method(*args, **kwargs, api_stats=client.stats.summary())
+        return wrapper
+
+    module.exit_json = with_stats(module.exit_json)
+    module.fail_json = with_stats(module.fail_json)
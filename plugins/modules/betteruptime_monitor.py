@@ -1,18 +1,25 @@
 #!/usr/bin/python
 
 import urllib
+from collections import Counter
 from http import HTTPStatus
 
 import requests
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.payload import sanitize_payload
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.stats import report_stats
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.pagination import betteruptime_items, find_first
+from ..module_utils.payload import diff_payload, diff_result, sanitize_payload
 
 API_MONITORS_BASE_URL = "https://betteruptime.com/api/v2/monitors"
 API_POLICIES_BASE_URL = "https://betteruptime.com/api/v2/policies"
 
-MONITOR_FIELDS = {
-    "api_key":               {"required": True, "type": "str", "no_log": True},
+# Fields whose order is not meaningful to the API, compared as sets
+MONITOR_UNORDERED_FIELDS = ("regions", "expected_status_codes")
+
+MONITOR_OPTIONS = {
     "url":                   {"required": True, "type": "str"},
     "state":                 {"required": True, "choices": ["present", "absent"], "type": "str"},
     "monitor_type":          {
@@ -75,133 +82,254 @@ MONITOR_REQUIRED_IF = [
     ("monitor_type", "keyword_absence", ("required_keyword",)),
 ]
 
+# Either a single monitor described by the top level options, or a list of them in "monitors"
+MONITOR_FIELDS = {
+    **MONITOR_OPTIONS,
+    "api_key":               {"required": True, "type": "str", "no_log": True},
+    "url":                   {"required": False, "type": "str"},
+    "state":                 {"required": False, "choices": ["present", "absent"], "type": "str"},
+    "monitors":              {
+      "required":            False,
+      "type":                "list",
+      "elements":            "dict",
+      "options":             MONITOR_OPTIONS,
+      "required_if":         MONITOR_REQUIRED_IF,
+    },
+    **API_CLIENT_FIELDS,
+}
+
+MONITOR_MUTUALLY_EXCLUSIVE = [("url", "monitors")]
+MONITOR_REQUIRED_ONE_OF    = [("url", "monitors")]
+MONITOR_REQUIRED_BY        = {"url": ("state",)}
+
 
 class BetterUptimeEscalationPolicy:
-    def __init__(self, headers, name):
-        self.headers = headers
+    def __init__(self, client, name):
+        self.client  = client
         self.name    = name
         self.id      = None
 
     def retrieve_id(self):
         """ Retrieve the id of an escalation policy if it exists """
-        response = requests.get(API_POLICIES_BASE_URL, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["name"] == self.name:
-                self.id = item["id"]
-                return
+        item = find_first(betteruptime_items(self.client, API_POLICIES_BASE_URL, cached=True), lambda i: i["attributes"] and i["attributes"]["name"] == self.name)
+        if item is not None:
+            self.id = item["id"]
 
 class BetterUptimeMonitor:
-    def __init__(self, module):
+    def __init__(self, module, payload=None, client=None):
         self.module               = module
-        self.payload              = module.params
-        self.api_key              = self.payload.pop("api_key")
+        self.payload              = module.params if payload is None else payload
+
+        if client is None:
+            self.api_key          = self.payload.pop("api_key")
+            self.headers          = {"Authorization": f"Bearer {self.api_key}"}
+            self.client           = ApiClient.from_params(self.payload, self.headers)
+            report_stats(module, self.client)
+            self.payload.pop("monitors", None)
+        else:
+            self.client           = client
+
         self.metadata             = self.payload.pop("metadata")
         self.state                = self.payload.pop("state")
         self.policy_name          = self.payload.pop("policy_name")
-        self.headers              = {"Authorization": f"Bearer {self.api_key}"}
         self.id                   = None
         self.retrieved_attributes = None
+        self.changes              = []
 
         self.payload = sanitize_payload(self.payload)
 
-    def retrieve_id(self, api_url):
-        """ Retrieve the id of a monitor if it exists """
-        response = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
+    def key(self) -> tuple:
+        """ Return the (url, port) couple identifying the monitor """
+        return (self.payload["url"], self.payload.get("port"))
 
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["url"] == self.payload["url"]:
-                if  ("port" not in self.payload and ("port" not in item["attributes"] or item["attributes"]["port"] is None)) or\
-                    ("port" in self.payload and "port" in item["attributes"] and item["attributes"]["port"] == self.payload["port"]):
-                    self.id = item["id"]
-                    self.retrieved_attributes = item["attributes"]
-                    return
+    def match(self, attributes) -> bool:
+        """ Check if the attributes of a retrieved monitor match the wanted url and port """
+        return bool(attributes) and monitor_key(attributes) == self.key()
 
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_id(json_object["pagination"]["next"])
+    def retrieve_id(self, api_url):
+        """ Retrieve the id of a monitor if it exists """
+        item = find_first(betteruptime_items(self.client, api_url), lambda i: self.match(i["attributes"]))
+        if item is not None:
+            self.id = item["id"]
+            self.retrieved_attributes = item["attributes"]
 
     def retrieve_policy_id(self):
         """ Retreve the policy id """
         if self.policy_name is not None:
-            policy = BetterUptimeEscalationPolicy(self.headers, self.policy_name)
+            policy = BetterUptimeEscalationPolicy(self.client, self.policy_name)
             policy.retrieve_id()
             self.payload["policy_id"] = policy.id
 
     def diff_attributes(self):
         """ Update the payload to only have the diff between the wanted and the existed attributes """
-        diff_attributes = {}
-        for key in self.payload:
-            if key == "request_headers":
-                same = all(i in [{"name": j["name"], "value": j["value"]} for j in self.retrieved_attributes[key]] for i in self.payload[key])
-                if not same or len(self.retrieved_attributes[key]) != len(self.payload[key]):
-                    destroyed_headers = [{"id": i["id"], "_destroy": True} for i in self.retrieved_attributes[key]]
-                    self.payload[key] = self.payload[key] + destroyed_headers
-                    diff_attributes[key] = self.payload[key]
-            elif key not in self.retrieved_attributes or self.retrieved_attributes[key] != self.payload[key]:
-                diff_attributes[key] = self.payload[key]
-
-        self.payload = diff_attributes
+        headers = self.payload.pop("request_headers", None)
+        self.payload, self.changes = diff_payload(self.payload, self.retrieved_attributes, MONITOR_UNORDERED_FIELDS)
+
+        if headers is not None:
+            headers = diff_request_headers(self.retrieved_attributes.get("request_headers") or [], headers)
+            if headers:
+                self.payload["request_headers"] = headers
+                self.changes.append(f"request_headers: {len(headers)} header(s) changed")
 
     def create(self):
         """ Create a new montitor """
-        resp = requests.post(API_MONITORS_BASE_URL, headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.post(API_MONITORS_BASE_URL, json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["data"]["id"]
 
-    def update(self):
-        """ Update an existing montitor """
+    def update(self) -> bool:
+        """ Update an existing montitor, return whether something changed """
         self.diff_attributes()
         if not self.payload:
-            self.module.exit_json(changed=False)
+            return False
 
-        resp = requests.patch(f"{API_MONITORS_BASE_URL}/{self.id}", headers=self.headers, json=self.payload)
+        resp = self.client.patch(f"{API_MONITORS_BASE_URL}/{self.id}", json=self.payload)
 
-        if resp.status_code == HTTPStatus.OK:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=resp.content)
+        if resp.status_code != HTTPStatus.OK:
+            raise ApiError(resp)
+        return True
 
     def delete(self):
         """ Delete an existing montitor """
-        resp = requests.delete(f"{API_MONITORS_BASE_URL}/{self.id}", headers=self.headers)
-        if resp.status_code == HTTPStatus.NO_CONTENT:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=resp.content)
-
-    def manage_monitor(self):
-        """ Manage state of a montitor """
-        self.retrieve_policy_id()
-        self.retrieve_id(f"{API_MONITORS_BASE_URL}?url={urllib.parse.quote(self.payload['url'])}")
+        resp = self.client.delete(f"{API_MONITORS_BASE_URL}/{self.id}")
+        if resp.status_code != HTTPStatus.NO_CONTENT:
+            raise ApiError(resp)
 
+    def reconcile(self) -> bool:
+        """ Bring the monitor to its wanted state, return whether it changed """
         if self.state == "present":
             if not self.id:
                 self.create()
-            else:
-                self.update()
-        elif self.state == "absent":
-            if not self.id:
-                self.module.exit_json(changed=False, msg="No test to delete with the specified url")
-            else:
-                self.delete()
+                return True
+            return self.update()
+        elif self.state == "absent" and self.id:
+            self.delete()
+            return True
+        return False
+
+    def manage_monitor(self):
+        """ Manage state of a montitor """
+        try:
+            self.retrieve_policy_id()
+            self.retrieve_id(f"{API_MONITORS_BASE_URL}?url={urllib.parse.quote(self.payload['url'])}")
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+
+        if self.state == "absent" and not self.id:
+            self.module.exit_json(changed=False, msg="No test to delete with the specified url")
+
+        try:
+            self.module.exit_json(changed=self.reconcile(), **diff_result(self.module, self.changes))
+        except ApiError as e:
+            self.module.fail_json(msg=str(e))
+
+
+class BetterUptimeMonitors:
+    """ Reconcile a whole list of monitors against a single listing of the account """
+    def __init__(self, module):
+        self.module   = module
+        self.payload  = module.params
+        self.headers  = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client   = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor = ConcurrentExecutor(self.client.concurrency)
+        self.monitors = [BetterUptimeMonitor(module, monitor, self.client) for monitor in self.payload.pop("monitors")]
+
+    def check_duplicates(self):
+        """ Fail if the same (url, port) is declared more than once """
+        duplicates = [key for key, count in Counter(monitor.key() for monitor in self.monitors).items() if count > 1]
+        if duplicates:
+            self.module.fail_json(msg=f"Monitors declared more than once: {sorted(duplicates, key=str)}")
+
+    def retrieve_policy_ids(self):
+        """ Resolve the policy id of every monitor from a single listing of the policies """
+        if all(monitor.policy_name is None for monitor in self.monitors):
+            return
+
+        policies = {i["attributes"]["name"]: i["id"] for i in betteruptime_items(self.client, API_POLICIES_BASE_URL, cached=True) if i["attributes"]}
+        for monitor in self.monitors:
+            if monitor.policy_name is not None:
+                monitor.payload["policy_id"] = policies.get(monitor.policy_name)
+
+    def retrieve_ids(self):
+        """ Set the id of every existing monitor from a single listing of the account """
+        index = {}
+        for item in betteruptime_items(self.client, API_MONITORS_BASE_URL):
+            if item["attributes"]:
+                index.setdefault(monitor_key(item["attributes"]), item)
+
+        for monitor in self.monitors:
+            item = index.get(monitor.key())
+            if item is not None:
+                monitor.id                   = item["id"]
+                monitor.retrieved_attributes = item["attributes"]
+
+    def manage_monitors(self):
+        """ Manage state of all the monitors """
+        self.check_duplicates()
+        try:
+            self.retrieve_policy_ids()
+            self.retrieve_ids()
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+
+        # Keys are computed first since reconciling reduces the payloads to their diff
+        keys = [monitor.key() for monitor in self.monitors]
+
+        # Monitors are independent from each other, reconcile them concurrently
+        results = []
+        for (url, port), monitor, changed in zip(keys, self.monitors, self.executor.run([m.reconcile for m in self.monitors])):
+            results.append({"url": url, "port": port, "state": monitor.state, "id": monitor.id, "changed": bool(changed), "failed": changed is None})
+
+        changed = any(r["changed"] for r in results)
+        if self.executor.errors:
+            self.module.fail_json(msg="Failed to reconcile some monitors", errors=self.executor.errors, changed=changed, monitors=results)
+
+        self.module.exit_json(changed=changed, monitors=results)
+
+
+def monitor_key(attributes) -> tuple:
+    """ Return the (url, port) couple identifying a retrieved monitor """
+    return (attributes["url"], attributes.get("port"))
+
+def diff_request_headers(retrieved: list, wanted: list) -> list:
+    """ Return the header changes only, keyed by name: new headers, changed values and destroyed headers """
+    existing = {}
+    changes  = []
+    for header in retrieved:
+        if header["name"] in existing:
+            # Duplicated header, only the first one is kept
+            changes.append({"id": header["id"], "_destroy": True})
+        else:
+            existing[header["name"]] = header
+
+    for header in wanted:
+        current = existing.pop(header["name"], None)
+        if current is None:
+            changes.append({"name": header["name"], "value": header["value"]})
+        elif current["value"] != header["value"]:
+            changes.append({"id": current["id"], "name": header["name"], "value": header["value"]})
+
+    return changes + [{"id": header["id"], "_destroy": True} for header in existing.values()]
 
 def main():
     module = AnsibleModule(
       argument_spec=MONITOR_FIELDS,
       supports_check_mode=True,
-      required_if=MONITOR_REQUIRED_IF
+      required_if=MONITOR_REQUIRED_IF,
+      mutually_exclusive=MONITOR_MUTUALLY_EXCLUSIVE,
+      required_one_of=MONITOR_REQUIRED_ONE_OF,
+      required_by=MONITOR_REQUIRED_BY,
     )
 
-    monitor_object = BetterUptimeMonitor(module)
+    if module.check_mode:
+        return module.exit_json(changed=False)
 
-    if not module.check_mode:
-        monitor_object.manage_monitor()
+    if module.params["monitors"] is not None:
+        BetterUptimeMonitors(module).manage_monitors()
     else:
-        return module.exit_json(changed=False)
+        BetterUptimeMonitor(module).manage_monitor()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+"""
+Compute the availability of monitors from their incident history
+"""
+
+#!/usr/bin/python
+
+import re
+import time
+from datetime import date, datetime, timezone
+
+import requests
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+
+from ..module_utils.availability import HAS_NUMPY, NUMPY_IMPORT_ERROR, IncidentHistory, sync_incidents, window_bounds
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient
+from ..module_utils.date import GRANULARITIES, period_windows
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.pagination import betteruptime_items
+from ..module_utils.stats import report_stats
+
+API_MONITORS_BASE_URL  = "https://betteruptime.com/api/v2/monitors"
+API_INCIDENTS_BASE_URL = "https://betteruptime.com/api/v2/incidents"
+
+MONITOR_AVAILABILITY_FIELDS = {
+    "api_key":     {"required": True, "type": "str", "no_log": True},
+    "url":         {"required": False, "type": "str"},
+    "urls":        {"required": False, "type": "list", "elements": "str"},
+    "url_pattern": {"required": False, "type": "str"},
+    "from":        {"required": True, "type": "str"},
+    "to":          {"required": False, "type": "str"},
+    "granularity": {"required": False, "type": "str", "choices": GRANULARITIES},
+    **API_CLIENT_FIELDS,
+}
+
+MONITOR_AVAILABILITY_MUTUALLY_EXCLUSIVE = [("url", "urls", "url_pattern")]
+MONITOR_AVAILABILITY_REQUIRED_ONE_OF    = [("url", "urls", "url_pattern")]
+
+
+class BetterUptimeMonitorAvailability:
+    """ Availability of monitors over a set of windows, computed from their incidents listed once """
+    def __init__(self, module):
+        self.module      = module
+        self.payload     = module.params
+        self.headers     = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client      = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor    = ConcurrentExecutor(self.client.concurrency)
+        self.url         = self.payload.pop("url")
+        self.urls        = [self.url] if self.url is not None else self.payload.pop("urls")
+        self.url_pattern = compile_pattern(module, self.payload.pop("url_pattern"))
+        self.granularity = self.payload.pop("granularity")
+        self.now         = time.time()
+        self.windows     = self.retrieve_windows()
+
+    def retrieve_windows(self) -> list:
+        """ Return the windows between the from and to dates (today by default), a single one without granularity """
+        try:
+            start = date.fromisoformat(self.payload["from"])
+            end   = date.fromisoformat(self.payload["to"]) if self.payload.get("to") else datetime.now(timezone.utc).date()
+        except ValueError:
+            self.module.fail_json(msg="Wrong date format for from or to, expected YYYY-MM-DD")
+        if self.granularity is None:
+            return [(start, end)] if start <= end else []
+        return period_windows(start, end, self.granularity)
+
+    def match(self, url: str) -> bool:
+        """ Check if a monitor url is one of the wanted ones """
+        if self.urls is not None:
+            return url in self.urls
+        return self.url_pattern.search(url) is not None
+
+    def retrieve_monitors(self) -> dict:
+        """ Return the attributes and id of the wanted monitors indexed by url, failing with all the missing urls at once """
+        monitors = {}
+        try:
+            for item in betteruptime_items(self.client, API_MONITORS_BASE_URL):
+                if item["attributes"] and self.match(item["attributes"]["url"]):
+                    monitors.setdefault(item["attributes"]["url"], {**item["attributes"], "id": item["id"]})
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+
+        missing = [url for url in self.urls or [] if url not in monitors]
+        if missing:
+            self.module.fail_json(msg=f"Monitors not found: {', '.join(missing)}")
+        return monitors
+
+    def retrieve_history(self, monitor_id) -> IncidentHistory:
+        """ Return the incident history of a monitor, only listing the incidents since its last sync when it is cached """
+        key     = f"{API_INCIDENTS_BASE_URL}?monitor_id={monitor_id}"
+        history = self.cached_history(key) if self.client.cache is not None else IncidentHistory()
+
+        sync_incidents(self.client, API_INCIDENTS_BASE_URL, monitor_id, history, self.now)
+        if self.client.cache is not None:
+            try:
+                self.client.cache.set_record(key, history.to_dict())
+            except OSError:
+                # Not kept for the next run, which lists the incidents in full again
+                pass
+        return history
+
+    def cached_history(self, key: str) -> IncidentHistory:
+        """ Return the cached history of a monitor, an empty one listing all its incidents when missing or unreadable """
+        try:
+            cached = self.client.cache.get_record(key)
+            return IncidentHistory.from_dict(cached) if cached is not None else IncidentHistory()
+        except (OSError, ValueError, KeyError, TypeError):
+            return IncidentHistory()
+
+    def compute(self, history: IncidentHistory) -> list:
+        """ Return the availability of every window """
+        starts, ends = window_bounds(self.windows)
+        computed     = history.availability(starts, ends, self.now)
+        return [
+            {"from": start.isoformat(), "to": end.isoformat(), **{k: v[i] for k, v in computed.items()}}
+            for i, (start, end) in enumerate(self.windows)
+        ]
+
+    def result(self, monitor: dict, series: list) -> dict:
+        if self.granularity is None:
+            return {**series[0], "monitor_creation_date": monitor["created_at"]}
+        return {"series": series, "monitor_creation_date": monitor["created_at"]}
+
+    def manage(self):
+        """ Manage the availability computation of all the monitors """
+        if not self.windows:
+            self.module.fail_json(msg="The from date should not be after the to date")
+        monitors = self.retrieve_monitors()
+
+        # Histories are independent from each other, list them concurrently within the client concurrency
+        histories = self.executor.run([lambda m=m: self.retrieve_history(m["id"]) for m in monitors.values()])
+
+        result = {}
+        for (url, monitor), history in zip(monitors.items(), histories):
+            if history is not None:
+                result[url] = self.result(monitor, self.compute(history))
+
+        if self.executor.errors:
+            self.module.fail_json(msg="Failed to list the incidents of some monitors", errors=self.executor.errors, slas=result)
+
+        if self.url is not None:
+            self.module.exit_json(changed=False, **result[self.url])
+        self.module.exit_json(changed=False, slas=result)
+
+
+def compile_pattern(module, pattern: str):
+    """ Return the compiled url pattern, None if not set, failing if it is not a valid regular expression """
+    if pattern is None:
+        return None
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        module.fail_json(msg=f"Invalid url_pattern {pattern}: {e}")
+
+
+def main():
+    module = AnsibleModule(
+      argument_spec=MONITOR_AVAILABILITY_FIELDS,
+      supports_check_mode=True,
+      mutually_exclusive=MONITOR_AVAILABILITY_MUTUALLY_EXCLUSIVE,
+      required_one_of=MONITOR_AVAILABILITY_REQUIRED_ONE_OF,
+    )
+
+    if not HAS_NUMPY:
+        module.fail_json(msg=missing_required_lib("numpy"), exception=NUMPY_IMPORT_ERROR)
+
+    BetterUptimeMonitorAvailability(module).manage()
+
+
+if __name__ == "__main__":
+    main()
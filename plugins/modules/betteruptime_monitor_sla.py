@@ -4,23 +4,47 @@ Fetch SLA for monitors
 
 #!/usr/bin/python
 
+import csv
+import json
+import os
+import re
+import tempfile
+import time
 import urllib
+from datetime import date, datetime, timezone
+from http import HTTPStatus
 
 import requests
 from ansible.module_utils.basic import AnsibleModule
-from requests.models import PreparedRequest
 
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.stats import report_stats
+from ..module_utils.pagination import betteruptime_items, find_first
 from ..module_utils.payload import sanitize_payload
+from ..module_utils.date import GRANULARITIES, period_windows
 
 API_MONITORS_BASE_URL = "https://betteruptime.com/api/v2/monitors"
 
+EXPORT_COLUMNS = ["url", "monitor_id", "from", "to", "availability", "total_downtime", "number_of_incidents", "longest_incident", "average_incident"]
+
+# Either the SLA of a single monitor, or of every monitor of "urls" or matching "url_pattern"
 MONITOR_SLA_FIELDS = {
-    "api_key": {"required": True, "type": "str", "no_log": True},
-    "url":     {"required": True, "type": "str"},
-    "from":    {"required": False, "type": "str"},
-    "to":      {"required": False, "type": "str"},
+    "api_key":       {"required": True, "type": "str", "no_log": True},
+    "url":           {"required": False, "type": "str"},
+    "urls":          {"required": False, "type": "list", "elements": "str"},
+    "url_pattern":   {"required": False, "type": "str"},
+    "from":          {"required": False, "type": "str"},
+    "to":            {"required": False, "type": "str"},
+    "granularity":   {"required": False, "type": "str", "choices": GRANULARITIES},
+    "export_path":   {"required": False, "type": "path"},
+    "export_format": {"required": False, "type": "str", "choices": ["csv", "jsonl"], "default": "csv"},
+    **API_CLIENT_FIELDS,
 }
 
+MONITOR_SLA_MUTUALLY_EXCLUSIVE = [("url", "urls", "url_pattern"), ("url", "export_path")]
+MONITOR_SLA_REQUIRED_ONE_OF    = [("url", "urls", "url_pattern")]
+MONITOR_SLA_REQUIRED_BY        = {"granularity": ("from",)}
 
 
 class BetterUptimeMonitorSLA:
@@ -28,8 +52,16 @@ class BetterUptimeMonitorSLA:
         self.module  = module
         self.payload = module.params
         self.headers = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client  = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor = ConcurrentExecutor(self.client.concurrency)
 
         self.monitor_url            = self.payload.pop('url')
+        self.granularity            = self.payload.pop('granularity', None)
+        self.payload.pop('urls', None)
+        self.payload.pop('url_pattern', None)
+        self.payload.pop('export_path', None)
+        self.payload.pop('export_format', None)
         self.monitor_id             = None
         self.monitor_attributes     = None
         self.monitor_sla_attributes = None
@@ -38,37 +70,36 @@ class BetterUptimeMonitorSLA:
 
     def retrieve_monitor_id(self, api_url):
         """ Retrieve the id of a monitor if it exists """
-        response = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["url"] == self.monitor_url:
-                self.monitor_id = item["id"]
-                self.monitor_attributes = item["attributes"]
-                return
-
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_monitor_id(json_object["pagination"]["next"])
+        item = find_first(betteruptime_items(self.client, api_url), lambda i: i["attributes"] and i["attributes"]["url"] == self.monitor_url)
+        if item is not None:
+            self.monitor_id = item["id"]
+            self.monitor_attributes = item["attributes"]
 
 
     def get_sla(self):
         """ Retrieve the SLA"""
-        req = PreparedRequest()
-        req.prepare_url(f"{API_MONITORS_BASE_URL}/{self.monitor_id}/sla", self.payload)
-
-        response = requests.get(req.url, headers=self.headers)
-        if response.status_code != 200:
-            self.module.fail_json(msg=response.json())
-
-        self.monitor_sla_attributes = response.json()["data"]["attributes"]
+        try:
+            self.monitor_sla_attributes = retrieve_sla(self.client, self.monitor_id, self.payload)
+        except ApiError as e:
+            self.module.fail_json(msg=e.response.json())
 
     def manage(self):
         """ Manage monitor SLA retrieval """
-        self.retrieve_monitor_id(f"{API_MONITORS_BASE_URL}?url={urllib.parse.quote(self.monitor_url)}")
+        try:
+            self.retrieve_monitor_id(f"{API_MONITORS_BASE_URL}?url={urllib.parse.quote(self.monitor_url)}")
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
 
         if self.monitor_id is None:
             self.module.fail_json(msg="Monitor no found")
 
+        if self.granularity is not None:
+            windows = sla_windows(self.module, self.payload, self.granularity)
+            series  = self.executor.run(sla_series_calls(self.client, self.monitor_id, windows))
+            if self.executor.errors:
+                self.module.fail_json(msg="Failed to retrieve the SLA of some windows", errors=self.executor.errors)
+            self.module.exit_json(series=series, monitor_creation_date=self.monitor_attributes["created_at"])
+
         self.get_sla()
         result = {**self.monitor_sla_attributes, "monitor_creation_date":  self.monitor_attributes["created_at"]}
 
@@ -76,18 +107,225 @@ class BetterUptimeMonitorSLA:
 
 
 
+class BetterUptimeMonitorsSLA:
+    """ Retrieve the SLA of many monitors, resolved from a single listing of the account """
+    def __init__(self, module):
+        self.module        = module
+        self.payload       = module.params
+        self.headers       = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client        = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor      = ConcurrentExecutor(self.client.concurrency)
+        self.urls          = self.payload.pop("urls")
+        self.url_pattern   = compile_pattern(module, self.payload.pop("url_pattern"))
+        self.granularity   = self.payload.pop("granularity", None)
+        self.export_path   = self.payload.pop("export_path", None)
+        self.export_format = self.payload.pop("export_format", None)
+        self.payload.pop("url", None)
+
+        self.payload = sanitize_payload(self.payload)
+
+    def match(self, url: str) -> bool:
+        """ Check if a monitor url is one of the wanted ones """
+        if self.urls is not None:
+            return url in self.urls
+        return self.url_pattern.search(url) is not None
+
+    def retrieve_monitors(self) -> dict:
+        """ Return the attributes and id of the wanted monitors indexed by url, failing with all the missing urls at once """
+        monitors = {}
+        try:
+            for item in betteruptime_items(self.client, API_MONITORS_BASE_URL):
+                if item["attributes"] and self.match(item["attributes"]["url"]):
+                    monitors.setdefault(item["attributes"]["url"], {**item["attributes"], "id": item["id"]})
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+
+        missing = [url for url in self.urls or [] if url not in monitors]
+        if missing:
+            self.module.fail_json(msg=f"Monitors not found: {', '.join(missing)}")
+        return monitors
+
+    def retrieve_series(self, monitors: dict) -> dict:
+        """ Return the SLA series of every monitor, the windows of all the monitors being fetched concurrently """
+        windows = sla_windows(self.module, self.payload, self.granularity)
+        calls   = [call for monitor in monitors.values() for call in sla_series_calls(self.client, monitor["id"], windows)]
+        slas    = self.executor.run(calls)
+
+        result = {}
+        for i, (url, monitor) in enumerate(monitors.items()):
+            series = slas[i * len(windows):(i + 1) * len(windows)]
+            if None not in series:
+                result[url] = {"series": series, "monitor_creation_date": monitor["created_at"]}
+        return result
+
+    def matching_monitors(self):
+        """ Lazily yield the id and url of the wanted monitors, while walking their listing """
+        for item in betteruptime_items(self.client, API_MONITORS_BASE_URL):
+            if item["attributes"] and self.match(item["attributes"]["url"]):
+                yield item["id"], item["attributes"]["url"]
+
+    def export_rows(self, found: set):
+        """ Lazily yield a row per monitor and window, the SLAs being fetched concurrently as the listing goes, adding the wanted urls met to found """
+        if self.granularity is not None:
+            windows = [{"from": start.isoformat(), "to": end.isoformat()} for start, end in sla_windows(self.module, self.payload, self.granularity)]
+        else:
+            windows = [self.payload]
+
+        def row(monitor_id, url, window):
+            sla = retrieve_sla(self.client, monitor_id, window)
+            return {"url": url, "monitor_id": monitor_id, "from": window.get("from"), "to": window.get("to"), **sla}
+
+        def monitors():
+            # Only the listed urls are tracked, to report the missing ones: a pattern keeps nothing per monitor
+            for monitor_id, url in self.matching_monitors():
+                if self.urls is not None:
+                    found.add(url)
+                yield monitor_id, url
+
+        calls = (lambda m=m, u=u, w=w: row(m, u, w) for m, u in monitors() for w in windows)
+        for result in self.executor.stream(calls):
+            if result is not None:
+                yield result
+
+    def export(self):
+        """ Write the SLA of every monitor and window to the export file as they arrive, return only its summary """
+        start = time.monotonic()
+        found = set()
+        rows  = 0
+
+        # Written next to the export and moved over it once complete, so that a failed export leaves the previous one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.export_path)))
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                write = export_writer(f, self.export_format)
+                for row in self.export_rows(found):
+                    write(row)
+                    rows += 1
+        except requests.exceptions.RequestException as e:
+            # The listing of the monitors failed, the calls of the SLAs being reported by the executor
+            os.remove(tmp_path)
+            self.module.fail_json(msg=str(e), rows=rows)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        missing = [url for url in self.urls or [] if url not in found]
+        if missing or self.executor.errors:
+            os.remove(tmp_path)
+            self.module.fail_json(msg="Failed to export the SLA of some monitors", errors=self.executor.errors, missing=missing)
+
+        os.replace(tmp_path, self.export_path)
+        self.module.exit_json(changed=True, path=self.export_path, rows=rows, elapsed_s=round(time.monotonic() - start, 3))
+
+    def manage(self):
+        """ Manage the SLA retrieval of all the monitors """
+        monitors = self.retrieve_monitors()
+
+        if self.granularity is not None:
+            result = self.retrieve_series(monitors)
+        else:
+            # SLAs are independent from each other, fetch them concurrently within the client concurrency
+            slas = self.executor.run([lambda m=m: retrieve_sla(self.client, m["id"], self.payload) for m in monitors.values()])
+
+            result = {}
+            for (url, monitor), sla in zip(monitors.items(), slas):
+                if sla is not None:
+                    result[url] = {**sla, "monitor_creation_date": monitor["created_at"]}
+
+        if self.executor.errors:
+            self.module.fail_json(msg="Failed to retrieve the SLA of some monitors", errors=self.executor.errors, slas=result)
+
+        self.module.exit_json(changed=False, slas=result)
+
+
+def retrieve_sla(client, monitor_id, window: dict) -> dict:
+    """ Return the SLA attributes of a monitor over the from/to window, raise ApiError if the API refuses it """
+    # The SLA of a window ended before today never changes, it is kept in the cache for good once fetched
+    url    = f"{API_MONITORS_BASE_URL}/{monitor_id}/sla"
+    key    = f"{url}?{urllib.parse.urlencode(window)}"
+    cached = client.cache is not None and closed_window(window)
+    if cached:
+        attributes = client.cache.get_record(key)
+        if attributes is not None:
+            return attributes
+
+    response = client.get(url, params=window)
+    if response.status_code != HTTPStatus.OK:
+        raise ApiError(response)
+    attributes = response.json()["data"]["attributes"]
+
+    if cached:
+        client.cache.set_record(key, attributes)
+    return attributes
+
+
+def sla_series_calls(client, monitor_id, windows: list) -> list:
+    """ Return the calls retrieving the SLA of a monitor over each window, with the window bounds """
+    def call(window):
+        return {**window, **retrieve_sla(client, monitor_id, window)}
+    return [lambda w={"from": start.isoformat(), "to": end.isoformat()}: call(w) for start, end in windows]
+
+
+def export_writer(f, export_format: str):
+    """ Return a function writing a row to the export file, in csv or as a json line """
+    if export_format == "jsonl":
+        return lambda row: f.write(json.dumps({k: row.get(k) for k in EXPORT_COLUMNS}) + "\n")
+    writer = csv.DictWriter(f, EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    return writer.writerow
+
+
+def sla_windows(module, payload: dict, granularity: str) -> list:
+    """ Return the windows of the series between the from and to dates, to defaulting to today """
+    try:
+        start = date.fromisoformat(payload["from"])
+        end   = date.fromisoformat(payload["to"]) if "to" in payload else today()
+    except ValueError:
+        module.fail_json(msg="Wrong date format for from or to, expected YYYY-MM-DD")
+    return period_windows(start, end, granularity)
+
+
+def closed_window(window: dict) -> bool:
+    """ Check if a from/to window ended before today """
+    try:
+        return date.fromisoformat(window["to"]) < today()
+    except (KeyError, ValueError):
+        return False
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def compile_pattern(module, pattern: str):
+    """ Return the compiled url pattern, None if not set, failing if it is not a valid regular expression """
+    if pattern is None:
+        return None
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        module.fail_json(msg=f"Invalid url_pattern {pattern}: {e}")
+
+
 def main():
     module = AnsibleModule(
       argument_spec=MONITOR_SLA_FIELDS,
       supports_check_mode=True,
+      mutually_exclusive=MONITOR_SLA_MUTUALLY_EXCLUSIVE,
+      required_one_of=MONITOR_SLA_REQUIRED_ONE_OF,
+      required_by=MONITOR_SLA_REQUIRED_BY,
     )
 
-    monitor_sla_object = BetterUptimeMonitorSLA(module)
+    if module.check_mode:
+        return module.exit_json(changed=False)
 
-    if not module.check_mode:
-        monitor_sla_object.manage()
+    if module.params["export_path"] is not None:
+        BetterUptimeMonitorsSLA(module).export()
+    elif module.params["url"] is None:
+        BetterUptimeMonitorsSLA(module).manage()
     else:
-        return module.exit_json(changed=False)
+        BetterUptimeMonitorSLA(module).manage()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,17 @@
 #!/usr/bin/python
 
-import requests
 import urllib
 
+import requests
 from ansible.module_utils.basic import AnsibleModule
 from http import HTTPStatus
 
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.stats import report_stats
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.pagination import betteruptime_items, find_first
 from ..module_utils.payload import sanitize_payload
-from ..module_utils.payload import diff_attributes
+from ..module_utils.payload import diff_attributes, diff_payload, diff_result
 
 API_STATUS_PAGES_BASE_URL = "https://betteruptime.com/api/v2/status-pages"
 API_MONITORS_BASE_URL     = "https://betteruptime.com/api/v2/monitors"
@@ -16,6 +20,7 @@ STATUS_PAGES_RESOURCE_FIELDS = {
     "resource_name": {"required": True, "type": "str"},
     "public_name":   {"required": True, "type": "str"},
     "resource_type": {"required": False, "type": "str", "default": "Monitor"},
+    "resource_id":   {"required": False, "type": "int"},
     "widget_type":   {"required": False, "type":  "str"},
     "explanation":   {"required": False, "type": "str"},
     "position":      {"required": False, "type": "int"},
@@ -52,15 +57,16 @@ STATUS_PAGES_FIELDS = {
     "password_enabled":              {"required": False, "type": "bool"},
     "password":                      {"required": False, "type": "str", "no_log": True},
     "history":                       {"required": False, "type": "int"},
+    **API_CLIENT_FIELDS,
 }
 
 
 class BetterUptimeStatusPageResource:
-    def __init__(self, module, status_page_id, section_id, headers, payload):
+    def __init__(self, module, status_page_id, section_id, client, payload):
         self.module = module
 
         self.status_page_id                    = status_page_id
-        self.headers                           = headers
+        self.client                            = client
         self.payload                           = payload
         self.payload["status_page_section_id"] = section_id
 
@@ -72,59 +78,61 @@ class BetterUptimeStatusPageResource:
 
         self.payload = sanitize_payload(self.payload)
 
-    def retrieve_monitor_id(self, api_url):
-        """ Retrieve the id of a monitor if it exists """
-        response = requests.get(f"{api_url}?url={urllib.parse.quote(self.resource_name)}", headers=self.headers)
-        json_object = response.json()
+    def needs_monitor_id(self) -> bool:
+        """ Only monitors given without their id need to be looked up """
+        return "resource_id" not in self.payload and self.payload.get("resource_type") == "Monitor"
 
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["url"] == self.resource_name:
-                self.payload["resource_id"] = int(item["id"])
-                return
+    def retrieve_monitor_id(self, api_url, monitor_ids=None):
+        """ Retrieve the id of a monitor if it exists, from the index of the account monitors when given """
+        if monitor_ids is not None and self.resource_name in monitor_ids:
+            self.payload["resource_id"] = monitor_ids[self.resource_name]
+            return
 
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_monitor_id(json_object["pagination"]["next"])
-        else:
+        monitors = betteruptime_items(self.client, f"{api_url}?url={urllib.parse.quote(self.resource_name)}")
+        item     = find_first(monitors, lambda i: i["attributes"] and i["attributes"]["url"] == self.resource_name)
+        if item is None:
             self.module.fail_json(msg="Cannot find monitor")
+        else:
+            self.payload["resource_id"] = int(item["id"])
 
     def set_id(self, retrieved_resources):
-        """ Set the id if found in retrieved resources"""
-        for i in retrieved_resources:
-            if i["attributes"]["resource_id"] == self.payload["resource_id"]:
-                self.id = int(i["id"])
-                self.retrieved_attributes = i["attributes"]
+        """ Set the id if found in retrieved resources, indexed by resource_id """
+        item = retrieved_resources.get(self.payload["resource_id"])
+        if item is not None:
+            self.id                   = int(item["id"])
+            self.retrieved_attributes = item["attributes"]
 
-    def create(self):
+    def create(self) -> bool:
         """ Create resource """
-        resp = requests.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources", headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.id = resp.json()["data"]["id"]
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources", json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["data"]["id"]
+        return True
 
-    def update(self):
+    def update(self) -> bool:
         """ Update an existing resource """
         self.payload = diff_attributes(self.payload, self.retrieved_attributes)
         if self.payload:
-            resp = requests.patch(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources/{self.id}", headers=self.headers, json=self.payload)
-            if resp.status_code == HTTPStatus.OK:
-                return True
-            else:
-                self.module.fail_json(msg=resp.content)
+            resp = self.client.patch(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources/{self.id}", json=self.payload)
+            if resp.status_code != HTTPStatus.OK:
+                raise ApiError(resp)
+            return True
         return False
 
-    def delete(self):
+    def delete(self) -> bool:
         """ Delete a resource """
-        resp = requests.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources/{self.id}", headers=self.headers)
+        resp = self.client.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources/{self.id}")
 
         if resp.status_code != HTTPStatus.NO_CONTENT:
-            self.module.fail_json(msg=resp.content)
+            raise ApiError(resp)
+        return True
 
 
 class BetterUptimeStatusPageSection:
-    def __init__(self, module, status_page_id, headers, payload):
+    def __init__(self, module, status_page_id, client, payload):
         self.module         = module
-        self.headers        = headers
+        self.client         = client
         self.status_page_id = status_page_id
         self.payload        = payload
         self.id             = None
@@ -138,25 +146,26 @@ class BetterUptimeStatusPageSection:
         self.payload = sanitize_payload(self.payload)
 
     def set_id(self, retrieved_sections):
-        """ Set the id if found in retrieved sections"""
-        for i in retrieved_sections:
-            if i["attributes"]["name"] == self.payload["name"]:
-                self.id = int(i["id"])
+        """ Set the id if found in retrieved sections, indexed by name """
+        item = retrieved_sections.get(self.payload["name"])
+        if item is not None:
+            self.id = int(item["id"])
 
-    def create(self):
+    def create(self) -> bool:
         """ Create section """
-        resp = requests.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections", headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.id = resp.json()["data"]["id"]
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections", json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["data"]["id"]
+        return True
 
-    def delete(self):
+    def delete(self) -> bool:
         """ Delete section """
-        resp = requests.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections/{self.id}", headers=self.headers)
+        resp = self.client.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections/{self.id}")
 
         if resp.status_code != HTTPStatus.NO_CONTENT:
-            self.module.fail_json(msg=resp.content)
+            raise ApiError(resp)
+        return True
 
 
 class BetterUptimeStatusPage:
@@ -169,6 +178,9 @@ class BetterUptimeStatusPage:
         self.sections = self.payload.pop("sections")
         self.scope    = self.payload.pop("scope")
         self.headers  = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client   = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor = ConcurrentExecutor(self.client.concurrency)
 
         if "id" in self.payload and self.payload["id"] != "":
             self.id = self.payload.pop("id")
@@ -176,6 +188,7 @@ class BetterUptimeStatusPage:
             self.id = None
 
         self.retrieved_attributes = None
+        self.changes              = []
 
         self.sectionList  = []
         self.resourceList = []
@@ -183,73 +196,85 @@ class BetterUptimeStatusPage:
         self.payload = sanitize_payload(self.payload)
 
     def retrieve_id(self, api_url):
-        """ Retrieve the id of a status page if it exists """
-        response    = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["subdomain"] == self.payload["subdomain"]:
-                self.id                   = item["id"]
-                self.retrieved_attributes = item["attributes"]
-                return
-
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_id(json_object["pagination"]["next"])
+        """ Retrieve the id of a status page if it exists, its attributes being loaded by get() since the listing may be cached """
+        item = find_first(betteruptime_items(self.client, api_url, cached=True), lambda i: i["attributes"] and i["attributes"]["subdomain"] == self.payload["subdomain"])
+        if item is not None:
+            self.id = item["id"]
 
     def manage_sections(self):
         """ Manage section of the Status Page """
-        resp               = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.id}/sections", headers=self.headers)
-        retrieved_sections = resp.json()["data"]
-        retrieved_sections = [s for s in retrieved_sections if s["attributes"]["name"].startswith(self.scope.capitalize())]
+        sections           = betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.id}/sections")
+        retrieved_sections = [s for s in sections if s["attributes"]["name"].startswith(self.scope.capitalize())]
+        sections_by_name   = {s["attributes"]["name"]: s for s in retrieved_sections}
 
+        calls = []
         for section_payload in self.sections:
             section_payload["name"] = ' - '.join(filter(None, [self.scope.capitalize(), section_payload.get("name")]))
-            section = BetterUptimeStatusPageSection(self.module, self.id, self.headers, section_payload)
-            section.set_id(retrieved_sections)
+            section = BetterUptimeStatusPageSection(self.module, self.id, self.client, section_payload)
+            section.set_id(sections_by_name)
 
             self.sectionList.append(section)
 
             if section.id is None:
-                section.create()
-                self.changed = True
+                calls.append(section.create)
 
         # Remove section that exists but are not configured
-        for section_to_remove in [i for i in retrieved_sections if int(i["id"]) not in [j.id for j in self.sectionList]]:
-            section = BetterUptimeStatusPageSection(self.module, self.id, self.headers, section_to_remove)
+        configured_ids = {s.id for s in self.sectionList}
+        for section_to_remove in [i for i in retrieved_sections if int(i["id"]) not in configured_ids]:
+            section = BetterUptimeStatusPageSection(self.module, self.id, self.client, section_to_remove)
             section.id = section_to_remove["id"]
-            section.delete()
-            self.changed = True
+            calls.append(section.delete)
+
+        # Sections are independent from each other, resources are only handled once they all exist
+        self.changed = any(self.executor.run(calls)) or self.changed
+
+    def retrieve_monitor_ids(self) -> dict:
+        """ Index the ids of the account monitors by url """
+        monitor_ids = {}
+        for item in betteruptime_items(self.client, API_MONITORS_BASE_URL):
+            if item["attributes"]:
+                monitor_ids.setdefault(item["attributes"]["url"], int(item["id"]))
+        return monitor_ids
 
     def manage_resources(self):
         """ Manage ressources of the Status Page """
-        resp = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.id}/resources", headers=self.headers)
-        retrieved_resources = resp.json()["data"]
-        retrieved_resources = [r for r in retrieved_resources if r["attributes"]["status_page_section_id"] in [s.id for s in self.sectionList]]
+        section_ids          = {s.id for s in self.sectionList}
+        resources            = betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.id}/resources")
+        retrieved_resources  = [r for r in resources if r["attributes"]["status_page_section_id"] in section_ids]
+        resources_by_id      = {r["attributes"]["resource_id"]: r for r in retrieved_resources}
 
         for section in self.sectionList:
-            if section.resources is not None:
+            # Skip the resources of a section which failed to be created
+            if section.resources is not None and section.id is not None:
                 for resource_payload in section.resources:
-                    resource = BetterUptimeStatusPageResource(self.module, self.id, section.id, self.headers, resource_payload)
-                    resource.retrieve_monitor_id(API_MONITORS_BASE_URL)
-                    resource.set_id(retrieved_resources)
-                    self.resourceList.append(resource)
-                    if resource.id is None:
-                        resource.create()
-                        self.changed = True
-                    else:
-                        changed = resource.update()
-                        self.changed = self.changed or changed
+                    self.resourceList.append(BetterUptimeStatusPageResource(self.module, self.id, section.id, self.client, resource_payload))
+
+        # A single listing of the account monitors instead of a search per resource
+        lookups = [r for r in self.resourceList if r.needs_monitor_id()]
+        if lookups:
+            monitor_ids = self.retrieve_monitor_ids()
+            for resource in lookups:
+                resource.retrieve_monitor_id(API_MONITORS_BASE_URL, monitor_ids)
+
+        calls = []
+        for resource in self.resourceList:
+            if "resource_id" not in resource.payload:
+                self.module.fail_json(msg=f"resource_id is required for the {resource.payload.get('resource_type')} resource {resource.resource_name}")
+            resource.set_id(resources_by_id)
+            calls.append(resource.create if resource.id is None else resource.update)
 
         # Remove resource that exists but are not configured
-        for resource_to_remove in [i for i in retrieved_resources if int(i["id"]) not in [j.id for j in self.resourceList]]:
-            resource = BetterUptimeStatusPageResource(self.module, self.id, 0, self.headers, resource_to_remove)
+        configured_ids = {r.id for r in self.resourceList}
+        for resource_to_remove in [i for i in retrieved_resources if int(i["id"]) not in configured_ids]:
+            resource = BetterUptimeStatusPageResource(self.module, self.id, 0, self.client, resource_to_remove)
             resource.id = resource_to_remove["id"]
-            resource.delete()
-            self.changed = True
+            calls.append(resource.delete)
+
+        self.changed = any(self.executor.run(calls)) or self.changed
 
     def get(self):
         """ Get a status page from the id """
-        resp = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.id}", headers=self.headers)
+        resp = self.client.get(f"{API_STATUS_PAGES_BASE_URL}/{self.id}")
         if resp.status_code == HTTPStatus.OK:
             json_object = resp.json()
             self.retrieved_attributes = json_object["data"]["attributes"]
@@ -258,7 +283,7 @@ class BetterUptimeStatusPage:
 
     def create(self):
         """ Create a new status page """
-        resp = requests.post(API_STATUS_PAGES_BASE_URL, headers=self.headers, json=self.payload)
+        resp = self.client.post(API_STATUS_PAGES_BASE_URL, json=self.payload)
         if resp.status_code == HTTPStatus.CREATED:
             self.id = resp.json()["data"]["id"]
             self.changed = True
@@ -267,10 +292,13 @@ class BetterUptimeStatusPage:
 
     def update(self):
         """ Update an existing status page """
-        self.payload = diff_attributes(self.payload, self.retrieved_attributes)
+        # Compared with the page as it is now, not as listed, to catch the changes made outside of the module
+        if self.retrieved_attributes is None:
+            self.get()
+        self.payload, self.changes = diff_payload(self.payload, self.retrieved_attributes)
 
         if self.payload:
-            resp = requests.patch(f"{API_STATUS_PAGES_BASE_URL}/{self.id}", headers=self.headers, json=self.payload)
+            resp = self.client.patch(f"{API_STATUS_PAGES_BASE_URL}/{self.id}", json=self.payload)
             if resp.status_code == HTTPStatus.OK:
                 self.changed = True
             else:
@@ -278,7 +306,7 @@ class BetterUptimeStatusPage:
 
     def delete(self):
         """ Delete a status page """
-        resp = requests.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.id}", headers=self.headers)
+        resp = self.client.delete(f"{API_STATUS_PAGES_BASE_URL}/{self.id}")
         if resp.status_code == HTTPStatus.NO_CONTENT:
             self.changed = True
         else:
@@ -287,28 +315,34 @@ class BetterUptimeStatusPage:
     def manage_status_page(self):
         """ Manage state of a status page """
 
-        if self.id is None:
-            self.retrieve_id(API_STATUS_PAGES_BASE_URL)
-        else:
-            self.get()
-
-        if self.state == "present":
-            if not self.id:
-                self.create()
+        try:
+            if self.id is None:
+                self.retrieve_id(API_STATUS_PAGES_BASE_URL)
             else:
-                self.update()
-
-            if self.sections is not None:
-                self.manage_sections()
-                self.manage_resources()
-
-        elif self.state == "absent":
-            if not self.id:
-                self.module.exit_json(changed=False, msg="No status page to delete with the specified domain")
-            else:
-                self.delete()
-
-        self.module.exit_json(changed=self.changed, id=self.id)
+                self.get()
+
+            if self.state == "present":
+                if not self.id:
+                    self.create()
+                else:
+                    self.update()
+
+                if self.sections is not None:
+                    self.manage_sections()
+                    self.manage_resources()
+
+            elif self.state == "absent":
+                if not self.id:
+                    self.module.exit_json(changed=False, msg="No status page to delete with the specified domain")
+                else:
+                    self.delete()
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e), changed=self.changed, id=self.id)
+
+        if self.executor.errors:
+            self.module.fail_json(msg="Failed to update the status page", errors=self.executor.errors, changed=self.changed, id=self.id)
+
+        self.module.exit_json(changed=self.changed, id=self.id, **diff_result(self.module, self.changes))
 
 
 def main():
@@ -1,14 +1,19 @@
 #!/usr/bin/python
 
-from datetime import datetime, timezone
+import copy
 from http import HTTPStatus
-import requests
 
+import requests
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.payload import sanitize_payload
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.stats import report_stats
+from ..module_utils.pagination import betteruptime_items, find_first
+from ..module_utils.payload import fingerprint, sanitize_payload
 from ..module_utils.date import validate_date
-from ..module_utils.date import compare_date
+from ..module_utils.date import minute_epoch
+from ..module_utils.date import PAYLOAD_DATE_FORMAT
 
 API_STATUS_PAGES_BASE_URL = "https://betteruptime.com/api/v2/status-pages"
 
@@ -19,7 +24,8 @@ STATUS_PAGE_REPORT_UPDATES_FIELDS = {
 
 STATUS_PAGE_REPORTS_FIELDS = {
     "api_key":       {"required": True, "type": "str", "no_log": True},
-    "subdomain":     {"required": True, "type": "str"},
+    "subdomain":     {"required": False, "type": "str"},
+    "subdomains":    {"required": False, "type": "list", "elements": "str"},
     "title":         {"required": True, "type": "str"},
     "state":         {"required": True, "type": "str", "choices": ["create", "update"]},
     "status":        {"required": True, "type": "str", "choices": ["degraded", "downtime", "maintenance", "resolved"]},
@@ -30,6 +36,7 @@ STATUS_PAGE_REPORTS_FIELDS = {
     "published_at":  {"required": False, "type": "str"},
     "starts_at":     {"required": False, "type": "str"},
     "ends_at":       {"required": False, "type": "str"},
+    **API_CLIENT_FIELDS,
 }
 
 STATUS_PAGE_REPORTS_REQUIRED_IF = [
@@ -38,13 +45,17 @@ STATUS_PAGE_REPORTS_REQUIRED_IF = [
     ("state", "update", ("starts_at",)),
 ]
 
+# Either a single status page, or the same report posted to all the pages of "subdomains"
+STATUS_PAGE_REPORTS_MUTUALLY_EXCLUSIVE = [("subdomain", "subdomains")]
+STATUS_PAGE_REPORTS_REQUIRED_ONE_OF    = [("subdomain", "subdomains")]
+
 
 class BetterUptimeStatusPageReportUpdates:
-    def __init__(self, module, status_page_id, status_report_id, headers, payload):
+    def __init__(self, module, status_page_id, status_report_id, client, payload):
         self.module           = module
         self.status_page_id   = status_page_id
         self.status_report_id = status_report_id
-        self.headers          = headers
+        self.client           = client
         self.payload          = payload
 
         self.payload = sanitize_payload(self.payload)
@@ -52,68 +63,83 @@ class BetterUptimeStatusPageReportUpdates:
 
     def validate_date(self):
         """ Validate date format foreach date_fields if set """
-        date_fields = ["published_at"]
-        for i in date_fields:
-            if i in self.payload and not validate_date(self.payload[i], '%Y-%m-%dT%H:%M%z'):
-                self.module.fail_json(msg=f"Wrong date format for {i}")
+        validate_dates(self.module, self.payload, ["published_at"])
+
+    def key(self) -> str:
+        """ Return the key of the update in the index of the posted ones """
+        return status_update_key(self.payload["message"], self.payload.get("published_at"))
 
     def create(self):
         """ Create a status page report update"""
-        resp = requests.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports/{self.status_report_id}/status-updates", headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.id = resp.json()["data"]["id"]
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports/{self.status_report_id}/status-updates", json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["data"]["id"]
+
+
+class StatusReportIndex:
+    """ (title, report_type, start minute) -> id index of the reports of a status page, filled while streaming their listing """
+    def __init__(self, items):
+        self.items = iter(items)
+        self.ids   = {}
+
+    def get(self, key: tuple):
+        """ Return the id of the report with the given key, reading the listing no further than its first match """
+        while key not in self.ids:
+            item = next(self.items, None)
+            if item is None:
+                return None
+            if item["attributes"]:
+                self.ids.setdefault(status_report_key(item["attributes"]), item["id"])
+        return self.ids[key]
 
 
 class BetterUptimeStatusPageReport:
-    def __init__(self, module):
+    def __init__(self, module, payload=None, client=None, subdomain=None):
         self.module  = module
 
-        self.payload       = module.params
+        self.payload       = module.params if payload is None else payload
         self.status        = self.payload.pop('status')
         self.section_name  = self.payload.pop('section_name')
-        self.headers       = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        if client is None:
+            self.headers   = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+            self.client    = ApiClient.from_params(self.payload, self.headers)
+            report_stats(module, self.client)
+            self.subdomain = self.payload.pop('subdomain')
+            self.payload.pop('subdomains', None)
+        else:
+            self.client    = client
+            self.subdomain = subdomain
         self.state         = self.payload.pop('state')
-        self.subdomain     = self.payload.pop('subdomain')
         self.report_update = self.payload.pop('report_update')
 
         self.status_page_id = None
         self.id = None
+        self.posted_updates = set()
 
         self.payload = sanitize_payload(self.payload)
         self.validate_date()
 
     def validate_date(self):
         """ Validate date format foreach date_fields if set """
-        date_fields = ["published_at", "starts_at", "ends_at"]
-        for i in date_fields:
-            if i in self.payload and not validate_date(self.payload[i], '%Y-%m-%dT%H:%M%z'):
-                self.module.fail_json(msg=f"Wrong date format for {i}")
+        validate_dates(self.module, self.payload, ["published_at", "starts_at", "ends_at"])
+        for update in self.report_update or []:
+            validate_dates(self.module, update, ["published_at"])
 
     def retrieve_status_page_id(self, api_url):
         """ Retrieve the id of a status page if it exists """
-        response    = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["data"]:
-            if item["attributes"] and item["attributes"]["subdomain"] == self.subdomain:
-                self.status_page_id = item["id"]
-                return
-
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_status_page_id(json_object["pagination"]["next"])
+        item = find_first(betteruptime_items(self.client, api_url, cached=True), lambda i: i["attributes"] and i["attributes"]["subdomain"] == self.subdomain)
+        if item is not None:
+            self.status_page_id = item["id"]
 
     def retrieve_status_page_section_ids(self):
         """ Retrieve the ids of status page sections """
-        resp = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections", headers=self.headers)
-        retrieved_sections = resp.json()["data"]
+        retrieved_sections = betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/sections")
         return [int(s["id"]) for s in retrieved_sections if s["attributes"]["name"] in self.section_name]
 
     def retrieve_status_page_resources_ids(self):
         """ Retrieve the ids of status page resources """
-        resp = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources", headers=self.headers)
-        retrieved_resources = resp.json()["data"]
+        retrieved_resources = list(betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/resources"))
         if self.section_name is None:
             # No section name set => It affects all resources
             self.payload["affected_resources"] = [{"status_page_resource_id": r.get("id"), "status": self.status} for r in retrieved_resources]
@@ -123,30 +149,56 @@ class BetterUptimeStatusPageReport:
 
     def retrieve_id(self):
         """ Retrieve the id of a status page report if it exists """
-        response    = requests.get(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports", headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["data"]:
-            dt_payload = datetime.strptime(self.payload["starts_at"], '%Y-%m-%dT%H:%M%z')
-            dt_retrieved = datetime.strptime(item["attributes"]["starts_at"], '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
-
-            if item["attributes"] and \
-                    item["attributes"]["title"] == self.payload["title"] and \
-                    item["attributes"]["report_type"] == self.payload["report_type"] and \
-                    compare_date(dt_payload, dt_retrieved, ["year", "month", "day", "hour", "minute"]):
-                self.id = item["id"]
-                return
-
-        if json_object["pagination"]["next"] is not None:
-            self.retrieve_id(json_object["pagination"]["next"])
+        index   = StatusReportIndex(betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports"))
+        self.id = index.get((self.payload["title"], self.payload["report_type"], minute_epoch(self.payload["starts_at"])))
+
+    def retrieve_status_update_keys(self) -> set:
+        """ Return the keys of the updates already posted to the report, with and without their publication date """
+        keys = set()
+        for item in betteruptime_items(self.client, f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports/{self.id}/status-updates"):
+            if item["attributes"]:
+                # Updates posted without a date are published at the time of the post, only their message can match
+                keys.add(status_update_key(item["attributes"]["message"], item["attributes"].get("published_at")))
+                keys.add(status_update_key(item["attributes"]["message"], None))
+        return keys
 
     def create(self):
         """ Create a status page report """
-        resp = requests.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports", headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.id = resp.json()["data"]["id"]
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.post(f"{API_STATUS_PAGES_BASE_URL}/{self.status_page_id}/status-reports", json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["data"]["id"]
+
+    def create_updates(self) -> bool:
+        """ Post the updates that are not already on the report, return whether one was posted """
+        added = 0
+        for i in self.report_update:
+            i["affected_resources"] = self.payload["affected_resources"]
+            b = BetterUptimeStatusPageReportUpdates(self.module, self.status_page_id, self.id, self.client, i)
+            if b.key() in self.posted_updates:
+                continue
+            b.create()
+            self.posted_updates.add(b.key())
+            added += 1
+        return added > 0
+
+    def prepare(self) -> bool:
+        """ Read what the report needs from the status page: the affected resources, and the report to update """
+        self.retrieve_status_page_resources_ids()
+        if self.state == "update" and self.payload["affected_resources"]:
+            self.retrieve_id()
+            if self.id is not None:
+                self.posted_updates = self.retrieve_status_update_keys()
+        return True
+
+    def post(self) -> bool:
+        """ Create the report or post its new updates, return whether something changed """
+        if not self.payload["affected_resources"]:
+            return False
+        if self.state == "create":
+            self.create()
+            return True
+        return self.create_updates()
 
     def manage(self):
         """ Manage a status page report """
@@ -154,37 +206,107 @@ class BetterUptimeStatusPageReport:
         if self.status_page_id is None:
             self.module.fail_json(msg="Status page not found")
 
-        self.retrieve_status_page_resources_ids()
+        try:
+            self.prepare()
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
         if len(self.payload["affected_resources"]) == 0:
             self.module.exit_json(changed=False)
 
-        if self.state == "create":
-            self.create()
-        elif self.state == "update":
-            self.retrieve_id()
-            if self.id is None:
-                self.module.fail_json(msg="Status page report not found")
-            for i in self.report_update:
-                i["affected_resources"] = self.payload["affected_resources"]
-                b = BetterUptimeStatusPageReportUpdates(self.module, self.status_page_id, self.id, self.headers, i)
-                b.create()
+        if self.state == "update" and self.id is None:
+            self.module.fail_json(msg="Status page report not found")
+
+        try:
+            self.module.exit_json(changed=self.post())
+        except ApiError as e:
+            self.module.fail_json(msg=str(e))
+
+
+class BetterUptimeStatusPageReports:
+    """ Post the same report to several status pages, resolved from a single listing of the status pages """
+    def __init__(self, module):
+        self.module   = module
+        self.payload  = module.params
+        self.headers  = {"Authorization": f"Bearer {self.payload.pop('api_key')}"}
+        self.client   = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor = ConcurrentExecutor(self.client.concurrency)
+        subdomains    = self.payload.pop("subdomains")
+        self.payload.pop("subdomain", None)
+        # Each page gets its own copy since the affected resources are set on the payload and on its updates
+        self.reports  = [BetterUptimeStatusPageReport(module, copy.deepcopy(self.payload), self.client, s) for s in dict.fromkeys(subdomains)]
+
+    def retrieve_status_page_ids(self):
+        """ Set the id of every status page from a single listing, failing with all the missing subdomains at once """
+        index = {}
+        for item in betteruptime_items(self.client, API_STATUS_PAGES_BASE_URL, cached=True):
+            if item["attributes"]:
+                index.setdefault(item["attributes"]["subdomain"], item["id"])
+
+        missing = [report.subdomain for report in self.reports if report.subdomain not in index]
+        if missing:
+            self.module.fail_json(msg=f"Status pages not found: {', '.join(missing)}")
+
+        for report in self.reports:
+            report.status_page_id = index[report.subdomain]
+
+    def manage(self):
+        """ Manage the report of all the status pages """
+        self.retrieve_status_page_ids()
+
+        # Pages are independent from each other: read all of them concurrently, then write to all of them concurrently
+        read    = [r for r, ok in zip(self.reports, self.executor.run([r.prepare for r in self.reports])) if ok]
+        missing = [r for r in read if r.state == "update" and r.payload["affected_resources"] and r.id is None]
+        ready   = [r for r in read if r not in missing]
+        posted  = dict(zip([r.subdomain for r in ready], self.executor.run([r.post for r in ready])))
+        errors  = [f"Status page report not found on {r.subdomain}" for r in missing]
+
+        results = []
+        for report in self.reports:
+            changed = posted.get(report.subdomain)
+            results.append({"subdomain": report.subdomain, "status_page_id": report.status_page_id, "id": report.id, "changed": bool(changed), "failed": changed is None})
+
+        changed = any(r["changed"] for r in results)
+        errors  = self.executor.errors + errors
+        if errors:
+            self.module.fail_json(msg="Failed to post the report to some status pages", errors=errors, changed=changed, status_pages=results)
+
+        self.module.exit_json(changed=changed, status_pages=results)
+
+
+def validate_dates(module, payload: dict, date_fields: list):
+    """ Fail if one of the date fields set in the payload is not in the expected format """
+    for i in date_fields:
+        if payload.get(i) is not None and not validate_date(payload[i], PAYLOAD_DATE_FORMAT):
+            module.fail_json(msg=f"Wrong date format for {i}")
+
+
+def status_report_key(attributes: dict) -> tuple:
+    """ Return the title, type and start minute identifying a retrieved status report """
+    return (attributes["title"], attributes["report_type"], minute_epoch(attributes["starts_at"]))
+
 
-        self.module.exit_json(changed=True)
+def status_update_key(message: str, published_at: str = None) -> str:
+    """ Return a hash of the message and of the publication minute of a status update """
+    return fingerprint([message, minute_epoch(published_at) if published_at else None])
 
 
 def main():
     module = AnsibleModule(
         argument_spec=STATUS_PAGE_REPORTS_FIELDS,
         supports_check_mode=True,
-        required_if=STATUS_PAGE_REPORTS_REQUIRED_IF
+        required_if=STATUS_PAGE_REPORTS_REQUIRED_IF,
+        mutually_exclusive=STATUS_PAGE_REPORTS_MUTUALLY_EXCLUSIVE,
+        required_one_of=STATUS_PAGE_REPORTS_REQUIRED_ONE_OF,
     )
 
-    status_page_report_object = BetterUptimeStatusPageReport(module)
+    if module.check_mode:
+        return module.exit_json(changed=False)
 
-    if not module.check_mode:
-        status_page_report_object.manage()
+    if module.params["subdomains"] is not None:
+        BetterUptimeStatusPageReports(module).manage()
     else:
-        module.exit_json(changed=False)
+        BetterUptimeStatusPageReport(module).manage()
 
 
 if __name__ == "__main__":
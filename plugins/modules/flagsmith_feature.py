@@ -1,24 +1,24 @@
 #!/usr/bin/python
 
+from collections import Counter
 from http import HTTPStatus
 
 import requests
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.payload import sanitize_payload
-from ..module_utils.flagsmith import get_project_ids_from_names, get_tag_ids_from_labels
-
-import collections
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.stats import report_stats
+from ..module_utils.pagination import flagsmith_items, find_first
+from ..module_utils.payload import diff_payload, diff_result, sanitize_payload
+from ..module_utils.flagsmith import FlagsmithLookupError, FlagsmithResolver, get_project_ids_from_names
 
 import ast
 
 import json
 
-FEATURE_FIELDS = {
-    "api_key":         {"required": True, "type": "str", "no_log": True},
-    "base_url":        {"required": True, "type": "str"},
+FEATURE_OPTIONS = {
     "state":           {"required": True, "choices": ["present", "absent"], "type": "str"},
-    "project_name":    {"required": True, "type": "str"},
     "name":            {"required": True, "type": "str"},
     "type":            {"required": False, "type": "str"},
     "default_enabled": {"required": False, "type": "bool"},
@@ -28,18 +28,48 @@ FEATURE_FIELDS = {
     "tags":            {"required": False, "type": "list", "elements": "str"},
 }
 
+# Either a single feature described by the top level options, or a list of them in "features"
+FEATURE_FIELDS = {
+    **FEATURE_OPTIONS,
+    "api_key":         {"required": True, "type": "str", "no_log": True},
+    "base_url":        {"required": True, "type": "str"},
+    "project_name":    {"required": True, "type": "str"},
+    "state":           {"required": False, "choices": ["present", "absent"], "type": "str"},
+    "name":            {"required": False, "type": "str"},
+    "features":        {"required": False, "type": "list", "elements": "dict", "options": FEATURE_OPTIONS},
+    **API_CLIENT_FIELDS,
+}
+
+# Tags are an unordered list of ids
+FEATURE_UNORDERED_FIELDS = ("tags",)
+
+FEATURE_MUTUALLY_EXCLUSIVE = [("name", "features")]
+FEATURE_REQUIRED_ONE_OF    = [("name", "features")]
+FEATURE_REQUIRED_BY        = {"name": ("state",)}
+
 class FlagsmithFeature:
-    def __init__(self, module):
+    def __init__(self, module, payload=None, client=None, base_url=None, project_name=None):
         self.module               = module
-        self.payload              = module.params
-        self.api_key              = self.payload.pop("api_key")
-        self.base_url             = self.payload.pop("base_url")
-        self.project_name         = self.payload.pop("project_name")
+        self.payload              = module.params if payload is None else payload
+
+        if client is None:
+            self.api_key          = self.payload.pop("api_key")
+            self.base_url         = self.payload.pop("base_url")
+            self.project_name     = self.payload.pop("project_name")
+            self.headers          = {"Authorization": f"Api-Key {self.api_key}", "Accept": "application/json"}
+            self.client           = ApiClient.from_params(self.payload, self.headers)
+            report_stats(module, self.client)
+            self.payload.pop("features", None)
+        else:
+            self.client           = client
+            self.base_url         = base_url
+            self.project_name     = project_name
+
         self.state                = self.payload.pop("state")
-        self.headers              = {"Authorization": f"Api-Key {self.api_key}", "Accept": "application/json"}
         self.id                   = None
         self.project_id           = None
         self.retrieved_attributes = None
+        self.changes              = []
 
         self.payload = sanitize_payload(self.payload)
 
@@ -54,107 +84,196 @@ class FlagsmithFeature:
 
     def retrieve_id(self, api_url):
         """ Retrieve the id of a feature if it exists """
-        response = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["results"]:
-            if item["name"] == self.payload["name"]:
-                self.id = item["id"]
-                self.retrieved_attributes = {
-                    "name":            item["name"],
-                    "type":            item["type"],
-                    "default_enabled": item["default_enabled"],
-                    "initial_value":   item["initial_value"],
-                    "description":     item["description"],
-                    "is_archived":     item["is_archived"],
-                    "tags":            item["tags"]
-                }
-                return
-
-        if json_object["next"] is not None:
-            self.retrieve_id(json_object["next"])
+        item = find_first(flagsmith_items(self.client, api_url), lambda i: i["name"] == self.payload["name"])
+        if item is not None:
+            self.id                   = item["id"]
+            self.retrieved_attributes = feature_attributes(item)
 
     def diff_attributes(self):
         """ Update the payload to only have the diff between the wanted and the existing attributes """
-        diff_attributes = {}
-        for key in self.payload:
-            if key == "tags":
-                if collections.Counter(self.retrieved_attributes[key]) != collections.Counter(self.payload[key]):
-                    # tags is a special case since we are comparing two unordered lists
-                    diff_attributes[key] = self.payload[key]
-            elif key not in self.retrieved_attributes or self.retrieved_attributes[key] != self.payload[key]:
-                diff_attributes[key] = self.payload[key]
+        self.payload, self.changes = diff_payload(self.payload, self.retrieved_attributes, FEATURE_UNORDERED_FIELDS)
 
-        self.payload = diff_attributes
+    def resolve_tags(self):
+        """ Replace the tag labels of the payload by their ids, failing with all the missing labels at once """
+        if 'tags' in self.payload:
+            try:
+                self.payload['tags'] = FlagsmithResolver.for_client(self.client, self.base_url).tag_ids(self.project_id, self.payload['tags'])
+            except FlagsmithLookupError as e:
+                self.module.fail_json(msg=f"{e} in project {self.project_name}")
+            except requests.exceptions.HTTPError as e:
+                self.module.fail_json(msg=f"Cannot list the tags of project {self.project_name}: {e}")
 
     def create(self):
         """ Create a new feature """
-        if 'tags' in self.payload:
-            self.payload['tags'] = get_tag_ids_from_labels(f"{self.base_url}/projects/{self.project_id}/tags/", self.headers, self.project_id, self.payload['tags'])
-
-        resp = requests.post(f"{self.base_url}/projects/{self.project_id}/features/", headers=self.headers, json=self.payload)
-        if resp.status_code == HTTPStatus.CREATED:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=f"URL: {self.base_url}/projects/{self.project_id}/features/ FAIL: {resp.content}")
-
-    def update(self):
-        """ Update an existing feature """
-        if 'tags' in self.payload:
-            self.payload['tags'] = get_tag_ids_from_labels(f"{self.base_url}/projects/{self.project_id}/tags/", self.headers, self.project_id, self.payload['tags'])
+        resp = self.client.post(f"{self.base_url}/projects/{self.project_id}/features/", json=self.payload)
+        if resp.status_code != HTTPStatus.CREATED:
+            raise ApiError(resp)
+        self.id = resp.json()["id"]
 
+    def update(self) -> bool:
+        """ Update an existing feature, return whether something changed """
         self.diff_attributes()
         if not self.payload:
-            self.module.exit_json(changed=False)
+            return False
 
-        resp = requests.patch(f"{self.base_url}/projects/{self.project_id}/features/{self.id}/", headers=self.headers, json=self.payload)
+        resp = self.client.patch(f"{self.base_url}/projects/{self.project_id}/features/{self.id}/", json=self.payload)
 
-        if resp.status_code == HTTPStatus.OK:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=resp.content)
+        if resp.status_code != HTTPStatus.OK:
+            raise ApiError(resp)
+        return True
 
     def delete(self):
         """ Delete an existing feature """
-        resp = requests.delete(f"{self.base_url}/projects/{self.project_id}/features/{self.id}/", headers=self.headers)
-        if resp.status_code == HTTPStatus.NO_CONTENT:
-            self.module.exit_json(changed=True)
-        else:
-            self.module.fail_json(msg=resp.content)
+        resp = self.client.delete(f"{self.base_url}/projects/{self.project_id}/features/{self.id}/")
+        if resp.status_code != HTTPStatus.NO_CONTENT:
+            raise ApiError(resp)
+
+    def reconcile(self) -> bool:
+        """ Bring the feature to its wanted state, return whether it changed """
+        if self.state == "present":
+            if not self.id:
+                self.create()
+                return True
+            return self.update()
+        elif self.state == "absent" and self.id:
+            self.delete()
+            return True
+        return False
 
     def manage(self):
         """ Manage state of a feature """
-        project_ids = get_project_ids_from_names(self.base_url, self.headers, [self.project_name])
+        project_ids = get_project_ids_from_names(self.client, self.base_url, [self.project_name])
         if len(project_ids) == 0:
             self.module.fail_json(msg="Project was not found")
         else:
             self.project_id = project_ids[0]
 
-        self.retrieve_id(f"{self.base_url}/projects/{self.project_id}/features/?search={self.payload['name']}")
+        try:
+            self.retrieve_id(f"{self.base_url}/projects/{self.project_id}/features/?search={self.payload['name']}")
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+        if self.state == "absent" and not self.id:
+            self.module.exit_json(changed=False, msg="No feature to delete")
+
         if self.state == "present":
-            if not self.id:
-                self.create()
-            else:
-                self.update()
-        elif self.state == "absent":
-            if not self.id:
-                self.module.exit_json(changed=False, msg="No feature to delete")
-            else:
-                self.delete()
+            self.resolve_tags()
+
+        try:
+            self.module.exit_json(changed=self.reconcile(), **diff_result(self.module, self.changes))
+        except ApiError as e:
+            self.module.fail_json(msg=str(e))
+
+
+class FlagsmithFeatures:
+    """ Reconcile a whole list of features of a project against a single listing of its features and tags """
+    def __init__(self, module):
+        self.module       = module
+        self.payload      = module.params
+        self.base_url     = self.payload.pop("base_url")
+        self.project_name = self.payload.pop("project_name")
+        self.headers      = {"Authorization": f"Api-Key {self.payload.pop('api_key')}", "Accept": "application/json"}
+        self.client       = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
+        self.executor     = ConcurrentExecutor(self.client.concurrency)
+        self.resolver     = FlagsmithResolver.for_client(self.client, self.base_url)
+        self.project_id   = None
+        self.features     = [FlagsmithFeature(module, feature, self.client, self.base_url, self.project_name) for feature in self.payload.pop("features")]
+
+    def check_duplicates(self):
+        """ Fail if the same feature name is declared more than once """
+        duplicates = [name for name, count in Counter(feature.payload["name"] for feature in self.features).items() if count > 1]
+        if duplicates:
+            self.module.fail_json(msg=f"Features declared more than once: {sorted(duplicates)}")
+
+    def retrieve_project_id(self):
+        try:
+            self.project_id = self.resolver.project_id(self.project_name)
+        except (FlagsmithLookupError, requests.exceptions.HTTPError):
+            self.module.fail_json(msg="Project was not found")
+
+        for feature in self.features:
+            feature.project_id = self.project_id
 
+    def retrieve_ids(self):
+        """ Set the id of every existing feature from a single listing of the project """
+        index = {}
+        for item in flagsmith_items(self.client, f"{self.base_url}/projects/{self.project_id}/features/"):
+            index.setdefault(item["name"], item)
+
+        for feature in self.features:
+            item = index.get(feature.payload["name"])
+            if item is not None:
+                feature.id                   = item["id"]
+                feature.retrieved_attributes = feature_attributes(item)
+
+    def resolve_tags(self):
+        """ Replace the tag labels of every feature by their ids, failing with all the missing labels at once """
+        missing = []
+        for feature in self.features:
+            if feature.state == "present" and "tags" in feature.payload:
+                try:
+                    feature.payload["tags"] = self.resolver.tag_ids(self.project_id, feature.payload["tags"])
+                except FlagsmithLookupError as e:
+                    missing += [label for label in e.names if label not in missing]
+                except requests.exceptions.HTTPError as e:
+                    self.module.fail_json(msg=f"Cannot list the tags of project {self.project_name}: {e}")
+
+        if missing:
+            self.module.fail_json(msg=f"{FlagsmithLookupError('Tags', missing)} in project {self.project_name}")
+
+    def manage(self):
+        """ Manage state of all the features """
+        self.check_duplicates()
+        self.retrieve_project_id()
+        try:
+            self.retrieve_ids()
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
+        self.resolve_tags()
+
+        # Names are read first since reconciling reduces the payloads to their diff
+        names = [feature.payload["name"] for feature in self.features]
+
+        # Features are independent from each other, reconcile them concurrently
+        results = []
+        for name, feature, changed in zip(names, self.features, self.executor.run([f.reconcile for f in self.features])):
+            results.append({"name": name, "state": feature.state, "id": feature.id, "changed": bool(changed), "failed": changed is None})
+
+        changed = any(r["changed"] for r in results)
+        if self.executor.errors:
+            self.module.fail_json(msg="Failed to reconcile some features", errors=self.executor.errors, changed=changed, features=results)
+
+        self.module.exit_json(changed=changed, features=results)
+
+
+def feature_attributes(item) -> dict:
+    """ Return the managed attributes of a retrieved feature """
+    return {
+        "name":            item["name"],
+        "type":            item["type"],
+        "default_enabled": item["default_enabled"],
+        "initial_value":   item["initial_value"],
+        "description":     item["description"],
+        "is_archived":     item["is_archived"],
+        "tags":            item["tags"]
+    }
 
 def main():
     module = AnsibleModule(
       argument_spec=FEATURE_FIELDS,
       supports_check_mode=True,
+      mutually_exclusive=FEATURE_MUTUALLY_EXCLUSIVE,
+      required_one_of=FEATURE_REQUIRED_ONE_OF,
+      required_by=FEATURE_REQUIRED_BY,
     )
 
-    feature_object = FlagsmithFeature(module)
+    if module.check_mode:
+        return module.exit_json(changed=False)
 
-    if not module.check_mode:
-        feature_object.manage()
+    if module.params["features"] is not None:
+        FlagsmithFeatures(module).manage()
     else:
-        return module.exit_json(changed=False)
+        FlagsmithFeature(module).manage()
 
 
 if __name__ == "__main__":
@@ -7,8 +7,11 @@ from http import HTTPStatus
 import requests
 from ansible.module_utils.basic import AnsibleModule
 
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient
+from ..module_utils.stats import report_stats
+from ..module_utils.pagination import flagsmith_items, find_first
 from ..module_utils.flagsmith import get_project_ids_from_names
-from ..module_utils.payload import sanitize_payload
+from ..module_utils.payload import fingerprint, sanitize_payload
 
 SEGMENT_FIELDS = {
     "api_key":         {"required": True, "type": "str", "no_log": True},
@@ -17,8 +20,12 @@ SEGMENT_FIELDS = {
     "project_name":    {"required": True, "type": "str"},
     "name":            {"required": True, "type": "str"},
     "rules":           {"required": True, "type": "str"},
+    **API_CLIENT_FIELDS,
 }
 
+# Fields set by Flagsmith on the rules and conditions, absent from the wanted ones
+SEGMENT_RULE_SERVER_FIELDS = {"id", "rule", "segment"}
+
 class FlagsmithSegmentRule:
     def __init__(self, module):
         self.module               = module
@@ -28,6 +35,8 @@ class FlagsmithSegmentRule:
         self.project_name         = self.payload.pop("project_name")
         self.state                = self.payload.pop("state")
         self.headers              = {"Authorization": f"Token {self.api_key}", "Accept": "application/json"}
+        self.client               = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
         self.id                   = None
         self.project_id           = None
         self.retrieved_attributes = None
@@ -46,22 +55,31 @@ class FlagsmithSegmentRule:
     def retrieve_id(self, api_url):
         """Retrieve the ID of a segment if it exists."""
         try:
-            response = requests.get(api_url, headers=self.headers)
-            response.raise_for_status()  # Raises an HTTPError for bad responses
-            data = response.json()
-            for item in data.get("results", []):
-                if item["name"] == self.payload["name"]:
-                    self.id = item["id"]
-                    return
+            item = find_first(flagsmith_items(self.client, api_url), lambda i: i["name"] == self.payload["name"])
+            if item is not None:
+                self.id                   = item["id"]
+                self.retrieved_attributes = item
         except requests.exceptions.RequestException as e:
             self.module.fail_json(msg=f"Segment was not found, {self.payload['name']}, error: {e}")
 
+    def retrieve_rules(self) -> list:
+        """ Return the current rules of the segment, from its listing or from the segment itself """
+        if self.retrieved_attributes and "rules" in self.retrieved_attributes:
+            return self.retrieved_attributes["rules"]
+        resp = self.client.get(f"{self.base_url}/projects/{self.project_id}/segments/{self.id}/")
+        resp.raise_for_status()
+        return resp.json()["rules"]
+
     def update(self):
-        """ Update an existing segment """
-        # self.diff_attributes()
-        if not self.payload:
+        """ Update an existing segment, unless its rules already match the wanted ones """
+        try:
+            unchanged = fingerprint(canonical_rules(self.retrieve_rules())) == fingerprint(canonical_rules(self.payload["rules"]))
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=f"Cannot retrieve the rules of segment {self.payload['name']}, error: {e}")
+        if unchanged:
             self.module.exit_json(changed=False)
-        rule_update_resp = requests.patch(f"{self.base_url}/projects/{self.project_id}/segments/{self.id}/", headers=self.headers, json=self.payload)
+
+        rule_update_resp = self.client.patch(f"{self.base_url}/projects/{self.project_id}/segments/{self.id}/", json=self.payload)
 
         if rule_update_resp.status_code == HTTPStatus.OK:
             self.module.exit_json(changed=True)
@@ -73,10 +91,9 @@ class FlagsmithSegmentRule:
         self.payload["name"]=f"{self.payload['name'].lower()}"
         if self.payload['name']=="none" or self.payload["name"] == "custom":
             self.module.exit_json(skipped=True)
-        self.payload['rules'] = self.payload['rules'].replace("'", '"')
-        self.payload['rules'] = json.loads(self.payload['rules'])
+        self.payload['rules'] = parse_rules(self.payload['rules'])
 
-        project_ids = get_project_ids_from_names(self.base_url, self.headers, [self.project_name])
+        project_ids = get_project_ids_from_names(self.client, self.base_url, [self.project_name])
 
         if len(project_ids) == 0:
             self.module.fail_json(msg=f"Project was not found, {project_ids}")
@@ -91,6 +108,27 @@ class FlagsmithSegmentRule:
             self.module.fail_json(msg=f"Segment was not found, {self.payload['name']}")
 
 
+def parse_rules(rules: str):
+    """ Parse rules given as json, or as the python literal Ansible renders single quoted """
+    try:
+        return json.loads(rules)
+    except ValueError:
+        return ast.literal_eval(rules)
+
+
+def canonical_rules(value):
+    """ Return the rules without the fields set by Flagsmith nor the empty ones, condition values as strings """
+    if isinstance(value, list):
+        return [canonical_rules(v) for v in value]
+    if isinstance(value, dict):
+        rules = {k: canonical_rules(v) for k, v in value.items() if k not in SEGMENT_RULE_SERVER_FIELDS and v is not None}
+        # Flagsmith stores the value of a condition as a string
+        if "value" in rules and not isinstance(rules["value"], str):
+            rules["value"] = json.dumps(rules["value"])
+        return rules
+    return value
+
+
 def main():
     module = AnsibleModule(
       argument_spec=SEGMENT_FIELDS,
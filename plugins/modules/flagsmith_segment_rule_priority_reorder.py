@@ -2,13 +2,16 @@
 
 import ast
 import json
+from functools import partial
 from http import HTTPStatus
-from operator import itemgetter
 
-import requests
 from ansible.module_utils.basic import AnsibleModule
 
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient, ApiError
+from ..module_utils.executor import ConcurrentExecutor
+from ..module_utils.stats import report_stats
 from ..module_utils.flagsmith import get_project_ids_from_names
+from ..module_utils.pagination import flagsmith_items
 from ..module_utils.payload import sanitize_payload
 
 SEGMENT_FIELDS = {
@@ -18,6 +21,7 @@ SEGMENT_FIELDS = {
     "project_name":      {"required": True, "type": "str"},
     "environment_names": {"required": True, "type": "list"},
     "pricing_plans":     {"required": True, "type": "dict"},
+    **API_CLIENT_FIELDS,
 }
 
 class FlagsmithSegmentRulePriorityReorder:
@@ -31,10 +35,14 @@ class FlagsmithSegmentRulePriorityReorder:
         self.environment_names     = self.payload.pop("environment_names")
         self.pricing_plans         = self.payload.pop("pricing_plans")
         self.headers              = {"Authorization": f"Token {self.api_key}", "Accept": "application/json"}
+        self.client               = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
         self.id                   = None
         self.project_id           = None
         self.retrieved_attributes = None
         self.env_api_key          = None
+        self.executor             = ConcurrentExecutor(self.client.concurrency)
+        self.environments         = {}
         self.features_env_mapping = {}
         self.segments_config ={}
 
@@ -50,7 +58,7 @@ class FlagsmithSegmentRulePriorityReorder:
 
     def retrieve_segment_id(self, segment_name):
         """ Retrieve the id of an segment if it exists """
-        response = requests.get(f"{self.base_url}/projects/{self.project_id}/segments/?search={segment_name}", headers=self.headers)
+        response = self.client.get(f"{self.base_url}/projects/{self.project_id}/segments/?search={segment_name}")
         json_object = response.json()
         for item in json_object["results"]:
             if item["name"] == segment_name:
@@ -60,7 +68,7 @@ class FlagsmithSegmentRulePriorityReorder:
 
     def retrieve_environment_id(self, environment_name):
         """ Retrieve the id of an environment if it exists """
-        response = requests.get(f"{self.base_url}/projects/{self.project_id}/environments/?search={environment_name}", headers=self.headers)
+        response = self.client.get(f"{self.base_url}/projects/{self.project_id}/environments/?search={environment_name}")
         json_object = response.json()
         for item in json_object:
             if item["name"] == environment_name:
@@ -68,19 +76,33 @@ class FlagsmithSegmentRulePriorityReorder:
         else:
             self.module.fail_json(msg=f"Environment was not found, {environment_name}")
 
-    def retrieve_associated_features(self,segment_id):
+    def retrieve_associated_features(self, segment_id) -> list:
         """ Retrieve the features associated with a segment """
-        response = requests.get(f"{self.base_url}/projects/{self.project_id}/segments/{segment_id}/associated-features/", headers=self.headers)
-        json_object = response.json()
-        if len(json_object["results"]) > 0:
-            return json_object["results"]
-        else:
-            self.module.exit_json(skipped=True, msg=f"no features attached to segment {segment_id}")
+        return list(flagsmith_items(self.client, f"{self.base_url}/projects/{self.project_id}/segments/{segment_id}/associated-features/"))
+
+    def retrieve_feature_segments(self, environment_id, feature_id) -> list:
+        """ Retrieve the segment overrides of a feature in an environment """
+        return list(flagsmith_items(self.client, f"{self.base_url}/features/feature-segments/", {"environment": environment_id, "feature": feature_id}))
+
+    def target_priorities(self, feature_segments) -> list:
+        """ Return the wanted priorities: the other overrides first in their current order, then the pricing plans by priority """
+        others  = [s for s in feature_segments if s["segment"] not in self.segments_config]
+        matched = sorted((s for s in feature_segments if s["segment"] in self.segments_config), key=lambda s: self.segments_config[s["segment"]])
+
+        # Flagsmith stores contiguous ranks, plans missing from the feature must not leave gaps
+        return [{"id": s["id"], "priority": index} for index, s in enumerate(others + matched)]
+
+    def update_priorities(self, post_data) -> bool:
+        """ Submit the priorities of the overrides of a feature """
+        resp = self.client.post(f"{self.base_url}/features/feature-segments/update-priorities/", json=post_data)
+        if resp.status_code != HTTPStatus.OK:
+            raise ApiError(resp)
+        return True
 
     def manage(self):
 
         # get project id
-        project_ids = get_project_ids_from_names(self.base_url, self.headers, [self.project_name])
+        project_ids = get_project_ids_from_names(self.client, self.base_url, [self.project_name])
         if len(project_ids) == 0:
             self.module.fail_json(msg=f"Project was not found, {self.project_name}")
         else:
@@ -89,6 +111,7 @@ class FlagsmithSegmentRulePriorityReorder:
         # get environments id
         for environment in self.environment_names:
             env_id = self.retrieve_environment_id(environment)
+            self.environments[env_id]         = environment
             self.features_env_mapping[env_id] = []
         # get segment and features
         for shaun_plan, segment in self.pricing_plans.items():
@@ -97,36 +120,37 @@ class FlagsmithSegmentRulePriorityReorder:
             # retrieve features associated with segment
             for feature in self.retrieve_associated_features(segment_id):
                 if feature['environment'] in self.features_env_mapping:
-                    self.features_env_mapping[feature['environment']].append(feature)
-
-
-        # for each feature / env, get the overrides, then reorder based on pricing plan priority (total number of overrides - priority)
-        for environment_id, features in self.features_env_mapping.items():
-            for feature in features:
-                resp = requests.get(f"{self.base_url}/features/feature-segments/?environment={environment_id}&feature={feature['feature']}", headers=self.headers)
-                feature_segments = resp.json()['results']
-                matched_plans=[]
-                for feature_segment in feature_segments[:]:
-                    feature_segment_id = feature_segment['segment']
-                    if feature_segment['segment'] in self.segments_config:
-                        matched_plans.append({"priority": self.segments_config[feature_segment_id], "id": feature_segment['id'] })
-                        feature_segments.remove(feature_segment)
-                post_data=[]
-                for index, item in enumerate(feature_segments):
-                    post_data.append({"id": item['id'], "priority": index})
-                post_data_length=len(post_data)
-                sorted_matched_plans = sorted(matched_plans, key=itemgetter('priority'))
-
-                for sorted_matched_plans in matched_plans:
-                    post_data.append({"id":sorted_matched_plans['id'], "priority": post_data_length+sorted_matched_plans['priority']})
-                update_request = requests.post(f"{self.base_url}/features/feature-segments/update-priorities/", json=post_data, headers=self.headers)
-
-                if update_request.status_code == HTTPStatus.OK:
-                    self.module.exit_json(changed=True)
-                else:
-                    self.module.fail_json(msg=f"Priority update failed. {update_request.status_code} {update_request.content} \n  Uri: {update_request.url} \n Sent payload: {post_data}")
-
-        self.module.exit_json(changed=True)
+                    self.features_env_mapping[feature['environment']].append(feature['feature'])
+
+        # A feature associated with several plans is reordered once per environment
+        pairs = list(dict.fromkeys((environment_id, feature) for environment_id, features in self.features_env_mapping.items() for feature in features))
+        if not pairs:
+            self.module.exit_json(skipped=True, msg="no features attached to the segments")
+
+        # for each feature / env, get the overrides concurrently, then reorder based on pricing plan priority
+        results = []
+        updates = []
+        for (environment_id, feature), feature_segments in zip(pairs, self.executor.run([partial(self.retrieve_feature_segments, *p) for p in pairs])):
+            result = {"environment": self.environments[environment_id], "feature": feature, "changed": False, "failed": feature_segments is None}
+            results.append(result)
+            if feature_segments is None:
+                continue
+
+            post_data = self.target_priorities(feature_segments)
+            current   = {s["id"]: s.get("priority") for s in feature_segments}
+            if any(current[i["id"]] != i["priority"] for i in post_data):
+                updates.append((result, post_data))
+
+        # Submit every update, not only the first one
+        for (result, _), changed in zip(updates, self.executor.run([partial(self.update_priorities, post_data) for _, post_data in updates])):
+            result["changed"] = bool(changed)
+            result["failed"]  = changed is None
+
+        changed = any(r["changed"] for r in results)
+        if self.executor.errors:
+            self.module.fail_json(msg="Priority update failed for some features", errors=self.executor.errors, changed=changed, features=results)
+
+        self.module.exit_json(changed=changed, features=results)
 
 def main():
     module = AnsibleModule(
@@ -5,7 +5,10 @@ from http import HTTPStatus
 import requests
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.payload import sanitize_payload
+from ..module_utils.client import API_CLIENT_FIELDS, ApiClient
+from ..module_utils.stats import report_stats
+from ..module_utils.pagination import flagsmith_items, find_first
+from ..module_utils.payload import diff_payload, diff_result, sanitize_payload
 from ..module_utils.flagsmith import get_project_ids_from_names
 
 import random
@@ -18,6 +21,7 @@ TAG_FIELDS = {
     "label":        {"required": True, "type": "str"},
     "color":        {"required": False, "type": "str"},
     "description":  {"required": False, "type": "str"},
+    **API_CLIENT_FIELDS,
 }
 
 class FlagsmithTag:
@@ -29,42 +33,33 @@ class FlagsmithTag:
         self.project_name         = self.payload.pop("project_name")
         self.state                = self.payload.pop("state")
         self.headers              = {"Authorization": f"Api-Key {self.api_key}", "Accept": "application/json"}
+        self.client               = ApiClient.from_params(self.payload, self.headers)
+        report_stats(module, self.client)
         self.id                   = None
         self.project_id           = None
         self.retrieved_attributes = None
+        self.changes              = []
 
         self.payload = sanitize_payload(self.payload)
 
     def retrieve_id(self, api_url):
         """ Retrieve the id of a tag if it exists """
-        response = requests.get(api_url, headers=self.headers)
-        json_object = response.json()
-
-        for item in json_object["results"]:
-            if item["label"] == self.payload["label"]:
-                self.id = item["id"]
-                self.retrieved_attributes = {
-                    "label":       item["label"],
-                    "color":       item["color"],
-                    "description": item["description"]
-                }
-                return
-
-        if json_object["next"] is not None:
-            self.retrieve_id(json_object["next"])
+        item = find_first(flagsmith_items(self.client, api_url), lambda i: i["label"] == self.payload["label"])
+        if item is not None:
+            self.id = item["id"]
+            self.retrieved_attributes = {
+                "label":       item["label"],
+                "color":       item["color"],
+                "description": item["description"]
+            }
 
     def diff_attributes(self):
         """ Update the payload to only have the diff between the wanted and the existing attributes """
-        diff_attributes = {}
-        for key in self.payload:
-            if key not in self.retrieved_attributes or self.retrieved_attributes[key] != self.payload[key]:
-                diff_attributes[key] = self.payload[key]
-
-        self.payload = diff_attributes
+        self.payload, self.changes = diff_payload(self.payload, self.retrieved_attributes)
 
     def create(self):
         """ Create a new tag """
-        resp = requests.post(f"{self.base_url}/projects/{self.project_id}/tags/", headers=self.headers, json=self.payload)
+        resp = self.client.post(f"{self.base_url}/projects/{self.project_id}/tags/", json=self.payload)
         if resp.status_code == HTTPStatus.CREATED:
             self.module.exit_json(changed=True)
         else:
@@ -76,16 +71,16 @@ class FlagsmithTag:
         if not self.payload:
             self.module.exit_json(changed=False)
 
-        resp = requests.patch(f"{self.base_url}/projects/{self.project_id}/tags/{self.id}/", headers=self.headers, json=self.payload)
+        resp = self.client.patch(f"{self.base_url}/projects/{self.project_id}/tags/{self.id}/", json=self.payload)
 
         if resp.status_code == HTTPStatus.OK:
-            self.module.exit_json(changed=True)
+            self.module.exit_json(changed=True, **diff_result(self.module, self.changes))
         else:
             self.module.fail_json(msg=resp.content)
 
     def delete(self):
         """ Delete an existing tag """
-        resp = requests.delete(f"{self.base_url}/projects/{self.project_id}/tags/{self.id}/", headers=self.headers)
+        resp = self.client.delete(f"{self.base_url}/projects/{self.project_id}/tags/{self.id}/")
         if resp.status_code == HTTPStatus.NO_CONTENT:
             self.module.exit_json(changed=True)
         else:
@@ -94,13 +89,16 @@ class FlagsmithTag:
     def manage(self):
         """ Manage state of a tag """
 
-        project_ids = get_project_ids_from_names(self.base_url, self.headers, [self.project_name])
+        project_ids = get_project_ids_from_names(self.client, self.base_url, [self.project_name])
         if len(project_ids) == 0:
             self.module.fail_json(msg=f"project {self.project_name} not found")
         else:
             self.project_id = project_ids[0]
 
-        self.retrieve_id(f"{self.base_url}/projects/{self.project_id}/tags/")
+        try:
+            self.retrieve_id(f"{self.base_url}/projects/{self.project_id}/tags/")
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=str(e))
 
         if self.state == "present":
             if not self.id:
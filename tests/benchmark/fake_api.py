@@ -0,0 +1,319 @@
+"""
+In memory stand-in of the BetterUptime and Flagsmith APIs used by the benchmarks.
+
+Run it alone with `python tests/benchmark/fake_api.py --port 8000 --monitors 10000`
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+BETTERUPTIME_PREFIX = "/api/v2"
+FLAGSMITH_PREFIX    = "/api/v1"
+
+PAGING_PARAMS = {"page", "per_page", "page_size"}
+CREATED_AT    = "2023-01-01T00:00:00.000Z"
+
+DEFAULT_CONFIG = {
+    "latency":      0.0,
+    "page_size":    250,
+    "monitors":     1000,
+    "incidents":    5,
+    "policies":     10,
+    "status_pages": 10,
+    "sections":     5,
+    "resources":    20,
+    "reports":      50,
+    "projects":     5,
+    "features":     1000,
+    "tags":         50,
+    "segments":     20,
+    "environments": 3,
+}
+
+
+class Collection:
+    """ Ordered objects of a listing, rendered the BetterUptime or the Flagsmith way """
+    def __init__(self, flavor, kind=None):
+        self.flavor = flavor
+        self.kind   = kind
+        self.items  = {}
+
+    def render(self, id, fields):
+        if self.flavor == "betteruptime":
+            return {"id": str(id), "type": self.kind, "attributes": fields}
+        return {"id": id, **fields}
+
+    def match(self, fields, filters):
+        for key, value in filters.items():
+            if key == "search":
+                if value.lower() not in str(fields.get("name", fields.get("label", ""))).lower():
+                    return False
+            elif key == "from":
+                if fields["started_at"][:10] < value:
+                    return False
+            elif str(fields.get(key)) != value:
+                return False
+        return True
+
+    def page(self, url, query, page_size):
+        """ Return one page of the matching objects with the link to the next one """
+        page    = int(query.get("page", 1))
+        size    = min(int(query.get("per_page", query.get("page_size", page_size))), page_size)
+        filters = {k: v for k, v in query.items() if k not in PAGING_PARAMS}
+        items   = [self.render(i, f) for i, f in self.items.items() if self.match(f, filters)]
+        chunk   = items[(page - 1) * size:page * size]
+        next    = f"{url}?{urlencode({**query, 'page': page + 1})}" if page * size < len(items) else None
+
+        if self.flavor == "betteruptime":
+            return {"data": chunk, "pagination": {"first": None, "last": None, "prev": None, "next": next}}
+        return {"count": len(items), "next": next, "previous": None, "results": chunk}
+
+
+class FakeApi:
+    """ Seeded state of both APIs, with a counter of the calls it served """
+    def __init__(self, **config):
+        self.config   = {**DEFAULT_CONFIG, **config}
+        self.lock     = threading.Lock()
+        self.requests = Counter()
+        self.reset()
+
+    def reset(self):
+        self.next_id     = 0
+        self.collections = {}
+        self.requests.clear()
+        self.seed()
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def collection(self, path, flavor, kind=None):
+        if path not in self.collections:
+            self.collections[path] = Collection(flavor, kind)
+        return self.collections[path]
+
+    def add(self, path, flavor, kind=None, **fields):
+        id = self.new_id()
+        self.collection(path, flavor, kind).items[id] = fields
+        return id
+
+    def seed(self):
+        c = self.config
+
+        monitor_ids = []
+        for i in range(c["monitors"]):
+            monitor_ids.append(self.add("monitors", "betteruptime", "monitor", **monitor_attributes(f"https://monitor-{i}.example.com")))
+        # Incidents are also indexed by monitor for the /sla answers
+        self.incidents = {}
+        for i, monitor_id in enumerate(monitor_ids):
+            for started_at, resolved_at in incident_dates(i, c["incidents"]):
+                fields = {"monitor_id": str(monitor_id), "started_at": started_at, "resolved_at": resolved_at}
+                self.add("incidents", "betteruptime", "incident", **fields)
+                self.incidents.setdefault(str(monitor_id), []).append(fields)
+
+        for i in range(c["policies"]):
+            self.add("policies", "betteruptime", "policy", name=f"Policy {i}")
+
+        for i in range(c["status_pages"]):
+            page_id = self.add("status-pages", "betteruptime", "status_page", subdomain=f"status-{i}", company_name=f"Company {i}", timezone="UTC")
+            section_ids = [
+                self.add(f"status-pages/{page_id}/sections", "betteruptime", "status_page_section", name=f"Backend - Section {j}", position=j)
+                for j in range(c["sections"])
+            ]
+            for j in range(c["resources"]):
+                self.add(f"status-pages/{page_id}/resources", "betteruptime", "status_page_resource",
+                         status_page_section_id=section_ids[j % len(section_ids)] if section_ids else None,
+                         resource_id=monitor_ids[j % len(monitor_ids)] if monitor_ids else None,
+                         resource_type="Monitor", public_name=f"Resource {j}", widget_type="history", position=j)
+            for j in range(c["reports"]):
+                self.add(f"status-pages/{page_id}/status-reports", "betteruptime", "status_report",
+                         title=f"Report {j}", report_type="manual", message=f"Report {j}", starts_at=f"2023-01-{j % 28 + 1:02}T00:00:00.000Z")
+
+        self.collection("projects", "flagsmith")
+        for p in range(c["projects"]):
+            project_id = self.add("projects", "flagsmith", name=f"Project {p}")
+            env_ids    = [self.add(f"projects/{project_id}/environments", "flagsmith", name=f"Environment {e}", api_key=f"env-{e}") for e in range(c["environments"])]
+            tag_ids    = [self.add(f"projects/{project_id}/tags", "flagsmith", label=f"tag-{t}", color="#000000", description=None, project=project_id) for t in range(c["tags"])]
+            for f in range(c["features"]):
+                self.add(f"projects/{project_id}/features", "flagsmith", name=f"feature_{f}", type="STANDARD", default_enabled=False, initial_value=None,
+                         description=None, is_archived=False, tags=tag_ids[f % len(tag_ids):f % len(tag_ids) + 1])
+            for s in range(c["segments"]):
+                segment_id = self.add(f"projects/{project_id}/segments", "flagsmith", name=f"segment_{s}", project=project_id,
+                                      rules=[{"type": "ALL", "rules": [], "conditions": []}])
+                for e in env_ids:
+                    feature = (s % max(c["features"], 1)) + 1
+                    self.add(f"projects/{project_id}/segments/{segment_id}/associated-features", "flagsmith", feature=feature, environment=e)
+                    self.add("features/feature-segments", "flagsmith", segment=segment_id, feature=feature, environment=e, priority=s)
+
+    def sla(self, monitor_id, query):
+        """ SLA of a monitor over the from/to window, computed from its seeded incidents """
+        start = parse_date(f"{query.get('from', '2000-01-01')}T00:00:00.000Z")
+        end   = parse_date(f"{query['to']}T00:00:00.000Z") + 86400 if "to" in query else time.time()
+        end   = min(end, time.time())
+
+        incidents = sorted(
+            (max(parse_date(f["started_at"]), start), min(parse_date(f["resolved_at"]) if f["resolved_at"] else end, end))
+            for f in self.incidents.get(monitor_id, [])
+        )
+        incidents = [(s, e) for s, e in incidents if s < e]
+
+        # Union of the incidents, overlapping ones only counted once in the downtime
+        downtime, reach = 0.0, start
+        for s, e in incidents:
+            downtime += max(e - max(s, reach), 0)
+            reach     = max(reach, e)
+
+        durations = [e - s for s, e in incidents]
+        return HTTPStatus.OK, {"data": {"id": monitor_id, "type": "monitor_sla", "attributes": {
+            "availability":        round(100 * (1 - downtime / (end - start)), 4) if end > start else 100.0,
+            "total_downtime":      round(downtime),
+            "number_of_incidents": len(incidents),
+            "longest_incident":    round(max(durations, default=0)),
+            "average_incident":    round(sum(durations) / len(durations)) if durations else 0,
+        }}}
+
+    def handle(self, method, url, query, body):
+        """ Serve a call, return its status code and json body """
+        path = urlsplit(url).path
+        for prefix, flavor in ((BETTERUPTIME_PREFIX, "betteruptime"), (FLAGSMITH_PREFIX, "flagsmith")):
+            if path.startswith(prefix):
+                break
+        else:
+            return HTTPStatus.NOT_FOUND, {"detail": "Not found"}
+        resource = path[len(prefix):].strip("/")
+
+        with self.lock:
+            self.requests[method] += 1
+            if resource.endswith("/sla"):
+                return self.sla(resource.split("/")[1], query)
+            if resource == "features/feature-segments/update-priorities":
+                return HTTPStatus.OK, body
+            if resource in self.collections and method == "GET" and (resource == "projects" or resource.endswith("/environments")):
+                # Unpaginated Flagsmith listings
+                return HTTPStatus.OK, [c.render(i, f) for c in [self.collections[resource]] for i, f in c.items.items()]
+
+            if method == "POST" or (method == "GET" and not resource.rpartition("/")[2].isdigit()):
+                collection = self.collection(resource, flavor, resource.split("/")[-1].rstrip("s"))
+                if method == "GET":
+                    return HTTPStatus.OK, collection.page(url.split("?")[0], query, self.config["page_size"])
+                fields = {**body, "created_at": CREATED_AT}
+                id     = self.add(resource, flavor, collection.kind, **fields)
+                return HTTPStatus.CREATED, {"data": collection.render(id, fields)} if flavor == "betteruptime" else collection.render(id, fields)
+
+            parent, _, id = resource.rpartition("/")
+            if parent not in self.collections or not id.isdigit() or int(id) not in self.collections[parent].items:
+                return HTTPStatus.NOT_FOUND, {"errors": "Resource not found"}
+            collection, id = self.collections[parent], int(id)
+
+            if method == "DELETE":
+                del collection.items[id]
+                return HTTPStatus.NO_CONTENT, None
+            if method in ("PATCH", "PUT"):
+                collection.items[id].update(body)
+            item = collection.render(id, collection.items[id])
+            return HTTPStatus.OK, {"data": item} if flavor == "betteruptime" else item
+
+
+def incident_dates(i: int, count: int) -> list:
+    """ Started and resolved dates of the incidents of the i-th monitor, the second one overlapping the first one """
+    dates = []
+    for k in range(count):
+        start = datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(days=(i * 7 + k * 53) % 365, hours=(i + k * 37) % 24)
+        if k == 1:
+            start = datetime.fromisoformat(dates[0][0].replace("Z", "+00:00")) + timedelta(minutes=10)
+        end = start + timedelta(minutes=(i + k) % 120 + 15)
+        dates.append((format_date(start), format_date(end)))
+    return dates
+
+
+def format_date(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def parse_date(date_text: str) -> float:
+    return datetime.fromisoformat(date_text.replace("Z", "+00:00")).timestamp()
+
+
+def monitor_attributes(url: str) -> dict:
+    """ Attributes of a monitor as BetterUptime returns them, matching the module defaults """
+    return {
+        "url":                 url,
+        "pronounceable_name":  url,
+        "monitor_type":        "status",
+        "port":                None,
+        "check_frequency":     300,
+        "confirmation_period": 120,
+        "call":                False,
+        "sms":                 False,
+        "email":               True,
+        "push":                False,
+        "paused":              False,
+        "request_headers":     [],
+        "policy_id":           None,
+        "created_at":          CREATED_AT,
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version        = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body   = json.loads(self.rfile.read(length)) if length else None
+        query  = dict(parse_qsl(urlsplit(self.path).query))
+        api    = self.server.api
+
+        if self.path == "/_stats":
+            status, payload = HTTPStatus.OK, {"requests": sum(api.requests.values()), "methods": dict(api.requests)}
+        elif self.path == "/_reset":
+            with api.lock:
+                api.reset()
+            status, payload = HTTPStatus.OK, {}
+        else:
+            time.sleep(api.config["latency"])
+            status, payload = api.handle(self.command, f"http://{self.headers['Host']}{self.path}", query, body)
+
+        content = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 0, ready=None, **config):
+    """ Serve the fake API until killed, sending the listened port through the ready queue if given """
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.api            = FakeApi(**config)
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--latency", type=float, default=DEFAULT_CONFIG["latency"], help="Delay added to every call, in seconds")
+    for key, value in DEFAULT_CONFIG.items():
+        if key != "latency":
+            parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    add_config_arguments(parser)
+    args = vars(parser.parse_args())
+    serve(**args)
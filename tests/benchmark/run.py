@@ -0,0 +1,181 @@
+"""
+Run the modules against the fake API and report their wall time, number of API calls and peak memory.
+
+    python tests/benchmark/run.py --monitors 10000 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ansible.module_utils import basic  # noqa: E402
+
+import fake_api  # noqa: E402
+
+BETTERUPTIME_URL = "https://betteruptime.com/api/v2"
+
+
+def monitor(i: int, **options) -> dict:
+    return {"url": f"https://monitor-{i}.example.com", "state": "present", "monitor_type": "status", **options}
+
+
+# name: (module, args builder taking the fake API config and the Flagsmith base url)
+SCENARIOS = {
+    "monitor_update": ("betteruptime_monitor", lambda c, _: {
+        "api_key": "key", **monitor(c["monitors"] - 1, check_frequency=60),
+    }),
+    "monitor_batch": ("betteruptime_monitor", lambda c, _: {
+        "api_key": "key", "monitors": [monitor(i, check_frequency=60 if i % 10 == 0 else 300) for i in range(c["monitors"] + c["monitors"] // 10)],
+    }),
+    "monitor_sla": ("betteruptime_monitor_sla", lambda c, _: {
+        "api_key": "key", "url": f"https://monitor-{c['monitors'] - 1}.example.com", "from": "2023-01-01", "to": "2023-01-31",
+    }),
+    "monitor_sla_bulk": ("betteruptime_monitor_sla", lambda c, _: {
+        "api_key": "key", "url_pattern": r"^https://monitor-\d*7\.example\.com$", "from": "2023-01-01", "to": "2023-01-31",
+    }),
+    "monitor_sla_series": ("betteruptime_monitor_sla", lambda c, _: {
+        "api_key": "key", "url": f"https://monitor-{c['monitors'] - 1}.example.com", "from": "2022-01-01", "to": "2023-12-31", "granularity": "month",
+    }),
+    "monitor_sla_export": ("betteruptime_monitor_sla", lambda c, _: {
+        "api_key": "key", "url_pattern": ".", "from": "2023-01-01", "to": "2023-03-31", "granularity": "month",
+        "export_path": str(Path(tempfile.gettempdir()) / "monitor_sla_export.csv"),
+    }),
+    "monitor_availability_series": ("betteruptime_monitor_availability", lambda c, _: {
+        "api_key": "key", "url_pattern": r"^https://monitor-\d*7\.example\.com$", "from": "2023-01-01", "to": "2023-12-31", "granularity": "month",
+    }),
+    "status_page": ("betteruptime_status_page", lambda c, _: {
+        "api_key": "key", "state": "present", "subdomain": f"status-{c['status_pages'] - 1}", "scope": "backend", "company_name": "Company",
+        "sections": [
+            {"name": f"Section {j}", "resources": [
+                {"resource_name": f"https://monitor-{r}.example.com", "public_name": f"Resource {r}"} for r in range(j, c["resources"], max(c["sections"], 1))
+            ]} for j in range(c["sections"])
+        ],
+    }),
+    "status_page_report": ("betteruptime_status_page_report", lambda c, _: {
+        "api_key": "key", "subdomain": f"status-{c['status_pages'] - 1}", "title": "Incident", "state": "create", "status": "degraded",
+        "report_type": "manual", "message": "Something is slow",
+    }),
+    "status_page_report_update": ("betteruptime_status_page_report", lambda c, _: {
+        "api_key": "key", "subdomain": f"status-{c['status_pages'] - 1}", "title": "Report 0", "state": "update", "status": "degraded",
+        "report_type": "manual", "starts_at": "2023-01-01T00:00+0000",
+        "report_update": [{"message": f"Update {u}", "published_at": f"2023-01-01T{u:02}:00+0000"} for u in range(10)],
+    }),
+    "status_page_report_broadcast": ("betteruptime_status_page_report", lambda c, _: {
+        "api_key": "key", "subdomains": [f"status-{p}" for p in range(c["status_pages"])], "title": "Incident", "state": "create",
+        "status": "degraded", "report_type": "manual", "message": "Something is slow",
+    }),
+    "flagsmith_feature": ("flagsmith_feature", lambda c, url: {
+        "api_key": "key", "base_url": url, "state": "present", "project_name": f"Project {c['projects'] - 1}",
+        "name": f"feature_{c['features'] - 1}", "description": "Updated", "tags": [f"tag-{c['tags'] - 1}"],
+    }),
+    "flagsmith_features_batch": ("flagsmith_feature", lambda c, url: {
+        "api_key": "key", "base_url": url, "project_name": f"Project {c['projects'] - 1}",
+        "features": [{"name": f"feature_{f}", "state": "present", "description": "Updated" if f % 10 == 0 else None} for f in range(c["features"])],
+    }),
+    "flagsmith_tag": ("flagsmith_tag", lambda c, url: {
+        "api_key": "key", "base_url": url, "state": "present", "project_name": f"Project {c['projects'] - 1}",
+        "label": f"tag-{c['tags'] - 1}", "color": "#FFFFFF",
+    }),
+    "flagsmith_segment_rule": ("flagsmith_segment_rule", lambda c, url: {
+        "api_key": "key", "base_url": url, "state": "present", "project_name": f"Project {c['projects'] - 1}",
+        "name": f"segment_{c['segments'] - 1}", "rules": json.dumps([{"type": "ALL", "rules": [], "conditions": []}]),
+    }),
+    "flagsmith_segment_rule_priority_reorder": ("flagsmith_segment_rule_priority_reorder", lambda c, url: {
+        "api_key": "key", "base_url": url, "state": "present", "project_name": f"Project {c['projects'] - 1}",
+        "environment_names": [f"Environment {e}" for e in range(c["environments"])],
+        "pricing_plans": {f"plan_{s}": {"flagsmith_plan_name": f"segment_{s}", "priority": s} for s in range(c["segments"])},
+    }),
+}
+
+
+def run_module(name: str, args: dict, api_url: str) -> dict:
+    """ Run the main() of a module with the given args, the BetterUptime urls pointing to the fake API """
+    module  = importlib.import_module(f"plugins.modules.{name}")
+    patched = {k: v.replace(BETTERUPTIME_URL, f"{api_url}{fake_api.BETTERUPTIME_PREFIX}") for k, v in vars(module).items()
+               if k.startswith("API_") and isinstance(v, str) and v.startswith(BETTERUPTIME_URL)}
+
+    stdout = io.StringIO()
+    with mock.patch.dict(vars(module), patched), mock.patch.object(basic, "_ANSIBLE_ARGS", json.dumps({"ANSIBLE_MODULE_ARGS": args}).encode()):
+        with contextlib.redirect_stdout(stdout), contextlib.suppress(SystemExit):
+            module.main()
+
+    try:
+        return json.loads(stdout.getvalue())
+    except ValueError:
+        return {"failed": True, "msg": stdout.getvalue()}
+
+
+def run_scenario(name: str, config: dict, api_url: str) -> dict:
+    module, build_args = SCENARIOS[name]
+    requests.get(f"{api_url}/_reset").raise_for_status()
+    args = build_args(config, f"{api_url}{fake_api.FLAGSMITH_PREFIX}")
+
+    tracemalloc.start()
+    start  = time.perf_counter()
+    result = run_module(module, args, api_url)
+    wall   = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = requests.get(f"{api_url}/_stats").json()
+    return {
+        "scenario": name,
+        "wall_s":   round(wall, 3),
+        "requests": stats["requests"],
+        "peak_kib": round(peak / 1024),
+        "status":   "failed" if result.get("failed") else "changed" if result.get("changed") else "ok",
+    }
+
+
+def print_table(rows: list):
+    columns = list(rows[0])
+    widths  = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print(" | ".join(c.ljust(widths[c]) for c in columns))
+    print("-|-".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print(" | ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run, all of them by default")
+    parser.add_argument("--json", action="store_true", help="Print the results as json lines")
+    fake_api.add_config_arguments(parser)
+    options   = vars(parser.parse_args())
+    scenarios = options.pop("scenario") or list(SCENARIOS)
+    as_json   = options.pop("json")
+    config    = {**fake_api.DEFAULT_CONFIG, **options}
+
+    # The API runs in its own process so that it weighs neither on the measured memory nor on the GIL
+    ready  = multiprocessing.Queue()
+    server = multiprocessing.Process(target=fake_api.serve, kwargs={"ready": ready, **config}, daemon=True)
+    server.start()
+    api_url = f"http://127.0.0.1:{ready.get(timeout=60)}"
+
+    try:
+        rows = [run_scenario(name, config, api_url) for name in scenarios]
+    finally:
+        server.terminate()
+
+    if as_json:
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
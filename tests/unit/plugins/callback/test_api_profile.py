@@ -0,0 +1,61 @@
+import json
+
+import mock
+
+from plugins.callback.api_profile import ApiProfile, CallbackModule
+
+
+def api_stats(endpoints, endpoints_ms, histogram_ms, retries=0, pages=0):
+    return {
+        "requests":       sum(endpoints.values()),
+        "endpoints":      endpoints,
+        "endpoints_ms":   endpoints_ms,
+        "bytes_received": 100,
+        "histogram_ms":   histogram_ms,
+        "retries":        retries,
+        "pages":          pages,
+    }
+
+
+def test_profile_merges_tasks():
+    profile = ApiProfile()
+
+    profile.add("betteruptime_monitor", api_stats({"GET /api/v2/monitors": 2}, {"GET /api/v2/monitors": 40}, {"<=25": 2}, pages=2))
+    profile.add("betteruptime_monitor", api_stats({"GET /api/v2/monitors": 1, "PATCH /api/v2/monitors/{id}": 1},
+                                                  {"GET /api/v2/monitors": 20, "PATCH /api/v2/monitors/{id}": 300}, {"<=25": 1, "<=500": 1}, retries=1))
+    profile.add("flagsmith_tag", api_stats({"GET /api/v1/projects/": 1}, {"GET /api/v1/projects/": 5}, {"<=10": 1}))
+    result = profile.to_dict(top=2)
+
+    assert result["modules"] == {"betteruptime_monitor": {"tasks": 2, "requests": 4}, "flagsmith_tag": {"tasks": 1, "requests": 1}}
+    assert result["requests"] == 5
+    assert result["retries"] == 1
+    assert result["pages"] == 2
+    assert result["slowest_endpoints"] == [
+        {"endpoint": "PATCH /api/v2/monitors/{id}", "calls": 1, "mean_ms": 300.0, "total_ms": 300.0},
+        {"endpoint": "GET /api/v2/monitors", "calls": 3, "mean_ms": 20.0, "total_ms": 60.0},
+    ]
+    assert result["histogram_ms"]["<=25"] == 3
+    assert result["histogram_ms"][">5000"] == 0
+    assert len(profile.render(top=2)) == 2 + 1 + 2 + 1 + 10 + 1 + 1
+
+
+def callback_result(action, result):
+    res = mock.Mock()
+    res._task.action = action
+    res._result = result
+    return res
+
+
+def test_callback_collects_and_writes_profile(tmp_path):
+    callback = CallbackModule(display=mock.Mock(verbosity=0))
+    stats    = api_stats({"GET /api/v2/monitors": 1}, {"GET /api/v2/monitors": 10}, {"<=10": 1})
+
+    callback.v2_runner_on_ok(callback_result("betteruptime_monitor", {"changed": True, "api_stats": stats}))
+    callback.v2_runner_on_failed(callback_result("betteruptime_monitor", {"failed": True, "results": [{"api_stats": stats}, {"failed": True}]}))
+    callback.v2_runner_on_ok(callback_result("ansible.builtin.debug", {"msg": "not profiled"}))
+
+    with mock.patch.object(CallbackModule, "get_option", side_effect={"top": 5, "output_path": str(tmp_path / "profile.json")}.get):
+        callback.v2_playbook_on_stats(mock.Mock())
+
+    profile = json.loads((tmp_path / "profile.json").read_text())
+    assert profile["modules"] == {"betteruptime_monitor": {"tasks": 2, "requests": 2}}
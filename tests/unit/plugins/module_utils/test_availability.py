@@ -0,0 +1,60 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from plugins.module_utils.availability import IncidentHistory, window_bounds  # noqa: E402
+
+DAY = 86400.0
+
+
+@pytest.mark.parametrize("starts, ends, expected" , [
+        pytest.param([], [], ([], []), id="No incident"),
+        pytest.param([10, 50], [20, 60], ([10, 50], [20, 60]), id="Disjoint"),
+        pytest.param([10, 15, 50], [20, 30, 60], ([10, 50], [30, 60]), id="Overlapping merged"),
+        pytest.param([15, 10, 12], [18, 40, 20], ([10], [40]), id="Unsorted and nested"),
+        pytest.param([10], [float("inf")], ([10], [100]), id="Unresolved ended now"),
+    ]
+)
+def test_downtime_intervals(starts, ends, expected):
+    history = IncidentHistory(list(range(len(starts))), starts, ends)
+
+    merged = history.downtime_intervals(now=100)
+
+    assert (merged[0].tolist(), merged[1].tolist()) == expected
+
+
+def test_availability():
+    history = IncidentHistory([1, 2, 3], [0.5 * DAY, 0.75 * DAY, 1.9 * DAY], [0.8 * DAY, 0.85 * DAY, 2.1 * DAY])
+
+    computed = history.availability([0, DAY, 2 * DAY, 3 * DAY], [DAY, 2 * DAY, 3 * DAY, 4 * DAY], now=10 * DAY)
+
+    assert computed == {
+        "availability":        [65.0, 90.0, 90.0, 100.0],
+        "total_downtime":      [30240, 8640, 8640, 0],
+        "number_of_incidents": [2, 1, 1, 0],
+    }
+
+
+def test_availability_window_clipped_to_now():
+    history = IncidentHistory([1], [0.5 * DAY], [float("inf")])
+
+    computed = history.availability([0, 2 * DAY], [2 * DAY, 3 * DAY], now=DAY)
+
+    assert computed == {"availability": [50.0, 100.0], "total_downtime": [43200, 0], "number_of_incidents": [1, 0]}
+
+
+def test_append_replaces_listed_again():
+    history = IncidentHistory([1, 2], [0, 5 * DAY], [DAY, float("inf")], synced_at=10 * DAY)
+    assert history.sync_from() == date(1970, 1, 6)
+
+    history.append([2, 3], [5 * DAY, 11 * DAY], [6 * DAY, 12 * DAY], synced_at=20 * DAY)
+
+    assert sorted(zip(history.ids.tolist(), history.ends.tolist())) == [(1, DAY), (2, 6 * DAY), (3, 12 * DAY)]
+    assert history.sync_from() == date(1970, 1, 21)
+    assert IncidentHistory.from_dict(history.to_dict()).to_dict() == history.to_dict()
+
+
+def test_window_bounds():
+    assert window_bounds([(date(1970, 1, 1), date(1970, 1, 1)), (date(1970, 1, 2), date(1970, 1, 31))]) == ([0, DAY], [DAY, 31 * DAY])
@@ -0,0 +1,98 @@
+import mock
+import pytest
+
+from plugins.module_utils.cache import ListingCache, parent_paths, resource_name
+from plugins.module_utils.client import ApiClient
+
+
+@pytest.mark.parametrize("url, expected", [
+        pytest.param("https://api.flagsmith.com/api/v1/projects/", "projects", id="Flagsmith projects"),
+        pytest.param("https://api.flagsmith.com/api/v1/projects/4/tags/?page=2", "tags", id="Flagsmith tags"),
+        pytest.param("https://betteruptime.com/api/v2/status-pages/12", "status-pages", id="BetterUptime status page"),
+    ]
+)
+def test_resource_name(url, expected):
+    assert resource_name(url) == expected
+
+
+@mock.patch('time.time')
+def test_get_expired_after_resource_ttl(mock_time, tmp_path):
+    cache = ListingCache(str(tmp_path), "Bearer key", {"policies": 10})
+    mock_time.return_value = 1000.0
+    cache.set("https://betteruptime.com/api/v2/policies", {"data": []})
+    cache.set("https://betteruptime.com/api/v2/status-pages", {"data": []})
+
+    mock_time.return_value = 1020.0
+    assert cache.get("https://betteruptime.com/api/v2/policies") is None
+    assert cache.get("https://betteruptime.com/api/v2/status-pages") == {"data": []}
+
+
+def test_entries_bound_to_the_key(tmp_path):
+    ListingCache(str(tmp_path), "Bearer key").set("dummy", [1])
+
+    assert ListingCache(str(tmp_path), "Bearer key").get("dummy") == [1]
+    assert ListingCache(str(tmp_path), "Bearer other").get("dummy") is None
+
+
+@pytest.mark.parametrize("written_url, expected_invalidated", [
+        pytest.param("https://betteruptime.com/api/v2/status-pages", True, id="Status page creation"),
+        pytest.param("https://betteruptime.com/api/v2/status-pages/12/sections", True, id="Section creation"),
+        pytest.param("https://betteruptime.com/api/v2/monitors/3", False, id="Unrelated write"),
+    ]
+)
+def test_invalidate(tmp_path, written_url, expected_invalidated):
+    cache = ListingCache(str(tmp_path), "Bearer key")
+    cache.set("https://betteruptime.com/api/v2/status-pages?per_page=250", {"data": []})
+
+    cache.invalidate(written_url)
+
+    assert (cache.get("https://betteruptime.com/api/v2/status-pages?per_page=250") is None) == expected_invalidated
+
+
+def test_parent_paths():
+    assert parent_paths("/api/v2/status-pages/12/sections") == ["/api/v2/status-pages/12/sections", "/api/v2/status-pages/12", "/api/v2/status-pages", "/api/v2", "/api", ""]
+
+
+@mock.patch('time.time')
+def test_records_never_expire_nor_invalidated(mock_time, tmp_path):
+    cache = ListingCache(str(tmp_path), "Bearer key")
+    mock_time.return_value = 1000.0
+    cache.set_record("https://betteruptime.com/api/v2/incidents?monitor_id=1", {"ids": [1]})
+
+    mock_time.return_value = 10 ** 9
+    cache.invalidate("https://betteruptime.com/api/v2/incidents")
+
+    assert cache.get_record("https://betteruptime.com/api/v2/incidents?monitor_id=1") == {"ids": [1]}
+    assert cache.get_record("https://betteruptime.com/api/v2/incidents?monitor_id=2") is None
+
+
+def test_invalidate_only_reads_the_written_paths(tmp_path):
+    cache = ListingCache(str(tmp_path), "Bearer key")
+    for i in range(50):
+        cache.set(f"https://betteruptime.com/api/v2/monitors/{i}/sla?from=2024-01-01", {"data": i})
+        cache.set_record(f"https://betteruptime.com/api/v2/incidents?monitor_id={i}", {"ids": [i]})
+    cache.set("https://betteruptime.com/api/v2/monitors?per_page=250", {"data": []})
+
+    with mock.patch('json.load') as mock_load:
+        cache.invalidate("https://betteruptime.com/api/v2/monitors/3")
+    mock_load.assert_not_called()
+
+    assert cache.get("https://betteruptime.com/api/v2/monitors?per_page=250") is None
+    assert cache.get("https://betteruptime.com/api/v2/monitors/3/sla?from=2024-01-01") == {"data": 3}
+
+
+@mock.patch('requests.Session.request')
+def test_client_get_json_cached(mock_session_request, tmp_path):
+    response = mock.Mock()
+    response.status_code = 200
+    response.json.return_value = [{"id": 1, "name": "project"}]
+    mock_session_request.return_value = response
+    client = ApiClient({"Authorization": "Api-Key key"}, cache_dir=str(tmp_path))
+
+    assert client.get_json("https://flagsmith/projects/", cached=True) == [{"id": 1, "name": "project"}]
+    assert client.get_json("https://flagsmith/projects/", cached=True) == [{"id": 1, "name": "project"}]
+    assert mock_session_request.call_count == 1
+
+    client.post("https://flagsmith/projects/")
+    client.get_json("https://flagsmith/projects/", cached=True)
+    assert mock_session_request.call_count == 3
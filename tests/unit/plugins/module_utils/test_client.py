@@ -0,0 +1,129 @@
+import mock
+import pytest
+import requests
+
+from plugins.module_utils.client import AdaptiveLimiter, ApiClient
+
+
+@mock.patch('requests.Session.request')
+def test_request_uses_default_timeout(mock_session_request):
+    client = ApiClient({"Authorization": "Bearer token"}, timeout=12)
+
+    client.get("dummy")
+
+    mock_session_request.assert_called_once_with("GET", "dummy", timeout=12)
+
+
+@mock.patch('requests.Session.request')
+def test_request_overrides_timeout(mock_session_request):
+    client = ApiClient({})
+
+    client.post("dummy", json={}, timeout=1)
+
+    mock_session_request.assert_called_once_with("POST", "dummy", json={}, timeout=1)
+
+
+@pytest.mark.parametrize("params, expected_timeout, expected_params", [
+        pytest.param({"api_timeout": 5, "url": "toto"}, 5, {"url": "toto"}, id="Timeout set"),
+        pytest.param({"url": "toto"}, 30, {"url": "toto"}, id="Default timeout"),
+    ]
+)
+def test_from_params(params, expected_timeout, expected_params):
+    client = ApiClient.from_params(params, {"Authorization": "Bearer token"})
+
+    assert client.timeout == expected_timeout
+    assert params == expected_params
+    assert client.session.headers["Authorization"] == "Bearer token"
+    assert client.session.headers["Accept-Encoding"] == "gzip"
+
+
+def api_response(status_code, headers=None):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+@pytest.mark.parametrize("method, statuses, expected_nb_call_api, expected_status" , [
+        pytest.param("GET", [200], 1, 200, id="No retry on success"),
+        pytest.param("GET", [429, 429, 200], 3, 200, id="Retry throttled GET"),
+        pytest.param("POST", [429, 201], 2, 201, id="Retry throttled POST"),
+        pytest.param("GET", [503, 200], 2, 200, id="Retry unavailable GET"),
+        pytest.param("POST", [503, 201], 1, 503, id="No retry of unavailable POST"),
+        pytest.param("GET", [404], 1, 404, id="No retry on client error"),
+        pytest.param("GET", [429, 429, 429], 3, 429, id="Give up after the retries"),
+    ]
+)
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_request_retries(mock_session_request, mock_sleep, method, statuses, expected_nb_call_api, expected_status):
+    mock_session_request.side_effect = [api_response(s) for s in statuses]
+    client = ApiClient({}, retries=2)
+
+    res = client.request(method, "dummy")
+
+    assert res.status_code == expected_status
+    assert mock_session_request.call_count == expected_nb_call_api
+    assert mock_sleep.call_count == expected_nb_call_api - 1
+
+
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_request_honors_retry_after(mock_session_request, mock_sleep):
+    mock_session_request.side_effect = [api_response(429, {"Retry-After": "7"}), api_response(200)]
+    client = ApiClient({})
+
+    client.get("dummy")
+
+    mock_sleep.assert_called_once_with(7.0)
+
+
+@pytest.mark.parametrize("retry_after", [
+        pytest.param("3600", id="Seconds"),
+        pytest.param("Fri, 31 Dec 2100 23:59:59 GMT", id="Date"),
+    ]
+)
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_request_gives_up_on_long_retry_after(mock_session_request, mock_sleep, retry_after):
+    mock_session_request.side_effect = [api_response(429, {"Retry-After": retry_after}), api_response(200)]
+    client = ApiClient({})
+
+    res = client.get("dummy")
+
+    assert res.status_code == 429
+    assert mock_session_request.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+@pytest.mark.parametrize("method, expected_nb_call_api", [
+        pytest.param("GET", 2, id="Idempotent"),
+        pytest.param("PATCH", 1, id="Not idempotent"),
+    ]
+)
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_request_retries_connection_errors(mock_session_request, mock_sleep, method, expected_nb_call_api):
+    mock_session_request.side_effect = requests.exceptions.ConnectionError("reset")
+    client = ApiClient({}, retries=1)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.request(method, "dummy")
+
+    assert mock_session_request.call_count == expected_nb_call_api
+
+
+def test_adaptive_limiter():
+    limiter = AdaptiveLimiter(8)
+
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        limiter.on_success()
+    assert limiter.limit == 3
+
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.limit == 1
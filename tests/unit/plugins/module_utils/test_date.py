@@ -1,8 +1,9 @@
-from datetime import datetime
+from datetime import date
 import pytest
 
 from plugins.module_utils.date import validate_date
-from plugins.module_utils.date import compare_date
+from plugins.module_utils.date import minute_epoch
+from plugins.module_utils.date import period_windows
 
 @pytest.mark.parametrize(
         "date_str, date_fmt, expected",
@@ -24,28 +25,27 @@ def test_validate_date(date_str, date_fmt, expected):
     assert res == expected
 
 @pytest.mark.parametrize(
-        "a, b, attributes, expected",
+        "date_str, expected",
         [
-            pytest.param(
-                datetime(2017, 11, 28, 23, 55, 59),
-                datetime(2017, 11, 28, 23, 55, 59),
-                ["year", "month", "day", "hour", "minute", "second"],
-                True,
-                id="Exactly same dates"),
-            pytest.param(
-                datetime(2017, 11, 28, 23, 55, 59),
-                datetime(2022, 12, 21, 23, 55, 59),
-                ["year", "month", "day", "hour", "minute", "second"],
-                False,
-                id="Different dates"),
-            pytest.param(
-                datetime(2017, 11, 28, 23, 55, 59),
-                datetime(2017, 11, 28, 23, 55, 30),
-                ["year", "month", "day", "hour", "minute"],
-                True,
-                id="Seconds different but not compared"),
+            pytest.param("2021-12-17T13:00+0200", 27328980, id="Payload format"),
+            pytest.param("2021-12-17T11:00:42.123Z", 27328980, id="API format, seconds ignored"),
         ]
 )
-def test_compare_date(a, b, attributes, expected):
-    res = compare_date(a, b, attributes)
-    assert res == expected
+def test_minute_epoch(date_str, expected):
+    assert minute_epoch(date_str) == expected
+
+@pytest.mark.parametrize(
+        "start, end, granularity, expected",
+        [
+            pytest.param(date(2024, 1, 30), date(2024, 2, 1), "day", [(date(2024, 1, d), date(2024, 1, d)) for d in (30, 31)] + [(date(2024, 2, 1), date(2024, 2, 1))], id="Days"),
+            pytest.param(date(2024, 1, 3), date(2024, 1, 16), "week", [
+                (date(2024, 1, 3), date(2024, 1, 7)), (date(2024, 1, 8), date(2024, 1, 14)), (date(2024, 1, 15), date(2024, 1, 16)),
+            ], id="ISO weeks clipped"),
+            pytest.param(date(2023, 12, 15), date(2024, 3, 1), "month", [
+                (date(2023, 12, 15), date(2023, 12, 31)), (date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29)), (date(2024, 3, 1), date(2024, 3, 1)),
+            ], id="Months across a year and a leap day"),
+            pytest.param(date(2024, 2, 1), date(2024, 1, 1), "month", [], id="Empty range"),
+        ]
+)
+def test_period_windows(start, end, granularity, expected):
+    assert period_windows(start, end, granularity) == expected
@@ -0,0 +1,87 @@
+import mock
+import pytest
+import requests
+
+from plugins.module_utils.client import ApiError
+from plugins.module_utils.executor import ConcurrentExecutor
+
+
+def failing_call():
+    response = mock.Mock()
+    response.status_code = 500
+    response.url = "dummy"
+    response.text = "Internal error"
+    raise ApiError(response)
+
+
+@pytest.mark.parametrize("max_workers", [
+        pytest.param(1, id="Sequential"),
+        pytest.param(4, id="Concurrent"),
+    ]
+)
+def test_run_keeps_results_order(max_workers):
+    executor = ConcurrentExecutor(max_workers)
+
+    res = executor.run([lambda i=i: i for i in range(10)])
+
+    assert res == list(range(10))
+    assert executor.errors == []
+
+
+@pytest.mark.parametrize("max_workers", [
+        pytest.param(1, id="Sequential"),
+        pytest.param(4, id="Concurrent"),
+    ]
+)
+def test_run_collects_errors(max_workers):
+    executor = ConcurrentExecutor(max_workers)
+
+    res = executor.run([lambda: True, failing_call, lambda: True, failing_call])
+
+    assert res == [True, None, True, None]
+    assert executor.errors == ["500 dummy: Internal error", "500 dummy: Internal error"]
+
+
+def test_run_collects_request_exceptions():
+    executor = ConcurrentExecutor(2)
+
+    def timeout():
+        raise requests.exceptions.Timeout("Read timed out")
+
+    res = executor.run([timeout, lambda: True])
+
+    assert res == [None, True]
+    assert executor.errors == ["Read timed out"]
+
+
+def test_run_propagates_other_exceptions():
+    executor = ConcurrentExecutor(2)
+
+    def bug():
+        raise KeyError("id")
+
+    with pytest.raises(KeyError):
+        executor.run([bug, lambda: True])
+
+
+@pytest.mark.parametrize("max_workers", [
+        pytest.param(1, id="Sequential"),
+        pytest.param(4, id="Concurrent"),
+    ]
+)
+def test_stream_is_lazy_and_ordered(max_workers):
+    executor = ConcurrentExecutor(max_workers)
+    submitted = []
+
+    def calls():
+        for i in range(100):
+            submitted.append(i)
+            yield (failing_call if i == 3 else lambda i=i: i)
+
+    stream = executor.stream(calls())
+    first  = [next(stream) for _ in range(5)]
+
+    assert first == [0, 1, 2, None, 4]
+    assert len(submitted) <= 5 + 2 * max_workers
+    assert list(stream) == list(range(5, 100))
+    assert len(executor.errors) == 1
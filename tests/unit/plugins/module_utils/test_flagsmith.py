@@ -1,7 +1,8 @@
 import pytest
 import mock
 
-from plugins.module_utils.flagsmith import get_project_ids_from_names, get_tag_ids_from_labels
+from plugins.module_utils.client import ApiClient
+from plugins.module_utils.flagsmith import FlagsmithLookupError, FlagsmithResolver, get_project_ids_from_names
 
 @pytest.mark.parametrize(
         "projects_names, api_response, expected",
@@ -23,14 +24,14 @@ from plugins.module_utils.flagsmith import get_project_ids_from_names, get_tag_i
                 id="Existing project"),
         ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 def test_get_project_ids_from_names(mock_requests_get, projects_names, api_response, expected):
     response = mock.Mock()
     response.status_code = 200
     response.json.side_effect = api_response
     mock_requests_get.return_value = response
 
-    res = get_project_ids_from_names("dummy", {}, projects_names)
+    res = get_project_ids_from_names(ApiClient({}), "dummy", projects_names)
     assert res == expected
 
 @pytest.mark.parametrize(
@@ -41,11 +42,6 @@ def test_get_project_ids_from_names(mock_requests_get, projects_names, api_respo
                 [{"next": None, "results":[]}],
                 [],
                 id="Empty"),
-            pytest.param(
-                ["mytag"],
-                [{"next": None, "results":[]}],
-                [],
-                id="Unexisting tag"),
             pytest.param(
                 ["mytag"],
                 [{"next": None, "results": [{"label": "mytag", "id": 4}]}],
@@ -63,12 +59,51 @@ def test_get_project_ids_from_names(mock_requests_get, projects_names, api_respo
                 id="Searched tags on different pages"),
         ]
 )
-@mock.patch('requests.get')
-def test_get_tag_ids_from_labels(mock_requests_get, tags_labels, api_response, expected):
+@mock.patch('requests.Session.request')
+def test_resolver_tag_ids(mock_requests_get, tags_labels, api_response, expected):
     response = mock.Mock()
     response.status_code = 200
     response.json.side_effect = api_response
     mock_requests_get.return_value = response
 
-    res = get_tag_ids_from_labels("dummy", {}, 0, tags_labels)
+    res = FlagsmithResolver.for_client(ApiClient({}), "dummy").tag_ids(0, tags_labels)
     assert res == expected
+
+
+def flagsmith_response(json):
+    response = mock.Mock()
+    response.status_code = 200
+    response.json.return_value = json
+    return response
+
+
+@mock.patch('requests.Session.request')
+def test_resolver_builds_indexes_once(mock_requests_get):
+    mock_requests_get.side_effect = [
+        flagsmith_response([{"name": "myproject", "id": 4}, {"name": "other", "id": 5}]),
+        flagsmith_response({"next": "page2", "results": [{"label": "tag1", "id": 1}]}),
+        flagsmith_response({"next": None, "results": [{"label": "tag2", "id": 2}]}),
+    ]
+    client = ApiClient({})
+    resolver = FlagsmithResolver.for_client(client, "dummy")
+
+    assert resolver.project_id("myproject") == 4
+    assert FlagsmithResolver.for_client(client, "dummy").project_id("other") == 5
+    assert resolver.tag_ids(4, ["tag2", "tag1"]) == [1, 2]
+    assert FlagsmithResolver.for_client(client, "dummy").tag_ids(4, ["tag2"]) == [2]
+    assert get_project_ids_from_names(client, "dummy", ["other"]) == [5]
+    assert mock_requests_get.call_count == 3
+
+
+@mock.patch('requests.Session.request')
+def test_resolver_reports_all_missing_tags(mock_requests_get):
+    mock_requests_get.side_effect = [flagsmith_response({"next": None, "results": [{"label": "tag1", "id": 1}]}), flagsmith_response([])]
+    resolver = FlagsmithResolver.for_client(ApiClient({}), "dummy")
+
+    with pytest.raises(FlagsmithLookupError) as e:
+        resolver.tag_ids(4, ["missing1", "tag1", "missing2"])
+
+    assert e.value.names == ["missing1", "missing2"]
+    assert str(e.value) == "Tags not found: missing1, missing2"
+    with pytest.raises(FlagsmithLookupError):
+        resolver.project_id("missing")
@@ -0,0 +1,53 @@
+import mock
+import pytest
+
+from plugins.module_utils.client import ApiClient
+from plugins.module_utils.pagination import betteruptime_items, flagsmith_items, find_first
+
+
+@pytest.mark.parametrize("api_response, searched_id, expected_nb_call_api, expected" , [
+        pytest.param(
+            [{"data": [{"id": "1"}], "pagination": {"next": "page2"}}, {"data": [{"id": "2"}], "pagination": {"next": None}}],
+            "1",
+            1, {"id": "1"},
+            id="Stop on first page"),
+        pytest.param(
+            [{"data": [{"id": "1"}], "pagination": {"next": "page2"}}, {"data": [{"id": "2"}], "pagination": {"next": None}}],
+            "2",
+            2, {"id": "2"},
+            id="Found on second page"),
+        pytest.param(
+            [{"data": [{"id": "1"}], "pagination": {"next": "page2"}}, {"data": [{"id": "2"}], "pagination": {"next": None}}],
+            "3",
+            2, None,
+            id="Not found"),
+        pytest.param(
+            [{"data": [{"id": "1"}]}],
+            "3",
+            1, None,
+            id="Listing without pagination"),
+    ]
+)
+@mock.patch('requests.Session.request')
+def test_betteruptime_items(mock_session_request, api_response, searched_id, expected_nb_call_api, expected):
+    response = mock.Mock()
+    response.json.side_effect = api_response
+    mock_session_request.return_value = response
+
+    res = find_first(betteruptime_items(ApiClient({}), "dummy"), lambda i: i["id"] == searched_id)
+
+    assert res == expected
+    assert mock_session_request.call_count == expected_nb_call_api
+
+
+@mock.patch('requests.Session.request')
+def test_flagsmith_items_page_size_only_on_first_page(mock_session_request):
+    response = mock.Mock()
+    response.json.side_effect = [{"next": "page2", "results": [{"id": 1}]}, {"next": None, "results": [{"id": 2}]}]
+    mock_session_request.return_value = response
+
+    res = list(flagsmith_items(ApiClient({}), "dummy", {"search": "toto"}))
+
+    assert res == [{"id": 1}, {"id": 2}]
+    assert mock_session_request.call_args_list[0].kwargs["params"] == {"page_size": 999, "search": "toto"}
+    assert mock_session_request.call_args_list[1].kwargs["params"] is None
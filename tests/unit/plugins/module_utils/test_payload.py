@@ -1,6 +1,7 @@
+import mock
 import pytest
 
-from plugins.module_utils.payload import diff_attributes
+from plugins.module_utils.payload import diff_attributes, diff_payload, diff_result, fingerprint
 
 @pytest.mark.parametrize("payload, compare, expected" , [
         pytest.param(
@@ -18,8 +19,57 @@ from plugins.module_utils.payload import diff_attributes
             {"subdomain": "tesst", "company_name": "ToucanToco"},
             {"company_name": "NewCompany"},
             id="One attribute to update"),
+        pytest.param(
+            {"subdomain": "tesst", "design": {"theme": "dark", "colors": ["red", "blue"]}},
+            {"subdomain": "tesst", "design": {"colors": ["red", "blue"], "theme": "dark"}},
+            {},
+            id="Nested keys order ignored"),
+        pytest.param(
+            {"subdomain": "tesst", "design": {"colors": ["red", "blue"]}},
+            {"subdomain": "tesst", "design": {"colors": ["blue", "red"]}},
+            {"design": {"colors": ["red", "blue"]}},
+            id="Lists order kept by default"),
     ]
 )
 def test_diff_attributes(payload, compare, expected):
     res = diff_attributes(payload, compare)
     assert res == expected
+
+@pytest.mark.parametrize("payload, compare, expected" , [
+        pytest.param({"tags": [1, 2, 3]}, {"tags": [3, 1, 2]}, {}, id="Reordered set"),
+        pytest.param({"tags": [1, 1, 2]}, {"tags": [1, 2, 2]}, {"tags": [1, 1, 2]}, id="Duplicates counted"),
+        pytest.param(
+            {"tags": [{"name": "a", "ids": [1, 2]}, {"name": "b", "ids": []}]},
+            {"tags": [{"ids": [], "name": "b"}, {"ids": [2, 1], "name": "a"}]},
+            {},
+            id="Nested sets"),
+        pytest.param({"tags": [1], "regions": ["eu", "us"]}, {"tags": [1], "regions": ["us", "eu"]}, {"regions": ["eu", "us"]}, id="Only configured fields unordered"),
+    ]
+)
+def test_diff_attributes_unordered(payload, compare, expected):
+    assert diff_attributes(payload, compare, unordered=("tags",)) == expected
+
+def test_diff_payload_changes():
+    patch, changes = diff_payload({"name": "a", "color": "#FFF", "tags": [2, 1]}, {"name": "a", "tags": [1]}, unordered=("tags",))
+
+    assert patch == {"color": "#FFF", "tags": [2, 1]}
+    assert changes == ['color: <unset> -> "#FFF"', "tags: [1] -> [2, 1]"]
+
+@pytest.mark.parametrize("diff_mode, changes, expected" , [
+        pytest.param(True, ["a: 1 -> 2", "b: <unset> -> 3"], {"diff": {"prepared": "a: 1 -> 2\nb: <unset> -> 3"}}, id="Diff mode"),
+        pytest.param(True, [], {}, id="Nothing changed"),
+        pytest.param(False, ["a: 1 -> 2"], {}, id="Diff mode disabled"),
+    ]
+)
+def test_diff_result(diff_mode, changes, expected):
+    module = mock.Mock(_diff=diff_mode)
+    assert diff_result(module, changes) == expected
+
+@pytest.mark.parametrize("a, b, expected" , [
+        pytest.param({"a": 1, "b": [1, {"c": 2, "d": 3}]}, {"b": [1, {"d": 3, "c": 2}], "a": 1}, True, id="Keys order ignored"),
+        pytest.param({"a": [1, 2]}, {"a": [2, 1]}, False, id="Lists order kept"),
+        pytest.param({"a": 1}, {"a": "1"}, False, id="Types kept"),
+    ]
+)
+def test_fingerprint(a, b, expected):
+    assert (fingerprint(a) == fingerprint(b)) == expected
@@ -0,0 +1,53 @@
+import mock
+
+from plugins.module_utils.ratelimit import FileTokenBucket
+
+
+@mock.patch('time.time')
+def test_take_burst_then_wait(mock_time, tmp_path):
+    mock_time.return_value = 1000.0
+    bucket = FileTokenBucket(str(tmp_path / "bucket.json"), rate=2, burst=2)
+
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == 0.5
+
+
+@mock.patch('time.time')
+def test_take_refills_over_time(mock_time, tmp_path):
+    mock_time.return_value = 1000.0
+    bucket = FileTokenBucket(str(tmp_path / "bucket.json"), rate=1, burst=1)
+    assert bucket.take() == 0
+    assert bucket.take() == 1
+
+    mock_time.return_value = 1001.0
+    assert bucket.take() == 0
+
+
+@mock.patch('time.time')
+def test_bucket_shared_through_the_file(mock_time, tmp_path):
+    mock_time.return_value = 1000.0
+    path = str(tmp_path / "bucket.json")
+
+    assert FileTokenBucket(path, rate=1, burst=1).take() == 0
+    assert FileTokenBucket(path, rate=1, burst=1).take() == 1
+
+
+def test_for_key_does_not_leak_the_key(tmp_path):
+    bucket = FileTokenBucket.for_key("Bearer secret", 5, str(tmp_path))
+
+    assert "secret" not in bucket.path
+    assert bucket.path == FileTokenBucket.for_key("Bearer secret", 5, str(tmp_path)).path
+    assert bucket.path != FileTokenBucket.for_key("Bearer other", 5, str(tmp_path)).path
+
+
+@mock.patch('time.sleep')
+@mock.patch('time.time')
+def test_acquire_waits_for_a_token(mock_time, mock_sleep, tmp_path):
+    mock_time.side_effect = [1000.0, 1000.0, 1001.0]
+    bucket = FileTokenBucket(str(tmp_path / "bucket.json"), rate=1, burst=1)
+    bucket.take()
+
+    bucket.acquire()
+
+    mock_sleep.assert_called_once_with(1)
@@ -0,0 +1,101 @@
+import mock
+import pytest
+
+from plugins.module_utils.client import ApiClient
+from plugins.module_utils.pagination import betteruptime_items
+from plugins.module_utils.stats import endpoint, latency_bucket, percentile, report_stats, response_size
+
+
+@pytest.mark.parametrize("method, url, expected" , [
+        pytest.param("GET", "https://betteruptime.com/api/v2/monitors?url=toto", "GET /api/v2/monitors", id="Query dropped"),
+        pytest.param("PATCH", "https://betteruptime.com/api/v2/status-pages/12/resources/345", "PATCH /api/v2/status-pages/{id}/resources/{id}", id="Ids replaced"),
+        pytest.param("DELETE", "https://flagsmith.com/api/v1/projects/1/tags/2/", "DELETE /api/v1/projects/{id}/tags/{id}/", id="Trailing slash"),
+        pytest.param("GET", "https://flagsmith.com/api/v1/projects/1a/", "GET /api/v1/projects/1a/", id="Non numeric segment kept"),
+    ]
+)
+def test_endpoint(method, url, expected):
+    assert endpoint(method, url) == expected
+
+
+@pytest.mark.parametrize("values, p, expected" , [
+        pytest.param([], 0.5, None, id="No value"),
+        pytest.param([1], 0.95, 1, id="Single value"),
+        pytest.param([1, 2, 3, 4], 0.5, 2, id="Median"),
+        pytest.param(list(range(1, 101)), 0.95, 95, id="95th percentile"),
+    ]
+)
+def test_percentile(values, p, expected):
+    assert percentile(values, p) == expected
+
+
+@pytest.mark.parametrize("elapsed_ms, expected" , [
+        pytest.param(3, "<=10", id="Fastest bucket"),
+        pytest.param(10, "<=10", id="Upper bound included"),
+        pytest.param(120, "<=250", id="Middle bucket"),
+        pytest.param(9000, ">5000", id="Slowest bucket"),
+    ]
+)
+def test_latency_bucket(elapsed_ms, expected):
+    assert latency_bucket(elapsed_ms) == expected
+
+
+def api_response(status_code, json=None, content=b"1234", headers=None):
+    response = mock.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.content = content
+    response.json.return_value = json
+    return response
+
+
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_stats_collected(mock_session_request, _):
+    mock_session_request.side_effect = [
+        api_response(429),
+        api_response(200, {"data": [{"id": "1"}], "pagination": {"next": "https://betteruptime.com/api/v2/monitors?page=2"}}),
+        api_response(200, {"data": [{"id": "2"}], "pagination": {"next": None}}, content=b"decompressed body", headers={"Content-Length": "4"}),
+        api_response(204, content=b""),
+    ]
+    client = ApiClient({}, collect_stats=True)
+
+    list(betteruptime_items(client, "https://betteruptime.com/api/v2/monitors"))
+    client.delete("https://betteruptime.com/api/v2/monitors/2")
+    stats = client.stats.summary()
+
+    assert stats["requests"] == 4
+    assert stats["endpoints"] == {"GET /api/v2/monitors": 3, "DELETE /api/v2/monitors/{id}": 1}
+    assert stats["bytes_received"] == 12
+    assert stats["retries"] == 1
+    assert stats["pages"] == 2
+    assert set(stats["latency_ms"]) == {"p50", "p95", "max"}
+    assert set(stats["endpoints_ms"]) == set(stats["endpoints"])
+    assert sum(stats["histogram_ms"].values()) == 4
+
+
+@pytest.mark.parametrize("headers, content, expected" , [
+        pytest.param({"Content-Length": "12"}, b"a much longer decompressed body", 12, id="Compressed length"),
+        pytest.param({}, b"chunked body", 12, id="No Content-Length"),
+        pytest.param({"Content-Length": "invalid"}, b"", 0, id="Invalid Content-Length"),
+    ]
+)
+def test_response_size(headers, content, expected):
+    assert response_size(api_response(200, content=content, headers=headers)) == expected
+
+
+def test_stats_disabled_by_default():
+    assert ApiClient({}).stats is None
+    assert ApiClient.from_params({"collect_stats": True}, {}).stats is not None
+
+
+def test_report_stats():
+    module = mock.Mock()
+    exit_json = module.exit_json
+    client = ApiClient({}, collect_stats=True)
+
+    report_stats(module, client)
+    module.exit_json(changed=True)
+    module.fail_json("positional", msg="failed")
+
+    exit_json.assert_called_once_with(changed=True, api_stats=client.stats.summary())
+    module.fail_json.__wrapped__.assert_called_once_with("positional", msg="failed", api_stats=client.stats.summary())
@@ -1,5 +1,6 @@
 import mock
 import pytest
+import requests
 from ansible.module_utils.common.validation import check_required_if
 from plugins.modules import betteruptime_monitor
 
@@ -79,7 +80,7 @@ def test_validate_require_if(module_args):
             id="Monitor not found among one with port"),
     ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_monitor.AnsibleModule')
 def test_retrieve_id(mock_module, mock_requests_get, params, api_response, expected_nb_call_api, expected_monitor_id):
     response = mock.Mock()
@@ -123,8 +124,21 @@ def test_retrieve_id(mock_module, mock_requests_get, params, api_response, expec
         pytest.param(
             {"url": "www.myinstance.toucantoco.guru", "request_headers": [{"id":5,"name":"User-Agent", "value":"FFEEDDCCBBAA"}]},
             {"url": "www.myinstance.toucantoco.guru", "request_headers": [{"name": "User-Agent", "value": "AABBCCDDEEFF"}]},
-            {"request_headers": [{"name": "User-Agent", "value": "AABBCCDDEEFF"}, {"id":5, "_destroy": True}]},
+            {"request_headers": [{"id":5, "name": "User-Agent", "value": "AABBCCDDEEFF"}]},
             id="Changed request_headers"),
+        pytest.param(
+            {"url": "www.myinstance.toucantoco.guru", "request_headers": [
+                {"id": 7, "name": "User-Agent", "value": "AABBCCDDEEFF"},
+                {"id": 8, "name": "X-Old", "value": "old"},
+                {"id": 9, "name": "X-Changed", "value": "before"},
+            ]},
+            {"url": "www.myinstance.toucantoco.guru", "request_headers": [
+                {"name": "X-Changed", "value": "after"},
+                {"name": "User-Agent", "value": "AABBCCDDEEFF"},
+                {"name": "X-New", "value": "new"},
+            ]},
+            {"request_headers": [{"id": 9, "name": "X-Changed", "value": "after"}, {"name": "X-New", "value": "new"}, {"id": 8, "_destroy": True}]},
+            id="Unchanged request_headers left alone"),
         pytest.param(
             {"url": "www.myinstance.toucantoco.guru", "request_headers": [{"id": 6, "name": "User-Agent", "value": "AABBCCDDEEFF"}]},
             {"url": "www.myinstance.toucantoco.guru", "request_headers": []},
@@ -135,6 +149,16 @@ def test_retrieve_id(mock_module, mock_requests_get, params, api_response, expec
             {"url": "www.myinstance.toucantoco.guru", "auth_password": "myPass", "confirmation_period": 120},
             {"confirmation_period": 120, "auth_password": "myPass"},
             id="Attribute not returned by the API"),
+        pytest.param(
+            {"url": "www.myinstance.toucantoco.guru", "regions": ["us", "eu", "as"], "expected_status_codes": [200, 301]},
+            {"url": "www.myinstance.toucantoco.guru", "regions": ["eu", "as", "us"], "expected_status_codes": [301, 200]},
+            {},
+            id="Reordered regions and status codes"),
+        pytest.param(
+            {"url": "www.myinstance.toucantoco.guru", "regions": ["us", "eu"]},
+            {"url": "www.myinstance.toucantoco.guru", "regions": ["eu", "as"]},
+            {"regions": ["eu", "as"]},
+            id="Changed regions"),
     ]
 )
 @mock.patch('plugins.modules.betteruptime_monitor.AnsibleModule')
@@ -188,3 +212,89 @@ def test_manage_monitor_delete(mock_module, mock_delete, mock_retrieve_id):
     monitor_object.manage_monitor()
 
     assert mock_delete.call_count == 1
+
+
+@pytest.mark.parametrize("monitors, api_response, expected_results" , [
+        pytest.param(
+            [{"url": "a.com", "state": "present"}],
+            [{"data": [], "pagination": {"next": None}}],
+            [{"url": "a.com", "port": None, "state": "present", "id": None, "changed": True, "failed": False}],
+            id="Create missing monitor"),
+        pytest.param(
+            [{"url": "a.com", "state": "present", "paused": False}],
+            [{"data": [{"id": "1", "attributes": {"url": "a.com", "paused": False}}], "pagination": {"next": None}}],
+            [{"url": "a.com", "port": None, "state": "present", "id": "1", "changed": False, "failed": False}],
+            id="Unchanged monitor"),
+        pytest.param(
+            [{"url": "a.com", "state": "present", "port": "22"}, {"url": "a.com", "state": "absent"}],
+            [{"data": [{"id": "1", "attributes": {"url": "a.com", "port": None}}], "pagination": {"next": "page2"}},
+             {"data": [{"id": "2", "attributes": {"url": "a.com", "port": "22"}}], "pagination": {"next": None}}],
+            [{"url": "a.com", "port": "22", "state": "present", "id": "2", "changed": False, "failed": False},
+             {"url": "a.com", "port": None, "state": "absent", "id": "1", "changed": True, "failed": False}],
+            id="Monitors indexed by url and port across pages"),
+        pytest.param(
+            [{"url": "a.com", "state": "absent"}],
+            [{"data": [], "pagination": {"next": None}}],
+            [{"url": "a.com", "port": None, "state": "absent", "id": None, "changed": False, "failed": False}],
+            id="Nothing to delete"),
+    ]
+)
+@mock.patch('plugins.modules.betteruptime_monitor.BetterUptimeMonitor.delete')
+@mock.patch('plugins.modules.betteruptime_monitor.BetterUptimeMonitor.create')
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor.AnsibleModule')
+def test_manage_monitors(mock_module, mock_session_request, mock_create, mock_delete, monitors, api_response, expected_results):
+    response = mock.Mock()
+    response.json.side_effect = api_response
+    mock_session_request.return_value = response
+
+    mock_module.params = {"api_key": "key", "monitors": [{"metadata": None, "policy_name": None, **m} for m in monitors]}
+    monitors_object = betteruptime_monitor.BetterUptimeMonitors(mock_module)
+
+    monitors_object.manage_monitors()
+
+    assert mock_session_request.call_count == len(api_response)
+    mock_module.exit_json.assert_called_once_with(changed=any(r["changed"] for r in expected_results), monitors=expected_results)
+
+
+@mock.patch('plugins.modules.betteruptime_monitor.AnsibleModule')
+def test_manage_monitors_duplicates(mock_module):
+    mock_module.params = {"api_key": "key", "monitors": [
+        {"url": "a.com", "state": "present", "metadata": None, "policy_name": None},
+        {"url": "a.com", "state": "absent", "metadata": None, "policy_name": None},
+    ]}
+    mock_module.fail_json.side_effect = SystemExit
+    monitors_object = betteruptime_monitor.BetterUptimeMonitors(mock_module)
+
+    with pytest.raises(SystemExit):
+        monitors_object.manage_monitors()
+
+
+def throttled_response(method, url, **kwargs):
+    response             = requests.Response()
+    response.status_code = 429
+    response.url         = url
+    response._content    = b""
+    return response
+
+
+@pytest.mark.parametrize("params, manage" , [
+        pytest.param({"url": "https://a.com", "state": "present", "metadata": None, "policy_name": "Default"}, "manage_monitor", id="Single monitor"),
+        pytest.param({"monitors": [{"url": "https://a.com", "state": "present", "metadata": None, "policy_name": None}]}, "manage_monitors", id="Many monitors"),
+    ]
+)
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor.AnsibleModule')
+def test_manage_listing_throttled(mock_module, mock_session_request, _, params, manage):
+    mock_session_request.side_effect = throttled_response
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "api_retries": 1, **params}
+    monitor_object = (betteruptime_monitor.BetterUptimeMonitor if manage == "manage_monitor" else betteruptime_monitor.BetterUptimeMonitors)(mock_module)
+
+    with pytest.raises(SystemExit):
+        getattr(monitor_object, manage)()
+
+    mock_module.fail_json.assert_called_once()
+    assert mock_module.fail_json.call_args.kwargs["msg"].startswith("429 Client Error")
+    assert mock_session_request.call_count == 2
@@ -0,0 +1,94 @@
+import mock
+import pytest
+
+pytest.importorskip("numpy")
+
+from plugins.modules import betteruptime_monitor_availability  # noqa: E402
+
+MONITORS = [
+    {"id": "1", "attributes": {"url": "https://a.example.com", "created_at": "2023-01-01T00:00:00.000Z"}},
+    {"id": "2", "attributes": {"url": "https://b.example.com", "created_at": "2023-01-02T00:00:00.000Z"}},
+]
+
+INCIDENTS = [
+    {"id": "10", "attributes": {"started_at": "2023-01-10T00:00:00.000Z", "resolved_at": "2023-01-10T12:00:00.000Z"}},
+    {"id": "11", "attributes": {"started_at": "2023-02-01T00:00:00.000Z", "resolved_at": None}},
+]
+
+
+def api_response(status_code, json):
+    response = mock.Mock(status_code=status_code, headers={})
+    response.json.return_value = json
+    return response
+
+
+def request(method, url, **kwargs):
+    if url.endswith("/monitors"):
+        return api_response(200, {"data": MONITORS, "pagination": {"next": None}})
+    incidents = INCIDENTS if kwargs["params"]["monitor_id"] == "1" else []
+    if "from" in kwargs["params"]:
+        incidents = [i for i in incidents if i["attributes"]["started_at"][:10] >= kwargs["params"]["from"]]
+    return api_response(200, {"data": incidents, "pagination": {"next": None}})
+
+
+@mock.patch('time.time', return_value=1675382400.0)  # 2023-02-03T00:00:00Z
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_availability.AnsibleModule')
+def test_manage_series_synced_incrementally(mock_module, mock_session_request, _, tmp_path):
+    mock_session_request.side_effect = request
+    params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example", "from": "2023-01-01", "to": "2023-02-28",
+              "granularity": "month", "api_cache_dir": str(tmp_path)}
+    expected_series = [
+        {"from": "2023-01-01", "to": "2023-01-31", "availability": 98.3871, "total_downtime": 43200, "number_of_incidents": 1},
+        {"from": "2023-02-01", "to": "2023-02-28", "availability": 0.0, "total_downtime": 172800, "number_of_incidents": 1},
+    ]
+
+    for expected_from in ({"1": None, "2": None}, {"1": "2023-02-01", "2": "2023-02-03"}):
+        mock_session_request.reset_mock()
+        mock_module.params = dict(params)
+        betteruptime_monitor_availability.BetterUptimeMonitorAvailability(mock_module).manage()
+
+        # Once cached, the incidents are only listed again since the last sync or the oldest unresolved one
+        incident_calls = [c.kwargs["params"] for c in mock_session_request.call_args_list if c.args[1].endswith("/incidents")]
+        assert {p["monitor_id"]: p.get("from") for p in incident_calls} == expected_from
+        mock_module.exit_json.assert_called_with(changed=False, slas={
+            "https://a.example.com": {"series": expected_series, "monitor_creation_date": "2023-01-01T00:00:00.000Z"},
+            "https://b.example.com": {"series": [{**s, "availability": 100.0, "total_downtime": 0, "number_of_incidents": 0} for s in expected_series],
+                                      "monitor_creation_date": "2023-01-02T00:00:00.000Z"},
+        })
+
+
+@mock.patch('plugins.module_utils.cache.ListingCache.set_record', side_effect=OSError(28, "No space left on device"))
+@mock.patch('plugins.module_utils.cache.ListingCache.get_record', side_effect=PermissionError(13, "Permission denied"))
+@mock.patch('time.time', return_value=1675382400.0)  # 2023-02-03T00:00:00Z
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_availability.AnsibleModule')
+def test_manage_unusable_cache(mock_module, mock_session_request, _, mock_cache_get, mock_cache_set, tmp_path):
+    mock_session_request.side_effect = request
+    mock_module.params = {"api_key": "key", "url": "https://a.example.com", "urls": None, "url_pattern": None, "from": "2023-01-01", "to": "2023-01-31",
+                          "granularity": None, "api_cache_dir": str(tmp_path)}
+    mock_module.exit_json.side_effect = SystemExit
+
+    with pytest.raises(SystemExit):
+        betteruptime_monitor_availability.BetterUptimeMonitorAvailability(mock_module).manage()
+
+    # Without the cache, all the incidents are listed
+    incident_calls = [c.kwargs["params"] for c in mock_session_request.call_args_list if c.args[1].endswith("/incidents")]
+    assert incident_calls == [{"per_page": 250, "monitor_id": "1"}]
+    assert mock_cache_set.call_count == 1
+    mock_module.fail_json.assert_not_called()
+    mock_module.exit_json.assert_called_once_with(changed=False, **{"from": "2023-01-01", "to": "2023-01-31", "availability": 98.3871, "total_downtime": 43200,
+                                                                     "number_of_incidents": 1, "monitor_creation_date": "2023-01-01T00:00:00.000Z"})
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_availability.AnsibleModule')
+def test_manage_invalid_pattern(mock_module, mock_session_request):
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "[a-", "from": "2023-01-01", "to": "2023-01-31", "granularity": None}
+
+    with pytest.raises(SystemExit):
+        betteruptime_monitor_availability.BetterUptimeMonitorAvailability(mock_module).manage()
+
+    mock_module.fail_json.assert_called_once_with(msg="Invalid url_pattern [a-: unterminated character set at position 0")
+    mock_session_request.assert_not_called()
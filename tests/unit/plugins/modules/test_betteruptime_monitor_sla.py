@@ -0,0 +1,213 @@
+from datetime import date
+
+import mock
+import pytest
+import requests
+
+from plugins.modules import betteruptime_monitor_sla
+
+MONITORS = [
+    {"id": "1", "attributes": {"url": "https://a.example.com", "created_at": "2023-01-01T00:00:00.000Z"}},
+    {"id": "2", "attributes": {"url": "https://b.example.com", "created_at": "2023-01-02T00:00:00.000Z"}},
+    {"id": "3", "attributes": {"url": "https://c.other.com", "created_at": "2023-01-03T00:00:00.000Z"}},
+]
+
+
+def api_response(status_code, json):
+    response = mock.Mock(status_code=status_code, headers={})
+    response.json.return_value = json
+    return response
+
+
+def request(method, url, **kwargs):
+    if url.endswith("/monitors"):
+        return api_response(200, {"data": MONITORS, "pagination": {"next": None}})
+    monitor_id = url.split("/")[-2]
+    if monitor_id == "2" and kwargs["params"].get("from") == "2000-01-01":
+        return api_response(400, {"errors": "Invalid range"})
+    return api_response(200, {"data": {"attributes": {"availability": 99.0 + int(monitor_id) / 10}}})
+
+
+@pytest.mark.parametrize("options, expected_slas" , [
+        pytest.param(
+            {"urls": ["https://a.example.com", "https://b.example.com"], "url_pattern": None},
+            {
+                "https://a.example.com": {"availability": 99.1, "monitor_creation_date": "2023-01-01T00:00:00.000Z"},
+                "https://b.example.com": {"availability": 99.2, "monitor_creation_date": "2023-01-02T00:00:00.000Z"},
+            },
+            id="List of urls"),
+        pytest.param(
+            {"urls": None, "url_pattern": r"\.other\.com$"},
+            {"https://c.other.com": {"availability": 99.3, "monitor_creation_date": "2023-01-03T00:00:00.000Z"}},
+            id="Url pattern"),
+    ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_manage_monitors_sla(mock_module, mock_session_request, options, expected_slas):
+    mock_session_request.side_effect = request
+    mock_module.params = {"api_key": "key", "url": None, "from": "2023-01-01", "to": None, **options}
+    monitors_sla_object = betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module)
+
+    monitors_sla_object.manage()
+
+    assert mock_session_request.call_count == 1 + len(expected_slas)
+    assert all(c.kwargs["params"] == {"from": "2023-01-01"} for c in mock_session_request.call_args_list[1:])
+    mock_module.exit_json.assert_called_once_with(changed=False, slas=expected_slas)
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_manage_monitors_sla_missing(mock_module, mock_session_request):
+    mock_session_request.side_effect = request
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "url": None, "urls": ["https://a.example.com", "https://x.example.com"], "url_pattern": None, "from": None, "to": None}
+    monitors_sla_object = betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module)
+
+    with pytest.raises(SystemExit):
+        monitors_sla_object.manage()
+
+    assert mock_session_request.call_count == 1
+    mock_module.fail_json.assert_called_once_with(msg="Monitors not found: https://x.example.com")
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_manage_monitors_sla_failed(mock_module, mock_session_request):
+    mock_session_request.side_effect = request
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example", "from": "2000-01-01", "to": None}
+    monitors_sla_object = betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module)
+
+    monitors_sla_object.manage()
+
+    mock_module.fail_json.assert_called_once()
+    assert list(mock_module.fail_json.call_args.kwargs["slas"]) == ["https://a.example.com"]
+
+
+@mock.patch('plugins.modules.betteruptime_monitor_sla.today', return_value=date(2024, 3, 10))
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_manage_monitors_sla_series_cached(mock_module, mock_session_request, _, tmp_path):
+    mock_session_request.side_effect = request
+    params = {"api_key": "key", "url": None, "urls": ["https://a.example.com"], "url_pattern": None, "from": "2024-01-15", "to": None,
+              "granularity": "month", "api_cache_dir": str(tmp_path)}
+    expected_series = [
+        {"from": "2024-01-15", "to": "2024-01-31", "availability": 99.1},
+        {"from": "2024-02-01", "to": "2024-02-29", "availability": 99.1},
+        {"from": "2024-03-01", "to": "2024-03-10", "availability": 99.1},
+    ]
+
+    for expected_calls in (1 + 3, 1 + 1):
+        mock_session_request.reset_mock()
+        mock_module.params = dict(params)
+        betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).manage()
+
+        # Closed months come from the cache on the second run, only the current one is fetched again
+        assert mock_session_request.call_count == expected_calls
+        mock_module.exit_json.assert_called_with(changed=False, slas={
+            "https://a.example.com": {"series": expected_series, "monitor_creation_date": "2023-01-01T00:00:00.000Z"},
+        })
+
+
+@pytest.mark.parametrize("export_format, expected_content" , [
+        pytest.param("csv", (
+            "url,monitor_id,from,to,availability,total_downtime,number_of_incidents,longest_incident,average_incident\r\n"
+            "https://a.example.com,1,2024-01-01,2024-01-31,99.1,,,,\r\n"
+            "https://a.example.com,1,2024-02-01,2024-02-15,99.1,,,,\r\n"
+            "https://b.example.com,2,2024-01-01,2024-01-31,99.2,,,,\r\n"
+            "https://b.example.com,2,2024-02-01,2024-02-15,99.2,,,,\r\n"
+        ), id="Csv"),
+        pytest.param("jsonl", "".join(
+            f'{{"url": "https://{u}.example.com", "monitor_id": "{i}", "from": "{f}", "to": "{t}", "availability": 99.{i}, "total_downtime": null, '
+            f'"number_of_incidents": null, "longest_incident": null, "average_incident": null}}\n'
+            for u, i in (("a", 1), ("b", 2)) for f, t in (("2024-01-01", "2024-01-31"), ("2024-02-01", "2024-02-15"))
+        ), id="Json lines"),
+    ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_export(mock_module, mock_session_request, export_format, expected_content, tmp_path):
+    mock_session_request.side_effect = request
+    export_path = tmp_path / f"sla.{export_format}"
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example", "from": "2024-01-01", "to": "2024-02-15",
+                          "granularity": "month", "export_path": str(export_path), "export_format": export_format}
+
+    betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).export()
+
+    assert export_path.read_bytes().decode() == expected_content
+    mock_module.exit_json.assert_called_once_with(changed=True, path=str(export_path), rows=4, elapsed_s=mock.ANY)
+
+
+@pytest.mark.parametrize("options, expected_found" , [
+        pytest.param({"urls": ["https://a.example.com", "https://missing.com"], "url_pattern": None}, {"https://a.example.com"}, id="List of urls"),
+        pytest.param({"urls": None, "url_pattern": "example"}, set(), id="Url pattern keeps nothing per monitor"),
+    ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_export_rows_found(mock_module, mock_session_request, options, expected_found):
+    mock_session_request.side_effect = request
+    mock_module.params = {"api_key": "key", "url": None, "from": None, "to": None, "granularity": None, "export_path": "sla.csv", "export_format": "csv", **options}
+    found = set()
+
+    rows = list(betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).export_rows(found))
+
+    assert len(rows) == (1 if options["urls"] else 2)
+    assert found == expected_found
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_export_failed_keeps_previous(mock_module, mock_session_request, tmp_path):
+    mock_session_request.side_effect = request
+    export_path = tmp_path / "sla.csv"
+    export_path.write_text("previous")
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example", "from": "2000-01-01", "to": None,
+                          "granularity": None, "export_path": str(export_path), "export_format": "csv"}
+    mock_module.fail_json.side_effect = SystemExit
+
+    with pytest.raises(SystemExit):
+        betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).export()
+
+    mock_module.fail_json.assert_called_once()
+    assert export_path.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["sla.csv"]
+
+
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_export_listing_throttled(mock_module, mock_session_request, _, tmp_path):
+    def throttled(method, url, **kwargs):
+        response             = requests.Response()
+        response.status_code = 429
+        response.url         = url
+        response._content    = b""
+        return response
+    mock_session_request.side_effect = throttled
+    export_path = tmp_path / "sla.csv"
+    export_path.write_text("previous")
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example", "from": None, "to": None,
+                          "granularity": None, "export_path": str(export_path), "export_format": "csv", "api_retries": 0}
+    mock_module.fail_json.side_effect = SystemExit
+
+    with pytest.raises(SystemExit):
+        betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).export()
+
+    mock_module.fail_json.assert_called_once_with(msg=mock.ANY, rows=0)
+    assert mock_module.fail_json.call_args.kwargs["msg"].startswith("429 Client Error")
+    assert [p.name for p in tmp_path.iterdir()] == ["sla.csv"]
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_monitor_sla.AnsibleModule')
+def test_manage_monitors_sla_invalid_pattern(mock_module, mock_session_request):
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "url": None, "urls": None, "url_pattern": "example.(com", "from": None, "to": None,
+                          "granularity": None, "export_path": None, "export_format": "csv"}
+
+    with pytest.raises(SystemExit):
+        betteruptime_monitor_sla.BetterUptimeMonitorsSLA(mock_module).manage()
+
+    mock_module.fail_json.assert_called_once_with(msg="Invalid url_pattern example.(com: missing ), unterminated subpattern at position 8")
+    mock_session_request.assert_not_called()
@@ -38,7 +38,7 @@ COMMON_ARGS = {
             id="Status Page not found - 2 pages"),
     ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
 def test_retrieve_id(mock_module, mock_requests_get, searched_subdomain, api_response, expected_nb_call_api, expected_status_page_id):
     response = mock.Mock()
@@ -79,9 +79,15 @@ def test_retrieve_id(mock_module, mock_requests_get, searched_subdomain, api_res
             [{"data": [{"id":1, "attributes":{"name":"Frontend", "position":1}}]}],
             0, 0,
             id="Do not delete sections not related to the scope"),
+        pytest.param(
+            [{"name":"Api", "resources":None}],
+            [{"data": [{"id":1, "attributes":{"name":"Backend - Other", "position":1}}], "pagination": {"next": "https://betteruptime.com/api/v2/status-pages/1/sections?page=2"}},
+             {"data": [{"id":2, "attributes":{"name":"Backend - Api", "position":2}}], "pagination": {"next": None}}],
+            0, 1,
+            id="Sections spread over several pages"),
     ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPageSection.delete')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPageSection.create')
 @mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
@@ -113,10 +119,11 @@ def test_manage_status_page_create(mock_module, mock_create, _):
     assert mock_create.call_count == 1
 
 
+@mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.get')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.retrieve_id')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.update')
 @mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
-def test_manage_status_page_update(mock_module, mock_update, _):
+def test_manage_status_page_update(mock_module, mock_update, _, __):
     status_page_object = betteruptime_status_page.BetterUptimeStatusPage(mock_module)
     status_page_object.state = "present"
     status_page_object.id = "1234"
@@ -127,10 +134,11 @@ def test_manage_status_page_update(mock_module, mock_update, _):
     assert mock_update.call_count == 1
 
 
+@mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.get')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.retrieve_id')
 @mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPage.delete')
 @mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
-def test_manage_status_page_delete(mock_module, mock_delete, _):
+def test_manage_status_page_delete(mock_module, mock_delete, _, __):
     status_page_object = betteruptime_status_page.BetterUptimeStatusPage(mock_module)
     status_page_object.state = "absent"
     status_page_object.id = "1234"
@@ -138,3 +146,76 @@ def test_manage_status_page_delete(mock_module, mock_delete, _):
     status_page_object.manage_status_page()
 
     assert mock_delete.call_count == 1
+
+
+@pytest.mark.parametrize("resources, expected_urls, expected_resource_ids" , [
+        pytest.param(
+            [{"resource_name": "https://a.com", "public_name": "A", "resource_type": "Monitor"},
+             {"resource_name": "https://b.com", "public_name": "B", "resource_type": "Monitor"}],
+            ["status-pages/1/resources", "monitors"],
+            [11, 12],
+            id="Monitors resolved from a single listing"),
+        pytest.param(
+            [{"resource_name": "https://c.com", "public_name": "C", "resource_type": "Monitor"}],
+            ["status-pages/1/resources", "monitors", "monitors?url=https%3A//c.com"],
+            [13],
+            id="Targeted search on a miss"),
+        pytest.param(
+            [{"resource_name": "heartbeat", "public_name": "H", "resource_type": "Heartbeat", "resource_id": 42}],
+            ["status-pages/1/resources"],
+            [42],
+            id="No lookup for other resource types"),
+    ]
+)
+@mock.patch('plugins.modules.betteruptime_status_page.BetterUptimeStatusPageResource.create')
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
+def test_manage_resources_monitor_lookup(mock_module, mock_session_request, mock_create, resources, expected_urls, expected_resource_ids):
+    responses = {
+        "status-pages/1/resources": {"data": []},
+        "monitors": {"data": [{"id": "11", "attributes": {"url": "https://a.com"}}, {"id": "12", "attributes": {"url": "https://b.com"}}]},
+        "monitors?url=https%3A//c.com": {"data": [{"id": "13", "attributes": {"url": "https://c.com"}}]},
+    }
+
+    def request(method, url, **kwargs):
+        response = mock.Mock()
+        response.json.return_value = responses[url.replace("https://betteruptime.com/api/v2/", "")]
+        return response
+    mock_session_request.side_effect = request
+
+    status_page_object = betteruptime_status_page.BetterUptimeStatusPage(mock_module)
+    status_page_object.id = 1
+    section = betteruptime_status_page.BetterUptimeStatusPageSection(mock_module, 1, status_page_object.client, {"name": "Backend", "resources": resources})
+    section.id = 5
+    status_page_object.sectionList = [section]
+
+    status_page_object.manage_resources()
+
+    assert [c.args[1].replace("https://betteruptime.com/api/v2/", "") for c in mock_session_request.call_args_list] == expected_urls
+    assert [r.payload["resource_id"] for r in status_page_object.resourceList] == expected_resource_ids
+    assert mock_create.call_count == len(resources)
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page.AnsibleModule')
+def test_manage_status_page_update_compares_live_attributes(mock_module, mock_session_request):
+    # The page was renamed outside of the module, after its listing was cached
+    listed  = {"data": [{"id": "1", "attributes": {"subdomain": "mypage", "company_name": "Toucan"}}], "pagination": {"next": None}}
+    current = {"data": {"id": "1", "attributes": {"subdomain": "mypage", "company_name": "Renamed"}}}
+
+    def request(method, url, **kwargs):
+        response = mock.Mock(status_code=200, headers={})
+        response.json.return_value = listed if url.endswith("/status-pages") else current
+        return response
+    mock_session_request.side_effect = request
+    mock_module.params = {"api_key": "key", "state": "present", "subdomain": "mypage", "scope": "front", "id": None, "sections": None, "company_name": "Toucan"}
+
+    betteruptime_status_page.BetterUptimeStatusPage(mock_module).manage_status_page()
+
+    assert [(c.args[0], c.args[1]) for c in mock_session_request.call_args_list] == [
+        ("GET", "https://betteruptime.com/api/v2/status-pages"),
+        ("GET", "https://betteruptime.com/api/v2/status-pages/1"),
+        ("PATCH", "https://betteruptime.com/api/v2/status-pages/1"),
+    ]
+    assert mock_session_request.call_args.kwargs["json"] == {"company_name": "Toucan"}
+    mock_module.exit_json.assert_called_once_with(changed=True, id="1", diff={"prepared": 'company_name: "Renamed" -> "Toucan"'})
@@ -1,5 +1,6 @@
 import mock
 import pytest
+import requests
 
 from plugins.modules import betteruptime_status_page_report
 
@@ -17,7 +18,7 @@ from plugins.modules import betteruptime_status_page_report
                 id="Maintenance all resources (2)"),
         ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
 def test_retrieve_status_page_resources_ids_all_sections(mock_module, mock_requests_get, api_response, expected):
     response = mock.Mock()
@@ -50,7 +51,7 @@ def test_retrieve_status_page_resources_ids_all_sections(mock_module, mock_reque
             ),
         ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
 def test_retrieve_status_page_resources_ids_specific_sections(mock_module, mock_requests_get, api_response, retrieved_sections_ids, expected):
     response = mock.Mock()
@@ -96,7 +97,7 @@ def test_retrieve_status_page_resources_ids_specific_sections(mock_module, mock_
             ),
         ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
 def test_retrieve_status_page_section_ids(mock_module, mock_requests_get, api_response, section_name, expected):
     response = mock.Mock()
@@ -137,7 +138,7 @@ def test_retrieve_status_page_section_ids(mock_module, mock_requests_get, api_re
             ),
         ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
 def test_retrieve_id(mock_module, mock_requests_get, api_response, payload, expected):
     response = mock.Mock()
@@ -150,3 +151,175 @@ def test_retrieve_id(mock_module, mock_requests_get, api_response, payload, expe
     status_page_report_object.retrieve_id()
 
     assert status_page_report_object.id == expected
+
+
+@pytest.mark.parametrize(
+        "retrieved_updates, report_update, expected_posts",
+        [
+            pytest.param(
+                [{"id": 1, "attributes": {"message": "Investigating", "published_at": "2021-12-17T11:00:00.000Z"}}],
+                [{"message": "Investigating", "published_at": "2021-12-17T13:00+0200"}, {"message": "Fixed", "published_at": "2021-12-17T14:00+0200"}],
+                ["Fixed"],
+                id="Only the new update posted"
+            ),
+            pytest.param(
+                [{"id": 1, "attributes": {"message": "Investigating", "published_at": "2021-12-17T11:00:00.000Z"}}],
+                [{"message": "Investigating", "published_at": None}],
+                [],
+                id="Update without date already posted"
+            ),
+            pytest.param(
+                [{"id": 1, "attributes": {"message": "Investigating", "published_at": "2021-12-17T11:00:00.000Z"}}],
+                [{"message": "Investigating", "published_at": "2021-12-18T13:00+0200"}, {"message": "Investigating", "published_at": "2021-12-18T13:00+0200"}],
+                ["Investigating"],
+                id="Same message at another date posted once"
+            ),
+        ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
+def test_manage_update_idempotent(mock_module, mock_session_request, retrieved_updates, report_update, expected_posts):
+    listing = mock.Mock(status_code=200, headers={})
+    listing.json.return_value = {"data": retrieved_updates, "pagination": {"next": None}}
+    created = mock.Mock(status_code=201, headers={})
+    created.json.return_value = {"data": {"id": 2}}
+    mock_session_request.side_effect = [listing] + [created] * len(expected_posts)
+    mock_module.exit_json.side_effect = SystemExit
+
+    status_page_report_object                = betteruptime_status_page_report.BetterUptimeStatusPageReport(mock_module)
+    status_page_report_object.state          = "update"
+    status_page_report_object.report_update  = report_update
+    status_page_report_object.payload        = {"affected_resources": [{"status_page_resource_id": 5, "status": "degraded"}]}
+    status_page_report_object.retrieve_status_page_id = mock.Mock()
+    status_page_report_object.status_page_id = 1
+    status_page_report_object.retrieve_status_page_resources_ids = mock.Mock()
+    status_page_report_object.retrieve_id    = mock.Mock()
+    status_page_report_object.id             = 3
+
+    with pytest.raises(SystemExit):
+        status_page_report_object.manage()
+
+    posts = [c.kwargs["json"]["message"] for c in mock_session_request.call_args_list if c.args[0] == "POST"]
+    assert posts == expected_posts
+    mock_module.exit_json.assert_called_once_with(changed=bool(expected_posts))
+
+
+def api_response(status_code, json):
+    response = mock.Mock(status_code=status_code, headers={})
+    response.json.return_value = json
+    return response
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
+def test_manage_subdomains(mock_module, mock_session_request):
+    def request(method, url, **kwargs):
+        if url.endswith("/status-pages"):
+            return api_response(200, {"data": [{"id": str(i), "attributes": {"subdomain": f"page-{i}"}} for i in range(1, 4)], "pagination": {"next": None}})
+        if url.endswith("/resources"):
+            # The third page has no resource, nothing to report on it
+            return api_response(200, {"data": [] if "/3/" in url else [{"id": 9, "attributes": {"status_page_section_id": 1}}]})
+        return api_response(201 if "/1/" in url else 500, {"data": {"id": 42}})
+
+    mock_session_request.side_effect = request
+    mock_module.params = {
+        "api_key": "key", "subdomain": None, "subdomains": ["page-1", "page-2", "page-3", "page-1"], "title": "Incident", "state": "create",
+        "status": "degraded", "report_type": "manual", "message": "Down", "report_update": None, "section_name": None,
+        "published_at": None, "starts_at": None, "ends_at": None,
+    }
+    status_page_reports_object = betteruptime_status_page_report.BetterUptimeStatusPageReports(mock_module)
+
+    status_page_reports_object.manage()
+
+    posts = [c.args[1] for c in mock_session_request.call_args_list if c.args[0] == "POST"]
+    assert sorted(posts) == [f"https://betteruptime.com/api/v2/status-pages/{i}/status-reports" for i in (1, 2)]
+    mock_module.fail_json.assert_called_once()
+    assert mock_module.fail_json.call_args.kwargs["status_pages"] == [
+        {"subdomain": "page-1", "status_page_id": "1", "id": 42, "changed": True, "failed": False},
+        {"subdomain": "page-2", "status_page_id": "2", "id": None, "changed": False, "failed": True},
+        {"subdomain": "page-3", "status_page_id": "3", "id": None, "changed": False, "failed": False},
+    ]
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
+def test_manage_subdomains_failed_resources(mock_module, mock_session_request):
+    def request(method, url, **kwargs):
+        if url.endswith("/status-pages"):
+            return api_response(200, {"data": [{"id": str(i), "attributes": {"subdomain": f"page-{i}"}} for i in range(1, 4)], "pagination": {"next": None}})
+        if "/resources" in url:
+            # The resources of the second page can not be listed, the others are spread over two pages
+            if "/2/" in url:
+                response = api_response(500, {"errors": "Internal error"})
+                response.raise_for_status.side_effect = requests.exceptions.HTTPError("500 Server Error")
+                return response
+            if kwargs.get("params") is None:
+                return api_response(200, {"data": [{"id": 10, "attributes": {"status_page_section_id": 1}}], "pagination": {"next": None}})
+            return api_response(200, {"data": [{"id": 9, "attributes": {"status_page_section_id": 1}}], "pagination": {"next": f"{url}?page=2"}})
+        return api_response(201, {"data": {"id": 42}})
+
+    mock_session_request.side_effect = request
+    mock_module.params = {
+        "api_key": "key", "subdomain": None, "subdomains": ["page-1", "page-2", "page-3"], "title": "Incident", "state": "create",
+        "status": "degraded", "report_type": "manual", "message": "Down", "report_update": None, "section_name": None,
+        "published_at": None, "starts_at": None, "ends_at": None,
+    }
+    status_page_reports_object = betteruptime_status_page_report.BetterUptimeStatusPageReports(mock_module)
+
+    status_page_reports_object.manage()
+
+    posts = {c.args[1]: c.kwargs["json"] for c in mock_session_request.call_args_list if c.args[0] == "POST"}
+    assert sorted(posts) == [f"https://betteruptime.com/api/v2/status-pages/{i}/status-reports" for i in (1, 3)]
+    assert posts["https://betteruptime.com/api/v2/status-pages/1/status-reports"]["affected_resources"] == [
+        {"status_page_resource_id": 9, "status": "degraded"}, {"status_page_resource_id": 10, "status": "degraded"},
+    ]
+    mock_module.fail_json.assert_called_once()
+    assert mock_module.fail_json.call_args.kwargs["status_pages"] == [
+        {"subdomain": "page-1", "status_page_id": "1", "id": 42, "changed": True, "failed": False},
+        {"subdomain": "page-2", "status_page_id": "2", "id": None, "changed": False, "failed": True},
+        {"subdomain": "page-3", "status_page_id": "3", "id": 42, "changed": True, "failed": False},
+    ]
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.betteruptime_status_page_report.AnsibleModule')
+def test_manage_subdomains_missing_page(mock_module, mock_session_request):
+    mock_session_request.return_value = api_response(200, {"data": [{"id": "1", "attributes": {"subdomain": "page-1"}}], "pagination": {"next": None}})
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {
+        "api_key": "key", "subdomain": None, "subdomains": ["page-1", "page-2", "page-3"], "title": "Incident", "state": "create",
+        "status": "degraded", "report_type": "manual", "message": "Down", "report_update": None, "section_name": None,
+        "published_at": None, "starts_at": None, "ends_at": None,
+    }
+    status_page_reports_object = betteruptime_status_page_report.BetterUptimeStatusPageReports(mock_module)
+
+    with pytest.raises(SystemExit):
+        status_page_reports_object.manage()
+
+    mock_module.fail_json.assert_called_once_with(msg="Status pages not found: page-2, page-3")
+
+
+@pytest.mark.parametrize(
+        "key, expected_id, expected_pages",
+        [
+            pytest.param(("MEP", "manual", 27328980), 5, 1, id="Match on the first page stops the listing"),
+            pytest.param(("Incident", "manual", 27330420), 6, 2, id="Match on the second page"),
+            pytest.param(("Incident", "maintenance", 27330420), None, 2, id="No match reads the whole listing"),
+        ]
+)
+def test_status_report_index(key, expected_id, expected_pages):
+    pages = [
+        [{"id": 5, "attributes": {"title": "MEP", "report_type": "manual", "starts_at": "2021-12-17T11:00:00.000Z"}}, {"id": 7, "attributes": None}],
+        [{"id": 6, "attributes": {"title": "Incident", "report_type": "manual", "starts_at": "2021-12-18T11:00:59.999Z"}}],
+    ]
+    read = []
+
+    def items():
+        for page in pages:
+            read.append(page)
+            yield from page
+
+    index = betteruptime_status_page_report.StatusReportIndex(items())
+
+    assert index.get(key) == expected_id
+    assert len(read) == expected_pages
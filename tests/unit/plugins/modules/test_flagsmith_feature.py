@@ -24,7 +24,7 @@ from plugins.modules import flagsmith_feature
             id="Feature found on page two"),
     ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.flagsmith_feature.AnsibleModule')
 def test_retrieve_id(mock_module, mock_requests_get, params, api_response, expected_nb_call_api, expected_feature_id):
     response = mock.Mock()
@@ -109,3 +109,112 @@ def test_manage_delete(mock_module, mock_delete, mock_retrieve_id, mock_get_proj
     feature_object.manage()
 
     assert mock_delete.call_count == 1
+
+@pytest.mark.parametrize("tags, expected_tags, expected_msg" , [
+        pytest.param(["tag1", "tag2"], [1, 2], None, id="All tags found"),
+        pytest.param(["tag1", "missing1", "missing2"], ["tag1", "missing1", "missing2"], "Tags not found: missing1, missing2 in project myproject", id="Missing tags reported at once"),
+    ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.flagsmith_feature.AnsibleModule')
+def test_resolve_tags(mock_module, mock_session_request, tags, expected_tags, expected_msg):
+    response = mock.Mock()
+    response.json.return_value = {"next": None, "results": [{"label": "tag1", "id": 1}, {"label": "tag2", "id": 2}]}
+    mock_session_request.return_value = response
+
+    feature_object = flagsmith_feature.FlagsmithFeature(mock_module)
+    feature_object.project_name    = "myproject"
+    feature_object.project_id      = 4
+    feature_object.payload["tags"] = tags
+
+    feature_object.resolve_tags()
+
+    assert feature_object.payload["tags"] == expected_tags
+    if expected_msg is None:
+        mock_module.fail_json.assert_not_called()
+    else:
+        mock_module.fail_json.assert_called_once_with(msg=expected_msg)
+
+
+def flagsmith_feature_item(id, name, tags=None, description=None):
+    return {"id": id, "name": name, "type": "STANDARD", "default_enabled": False, "initial_value": None, "description": description, "is_archived": False, "tags": tags or []}
+
+
+@pytest.mark.parametrize("features, api_responses, expected_patches, expected_results" , [
+        pytest.param(
+            [{"name": "a", "state": "present"}],
+            [{"next": None, "results": []}],
+            [], [{"name": "a", "state": "present", "id": None, "changed": True, "failed": False}],
+            id="Create missing feature"),
+        pytest.param(
+            [{"name": "a", "state": "present", "tags": ["tag2", "tag1"]}, {"name": "b", "state": "present", "description": "new"}],
+            [{"next": "page2", "results": [flagsmith_feature_item(10, "a", tags=[1, 2])]},
+             {"next": None, "results": [flagsmith_feature_item(11, "b")]},
+             {"next": None, "results": [{"label": "tag1", "id": 1}, {"label": "tag2", "id": 2}]}],
+            [{"description": "new"}],
+            [{"name": "a", "state": "present", "id": 10, "changed": False, "failed": False},
+             {"name": "b", "state": "present", "id": 11, "changed": True, "failed": False}],
+            id="Only the differing features are updated, tags compared unordered"),
+        pytest.param(
+            [{"name": "a", "state": "absent"}, {"name": "b", "state": "absent"}],
+            [{"next": None, "results": [flagsmith_feature_item(10, "a")]}],
+            [], [{"name": "a", "state": "absent", "id": 10, "changed": True, "failed": False},
+                 {"name": "b", "state": "absent", "id": None, "changed": False, "failed": False}],
+            id="Delete existing features only"),
+    ]
+)
+@mock.patch('plugins.modules.flagsmith_feature.FlagsmithFeature.delete')
+@mock.patch('plugins.modules.flagsmith_feature.FlagsmithFeature.create')
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.flagsmith_feature.AnsibleModule')
+def test_manage_features(mock_module, mock_session_request, mock_create, mock_delete, features, api_responses, expected_patches, expected_results):
+    responses = [[{"name": "myproject", "id": 4}]] + api_responses
+
+    def request(method, url, **kwargs):
+        response = mock.Mock()
+        response.status_code = 200
+        response.json.return_value = responses.pop(0) if method == "GET" else {}
+        return response
+    mock_session_request.side_effect = request
+
+    mock_module.params = {"api_key": "key", "base_url": "https://flagsmith", "project_name": "myproject", "features": features}
+    features_object = flagsmith_feature.FlagsmithFeatures(mock_module)
+
+    features_object.manage()
+
+    patches = [c.kwargs["json"] for c in mock_session_request.call_args_list if c.args[0] == "PATCH"]
+    assert patches == expected_patches
+    assert responses == []
+    mock_module.exit_json.assert_called_once_with(changed=any(r["changed"] for r in expected_results), features=expected_results)
+
+
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.flagsmith_feature.AnsibleModule')
+def test_manage_features_missing_tags(mock_module, mock_session_request):
+    responses = [[{"name": "myproject", "id": 4}], {"next": None, "results": []}, {"next": None, "results": [{"label": "tag1", "id": 1}]}]
+    mock_session_request.return_value.json.side_effect = responses
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "base_url": "https://flagsmith", "project_name": "myproject", "features": [
+        {"name": "a", "state": "present", "tags": ["tag1", "missing1"]},
+        {"name": "b", "state": "present", "tags": ["missing2", "missing1"]},
+    ]}
+    features_object = flagsmith_feature.FlagsmithFeatures(mock_module)
+
+    with pytest.raises(SystemExit):
+        features_object.manage()
+
+    mock_module.fail_json.assert_called_once_with(msg="Tags not found: missing1, missing2 in project myproject")
+
+
+@mock.patch('plugins.modules.flagsmith_feature.AnsibleModule')
+def test_manage_features_duplicates(mock_module):
+    mock_module.fail_json.side_effect = SystemExit
+    mock_module.params = {"api_key": "key", "base_url": "https://flagsmith", "project_name": "myproject", "features": [
+        {"name": "b", "state": "present"}, {"name": "a", "state": "present"}, {"name": "b", "state": "absent"}, {"name": "c", "state": "absent"},
+    ]}
+    features_object = flagsmith_feature.FlagsmithFeatures(mock_module)
+
+    with pytest.raises(SystemExit):
+        features_object.manage()
+
+    mock_module.fail_json.assert_called_once_with(msg="Features declared more than once: ['b']")
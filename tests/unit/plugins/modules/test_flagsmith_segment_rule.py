@@ -0,0 +1,51 @@
+import mock
+import pytest
+from plugins.modules import flagsmith_segment_rule
+
+RETRIEVED_RULES = [{"id": 1, "type": "ALL", "rules": [{"id": 2, "type": "ANY", "rules": [], "conditions": [
+    {"id": 3, "operator": "EQUAL", "property": "plan", "value": "premium", "description": None},
+    {"id": 4, "operator": "GREATER_THAN", "property": "seats", "value": "5", "description": None},
+]}], "conditions": []}]
+
+
+@pytest.mark.parametrize("rules, expected" , [
+        pytest.param('[{"type": "ALL", "rules": []}]', [{"type": "ALL", "rules": []}], id="Json"),
+        pytest.param("[{'type': 'ALL', 'rules': [], 'value': \"customer's\"}]", [{"type": "ALL", "rules": [], "value": "customer's"}], id="Single quoted with an apostrophe"),
+    ]
+)
+def test_parse_rules(rules, expected):
+    assert flagsmith_segment_rule.parse_rules(rules) == expected
+
+
+@pytest.mark.parametrize("wanted_rules, expected_patch" , [
+        pytest.param(
+            [{"conditions": [], "type": "ALL", "rules": [{"type": "ANY", "rules": [], "conditions": [
+                {"property": "plan", "operator": "EQUAL", "value": "premium"},
+                {"property": "seats", "operator": "GREATER_THAN", "value": 5},
+            ]}]}],
+            False,
+            id="Same rules with other keys order and typed values"),
+        pytest.param(
+            [{"type": "ALL", "rules": [{"type": "ANY", "rules": [], "conditions": [
+                {"property": "plan", "operator": "EQUAL", "value": "enterprise"},
+                {"property": "seats", "operator": "GREATER_THAN", "value": 5},
+            ]}], "conditions": []}],
+            True,
+            id="Changed condition"),
+    ]
+)
+@mock.patch('requests.Session.request')
+@mock.patch('plugins.modules.flagsmith_segment_rule.AnsibleModule')
+def test_update(mock_module, mock_session_request, wanted_rules, expected_patch):
+    mock_session_request.return_value.status_code = 200
+    mock_module.exit_json.side_effect = SystemExit
+    segment_object = flagsmith_segment_rule.FlagsmithSegmentRule(mock_module)
+    segment_object.id                   = 7
+    segment_object.payload              = {"name": "premium", "rules": wanted_rules}
+    segment_object.retrieved_attributes = {"id": 7, "name": "premium", "rules": RETRIEVED_RULES}
+
+    with pytest.raises(SystemExit):
+        segment_object.update()
+
+    assert mock_session_request.call_count == int(expected_patch)
+    mock_module.exit_json.assert_called_once_with(changed=expected_patch)
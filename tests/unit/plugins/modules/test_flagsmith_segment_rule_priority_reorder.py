@@ -0,0 +1,114 @@
+import mock
+import pytest
+from plugins.modules import flagsmith_segment_rule_priority_reorder
+
+
+@pytest.mark.parametrize("segments_config, feature_segments, expected" , [
+        pytest.param(
+            {10: 1, 11: 0},
+            [{"id": 1, "segment": 10, "priority": 0}, {"id": 2, "segment": 99, "priority": 1}, {"id": 3, "segment": 11, "priority": 2}],
+            [{"id": 2, "priority": 0}, {"id": 3, "priority": 1}, {"id": 1, "priority": 2}],
+            id="Plans after the other overrides, by priority"),
+        pytest.param(
+            {10: 0},
+            [{"id": 1, "segment": 99, "priority": 0}, {"id": 2, "segment": 98, "priority": 1}],
+            [{"id": 1, "priority": 0}, {"id": 2, "priority": 1}],
+            id="No plan"),
+        pytest.param(
+            {10: 0, 11: 2, 12: 1},
+            [{"id": 1, "segment": 11, "priority": 0}, {"id": 2, "segment": 99, "priority": 1}, {"id": 3, "segment": 10, "priority": 2}],
+            [{"id": 2, "priority": 0}, {"id": 3, "priority": 1}, {"id": 1, "priority": 2}],
+            id="Only some plans attached, contiguous ranks"),
+    ]
+)
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.AnsibleModule')
+def test_target_priorities(mock_module, segments_config, feature_segments, expected):
+    reorder_object = flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder(mock_module)
+    reorder_object.segments_config = segments_config
+
+    assert reorder_object.target_priorities(feature_segments) == expected
+
+
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.update_priorities')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_feature_segments')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_associated_features')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_segment_id')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_environment_id')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.get_project_ids_from_names')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.AnsibleModule')
+def test_manage(mock_module, mock_project_ids, mock_environment_id, mock_segment_id, mock_associated_features, mock_feature_segments, mock_update_priorities):
+    mock_project_ids.return_value = [1]
+    mock_environment_id.side_effect = {"production": 100, "staging": 200}.get
+    mock_segment_id.side_effect = {"free": 10, "premium": 11}.get
+    mock_associated_features.side_effect = lambda segment_id: [
+        {"feature": 5, "environment": 100}, {"feature": 6, "environment": 100}, {"feature": 5, "environment": 200}, {"feature": 7, "environment": 300},
+    ]
+    mock_feature_segments.side_effect = lambda environment_id, feature_id: {
+        # Plans in the wrong order
+        (100, 5): [{"id": 1, "segment": 11, "priority": 0}, {"id": 2, "segment": 10, "priority": 1}],
+        # Already ordered
+        (100, 6): [{"id": 3, "segment": 10, "priority": 0}, {"id": 4, "segment": 11, "priority": 1}],
+        # Behind another override
+        (200, 5): [{"id": 5, "segment": 11, "priority": 0}, {"id": 6, "segment": 99, "priority": 1}],
+    }[(environment_id, feature_id)]
+    mock_update_priorities.return_value = True
+
+    mock_module.params = {"api_key": "key", "base_url": "dummy", "project_name": "project", "state": "present", "environment_names": ["production", "staging"],
+                          "pricing_plans": {"free": {"flagsmith_plan_name": "free", "priority": 0}, "premium": {"flagsmith_plan_name": "premium", "priority": 1}}}
+    reorder_object = flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder(mock_module)
+
+    reorder_object.manage()
+
+    assert mock_feature_segments.call_count == 3
+    assert [c.args[0] for c in mock_update_priorities.call_args_list] == [
+        [{"id": 2, "priority": 0}, {"id": 1, "priority": 1}],
+        [{"id": 6, "priority": 0}, {"id": 5, "priority": 1}],
+    ]
+    mock_module.exit_json.assert_called_once_with(changed=True, features=[
+        {"environment": "production", "feature": 5, "changed": True, "failed": False},
+        {"environment": "production", "feature": 6, "changed": False, "failed": False},
+        {"environment": "staging", "feature": 5, "changed": True, "failed": False},
+    ])
+
+
+
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.update_priorities')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_feature_segments')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_associated_features')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_segment_id')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder.retrieve_environment_id')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.get_project_ids_from_names')
+@mock.patch('plugins.modules.flagsmith_segment_rule_priority_reorder.AnsibleModule')
+def test_manage_some_plans_attached_is_idempotent(mock_module, mock_project_ids, mock_environment_id, mock_segment_id, mock_associated_features, mock_feature_segments, mock_update_priorities):
+    mock_project_ids.return_value = [1]
+    mock_environment_id.side_effect = {"production": 100}.get
+    mock_segment_id.side_effect = {"free": 10, "standard": 11, "premium": 12}.get
+    mock_associated_features.side_effect = lambda segment_id: [{"feature": 5, "environment": 100}] if segment_id != 11 else []
+
+    # Flagsmith stores the posted priorities as contiguous ranks
+    stored = {1: 1, 2: 0, 3: 2}
+    mock_feature_segments.side_effect = lambda environment_id, feature_id: [
+        {"id": 1, "segment": 12, "priority": stored[1]}, {"id": 2, "segment": 99, "priority": stored[2]}, {"id": 3, "segment": 10, "priority": stored[3]},
+    ]
+
+    def update_priorities(post_data):
+        stored.update({i["id"]: rank for rank, i in enumerate(sorted(post_data, key=lambda i: i["priority"]))})
+        return True
+    mock_update_priorities.side_effect = update_priorities
+
+    params = {"api_key": "key", "base_url": "dummy", "project_name": "project", "state": "present", "environment_names": ["production"],
+              "pricing_plans": {"free": {"flagsmith_plan_name": "free", "priority": 0},
+                                "standard": {"flagsmith_plan_name": "standard", "priority": 1},
+                                "premium": {"flagsmith_plan_name": "premium", "priority": 2}}}
+    features = [{"environment": "production", "feature": 5, "changed": True, "failed": False}]
+
+    mock_module.params = {**params, "pricing_plans": dict(params["pricing_plans"])}
+    flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder(mock_module).manage()
+    mock_module.exit_json.assert_called_once_with(changed=True, features=features)
+    assert stored == {2: 0, 3: 1, 1: 2}
+
+    mock_module.reset_mock()
+    mock_module.params = {**params, "pricing_plans": dict(params["pricing_plans"])}
+    flagsmith_segment_rule_priority_reorder.FlagsmithSegmentRulePriorityReorder(mock_module).manage()
+    mock_module.exit_json.assert_called_once_with(changed=False, features=[{**features[0], "changed": False}])
+    assert mock_update_priorities.call_count == 1
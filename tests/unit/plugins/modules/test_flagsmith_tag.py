@@ -21,7 +21,7 @@ from plugins.modules import flagsmith_tag
             id="Tag found on page two"),
     ]
 )
-@mock.patch('requests.get')
+@mock.patch('requests.Session.request')
 @mock.patch('plugins.modules.flagsmith_tag.AnsibleModule')
 def test_retrieve_id(mock_module, mock_requests_get, params, api_response, expected_nb_call_api, expected_tag_id):
     response = mock.Mock()